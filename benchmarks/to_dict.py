@@ -0,0 +1,48 @@
+# coding: utf-8
+"""
+Mesure du débit de sérialisation de `CommonModel.to_dict()` (lignes par seconde)
+Usage : python benchmarks/to_dict.py [nombre de lignes] [nombre de répétitions]
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+OPTIONS = [
+    ('default', dict()),
+    ('editables', dict(editables=True)),
+    ('display+labels', dict(editables=True, display=True, labels=True)),
+    ('no_empty+excludes', dict(no_empty=True, excludes=('address', 'reset_date'))),
+]
+
+
+def run(rows=10000, repeat=5):
+    from django.conf import settings
+    from common.runtests import SETTINGS_DICT
+    settings.configure(**dict(SETTINGS_DICT, DATABASES={
+        'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}}))
+
+    import django
+    django.setup()
+
+    from django.utils.timezone import now
+    from common.models import ServiceUsage
+
+    date = now()
+    instances = [
+        ServiceUsage(id=index, name='service-{}'.format(index), user_id=1, count=index, limit=index * 10,
+                     reset=ServiceUsage.RESET_DAILY, reset_date=date, address='127.0.0.1', date=date)
+        for index in range(rows)]
+
+    print("{:<20} {:>15}".format("options", "rows/sec"))
+    for name, options in OPTIONS:
+        duration = min(timeit.repeat(
+            lambda: [instance.to_dict(**options) for instance in instances], number=1, repeat=repeat))
+        print("{:<20} {:>15,.0f}".format(name, rows / duration))
+
+
+if __name__ == '__main__':
+    run(*(int(arg) for arg in sys.argv[1:3]))
@@ -15,7 +15,7 @@ from common.fields import JsonField, PickleField
 from common.forms import CommonInlineFormSet
 from common.models import (
     CommonModel, Entity, Global, GroupMetaData, History, HistoryField,
-    MetaData, PerishableEntity, ServiceUsage, UserMetaData, Webhook)
+    MetaData, Outbox, PerishableEntity, ServiceUsage, UserMetaData, Webhook)
 from common.utils import get_pk_field
 
 
@@ -243,7 +243,7 @@ class GlobalAdmin(admin.ModelAdmin):
     entity_url.short_description = _("Entité")
 
     def get_queryset(self, request):
-        return super().get_queryset(request).prefetch_related('entity', 'content_type')
+        return super().get_queryset(request).select_related('content_type').prefetch_generics()
 
 
 @admin.register(MetaData)
@@ -275,7 +275,7 @@ class MetaDataAdmin(admin.ModelAdmin):
     entity_url.admin_order_field = 'entity'
 
     def get_queryset(self, request):
-        return super().get_queryset(request).prefetch_related('entity')
+        return super().get_queryset(request).prefetch_generics()
 
 
 def restore(modeladmin, request, queryset, all_fields=False):
@@ -289,16 +289,24 @@ def restore(modeladmin, request, queryset, all_fields=False):
     """
     fail, success = 0, 0
     errors = []
-    for history in queryset.order_by('-creation_date'):
-        try:
-            result = history.restore(
-                current_user=request.user, from_admin=True, all_fields=all_fields)
-            if result:
-                success += 1
-            else:
-                fail += 1
-        except Exception as error:
-            errors.append((history.pk, error))
+    if hasattr(queryset, 'restore_bulk'):
+        # Les historiques d'entités sont restaurés en masse
+        results = queryset.restore_bulk(current_user=request.user, from_admin=True, all_fields=all_fields).items()
+    else:
+        results = []
+        for history in queryset.order_by('-creation_date'):
+            try:
+                results.append((history.pk, history.restore(
+                    current_user=request.user, from_admin=True, all_fields=all_fields)))
+            except Exception as error:
+                results.append((history.pk, error))
+    for pk, result in results:
+        if isinstance(result, Exception):
+            errors.append((pk, result))
+        elif result:
+            success += 1
+        else:
+            fail += 1
     if success > 0:
         messages.success(request, _(
             "{} élément(s) ont été restaurés avec succès !").format(success))
@@ -375,7 +383,7 @@ class HistoryAdmin(admin.ModelAdmin):
     has_reason.short_description = _("Motif")
 
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('content_type', 'user').prefetch_related('entity')\
+        return super().get_queryset(request).select_related('content_type', 'user').prefetch_generics()\
             .annotate(fields_count=Count('fields')).order_by('-creation_date')
 
 
@@ -441,6 +449,18 @@ class HistoryFieldAdmin(admin.ModelAdmin):
         return super().get_queryset(request).select_related('history__content_type').order_by('-creation_date')
 
 
+@admin.register(Outbox)
+class OutboxAdmin(admin.ModelAdmin):
+    """
+    Configuration de l'administration pour les tâches en attente
+    """
+    list_display = ('id', 'creation_date', 'task', 'attempts', 'error', )
+    list_display_links = ('id', )
+    list_filter = ('task', 'creation_date', )
+    ordering = ('id', )
+    search_fields = ('error', )
+
+
 @admin.register(Webhook)
 class WebhookAdmin(admin.ModelAdmin):
     """
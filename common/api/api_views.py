@@ -130,9 +130,16 @@ def metadata(request, uuid):
     if not entity:
         raise NotFound(_("Entité inconnue."))
     if request.method == 'POST':
-        for key, value in request.data.items():
-            if value is None:
+        removed = [key for key, value in request.data.items() if value is None]
+        metas = {key: value for key, value in request.data.items() if value is not None}
+        if hasattr(entity, 'set_metadata_many'):
+            if removed:
+                entity.del_metadata(removed)
+            if metas:
+                entity.set_metadata_many(metas)
+        else:
+            for key in removed:
                 entity.del_metadata(key)
-            else:
+            for key, value in metas.items():
                 entity.set_metadata(key, value)
     return Response(entity.get_metadata())
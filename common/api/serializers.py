@@ -35,6 +35,9 @@ class CommonModelSerializer(serializers.HyperlinkedModelSerializer if HYPERLINKE
         request = self.context.get('request', None)
         meta = request and getattr(request, 'query_params', None) and request.query_params.get('meta', False)
         if meta and hasattr(instance, 'metadata'):
+            # Cache des métadonnées alimenté par le prefetch de la vue (voir CommonModel.get_metadata())
+            if hasattr(instance, 'get_metadata_cache'):
+                return dict(instance.get_metadata_cache())
             # Soit un QuerySet de MetaData soit un lien vers un modèle ayant un champ "data" (voir User/Group)
             return instance.metadata.data if hasattr(instance.metadata, 'data') \
                 else {meta.key: meta.value for meta in instance.metadata.all() if meta.valid}
@@ -30,7 +30,7 @@ AGGREGATES = {
 }
 RESERVED_QUERY_PARAMS = [
     'filters', 'fields', 'order_by', 'group_by', 'all', 'display',
-    'distinct', 'silent', 'simple', 'meta', 'cache', 'timeout',
+    'distinct', 'silent', 'simple', 'meta', 'cache', 'timeout', 'as_of',
 ] + list(AGGREGATES.keys())
 
 # Gestion du cache
@@ -2,16 +2,19 @@
 from django.core.exceptions import FieldDoesNotExist, EmptyResultSet
 from django.db import ProgrammingError
 from django.db.models.query import F, Prefetch, QuerySet
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 from rest_framework import viewsets
-from rest_framework.exceptions import ValidationError
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.response import Response
 from rest_framework.schemas import AutoSchema
 
 from common.api.utils import AGGREGATES, CACHE_PREFIX, CACHE_TIMEOUT, RESERVED_QUERY_PARAMS, url_value, parse_filters
 from common.api.fields import ChoiceDisplayField, ReadOnlyObjectField
 from common.models import Entity, MetaData
 from common.settings import settings
-from common.utils import get_field_by_path, str_to_bool
+from common.utils import get_field_by_path, parsedate, str_to_bool
 
 
 class CommonModelViewSet(viewsets.ModelViewSet):
@@ -20,6 +23,8 @@ class CommonModelViewSet(viewsets.ModelViewSet):
     """
     url_params = {}
     schema = AutoSchema()
+    # Actions pour lesquelles les instances sont récupérées en lecture seule (sans suivi des modifications)
+    untracked_actions = ('list', )
 
     def get_serializer_class(self):
         # Le serializer par défaut est utilisé en cas de modification/suppression
@@ -101,7 +106,6 @@ class CommonModelViewSet(viewsets.ModelViewSet):
         # Détournement en cas d'aggregation sans annotation ou de non QuerySet
         queryset = self.get_queryset()
         if not isinstance(queryset, QuerySet):
-            from rest_framework.response import Response
             return Response(queryset)
         try:
             return super().list(request, *args, **kwargs)
@@ -109,6 +113,26 @@ class CommonModelViewSet(viewsets.ModelViewSet):
             self.queryset_error = error
             raise ValidationError("fields: {}".format(error))
 
+    @action(detail=False, methods=['get'], url_path='as_of')
+    def as_of(self, request, *args, **kwargs):
+        """
+        Etat des entités à une date passée reconstitué à partir de leur historique (paramètre 'as_of')
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        if not isinstance(queryset, QuerySet) or not hasattr(queryset, 'as_of'):
+            raise NotFound(_("Historique indisponible pour ce type d'entité."))
+        date = parsedate(request.query_params.get('as_of'))
+        if not date:
+            raise ValidationError({'as_of': _("Date de référence invalide.")})
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            queryset = queryset.filter(pk__in=[item.pk for item in page])
+        states = queryset.as_of(date)
+        if page is not None:
+            results = [dict(id=item.pk, data=states.get(item.pk)) for item in page]
+            return self.get_paginated_response(results)
+        return Response([dict(id=pk, data=data) for pk, data in states.items()])
+
     def paginate_queryset(self, queryset):
         # Aucune pagination si toutes les données sont demandées ou qu'il ne s'agit pas d'un QuerySet
         if not isinstance(queryset, QuerySet) or str_to_bool(self.request.query_params.get('all', None)):
@@ -129,6 +153,10 @@ class CommonModelViewSet(viewsets.ModelViewSet):
             if not isinstance(queryset, QuerySet):
                 return queryset
 
+            # Récupération des instances en lecture seule
+            if self.action in (self.untracked_actions or ()) and hasattr(queryset, 'untracked'):
+                queryset = queryset.untracked()
+
             options = dict(aggregates=None, distinct=None, filters=None, order_by=None)
             self.url_params = url_params = self.request.query_params.dict()
 
@@ -0,0 +1,304 @@
+# coding: utf-8
+import datetime
+import gzip
+import logging
+import os
+import shutil
+import time
+from contextlib import contextmanager, nullcontext
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections, router, transaction
+from django.utils.timezone import now, utc
+from django.utils.translation import gettext_lazy as _
+
+from common.models import History, HistoryField, MetaData
+from common.operations import (
+    create_month_partition, drop_month_partition, get_month_start, get_next_month, is_partitioned)
+from common.settings import settings
+from common.utils import json_decode, json_encode
+
+
+# Logging
+logger = logging.getLogger(__name__)
+
+# Nombre d'historiques traités par lot
+ARCHIVE_BATCH_SIZE = 1000
+# Nombre de métadonnées purgées par lot
+PURGE_BATCH_SIZE = 1000
+
+
+def get_archive_path(month, path=None):
+    """
+    Récupère le chemin du fichier d'archive des historiques d'un mois
+    :param month: Date comprise dans le mois
+    :param path: Répertoire des archives (par défaut HISTORY_ARCHIVE_PATH)
+    :return: Chemin du fichier
+    """
+    path = path or settings.HISTORY_ARCHIVE_PATH
+    assert path, _("An archive path is required.")
+    return os.path.join(path, '{}_{:%Y%m}.ndjson.gz'.format(History._meta.db_table, month))
+
+
+def get_month_datetime(month):
+    """
+    Récupère le début d'un mois en UTC (bornes des partitions mensuelles)
+    :param month: Date comprise dans le mois
+    :return: Date et heure
+    """
+    return datetime.datetime(month.year, month.month, 1, tzinfo=utc)
+
+
+@contextmanager
+def _open_archive(filename):
+    """
+    Ouvre en ajout une copie temporaire d'un fichier d'archive, renommée à la place de l'archive une fois les lots
+    écrits et leurs suppressions validées ; une copie laissée par un arrêt brutal est reprise à l'appel suivant
+    :param filename: Chemin du fichier d'archive
+    :return: Fichier temporaire (binaire)
+    """
+    temp = filename + '.tmp'
+    if os.path.exists(filename) and (not os.path.exists(temp) or os.path.getsize(temp) < os.path.getsize(filename)):
+        shutil.copyfile(filename, temp)
+    try:
+        with open(temp, 'ab') as file:
+            yield file
+    finally:
+        # Les lots en échec ont été retirés, la copie ne contient que des lots dont la suppression est validée
+        if os.path.getsize(temp):
+            os.replace(temp, filename)
+        else:
+            os.remove(temp)
+
+
+@contextmanager
+def _archive_batch(file):
+    """
+    Délimite l'écriture d'un lot dans une archive, le lot est retiré de l'archive si sa transaction échoue
+    :param file: Fichier temporaire de l'archive (ou None)
+    """
+    position = file.tell() if file else None
+    try:
+        yield
+    except Exception:
+        if file:
+            file.truncate(position)
+        raise
+
+
+def _write_archive(file, lines):
+    """
+    Ajoute un lot de lignes à une archive (fichier gzip multi-membres) et s'assure de son écriture sur disque
+    :param file: Fichier temporaire de l'archive
+    :param lines: Lignes à écrire
+    :return: Rien
+    """
+    with gzip.GzipFile(fileobj=file, mode='wb') as archive:
+        for line in lines:
+            archive.write((line + '\n').encode('utf-8'))
+    file.flush()
+    os.fsync(file.fileno())
+
+
+def archive_history(before, path=None, using=None):
+    """
+    Archive les historiques des mois entièrement antérieurs à une date dans des fichiers NDJSON compressés
+    (une ligne par historique accompagné de ses champs modifiés) puis les supprime de la base de données,
+    les partitions mensuelles vidées sont également supprimées
+    :param before: Date limite (seuls les mois complets antérieurs à cette date sont archivés)
+    :param path: Répertoire des archives (par défaut HISTORY_ARCHIVE_PATH)
+    :param using: Alias de la base de données
+    :return: Dictionnaire du nombre d'historiques archivés par mois
+    """
+    using = using or router.db_for_write(History)
+    connection = connections[using]
+    end = get_month_start(before)
+    histories = History.objects.using(using)
+    first = histories.filter(creation_date__lt=get_month_datetime(end)).order_by('creation_date').values_list(
+        'creation_date', flat=True).first()
+    results = {}
+    month = get_month_start(first) if first else end
+    while month < end:
+        next_month = get_next_month(month)
+        queryset = histories.filter(
+            creation_date__gte=get_month_datetime(month), creation_date__lt=get_month_datetime(next_month))
+        count = 0
+        filename = get_archive_path(month, path=path)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        # Les lots sont écrits dans une copie de l'archive qui ne la remplace qu'une fois les suppressions validées
+        with _open_archive(filename) as file:
+            while True:
+                with _archive_batch(file), transaction.atomic(using=using):
+                    rows = list(queryset.order_by('pk').values()[:ARCHIVE_BATCH_SIZE])
+                    if not rows:
+                        break
+                    ids = [row['id'] for row in rows]
+                    fields = {}
+                    for field in HistoryField.objects.using(using).filter(history_id__in=ids).order_by('pk').values():
+                        fields.setdefault(field['history_id'], []).append(field)
+                    _write_archive(file, (
+                        json_encode(dict(history=row, fields=fields.get(row['id'], []))) for row in rows))
+                    HistoryField.objects.using(using).filter(history_id__in=ids)._raw_delete(using)
+                    History.objects.using(using).filter(pk__in=ids)._raw_delete(using)
+                count += len(rows)
+        if is_partitioned(connection, History._meta.db_table):
+            drop_month_partition(connection, History._meta.db_table, month)
+        if is_partitioned(connection, HistoryField._meta.db_table):
+            drop_month_partition(connection, HistoryField._meta.db_table, month)
+        if count:
+            results[month] = count
+            logger.info(_("{} historique(s) archivé(s) pour le mois {:%m/%Y}.").format(count, month))
+        month = next_month
+    return results
+
+
+def rehydrate_history(month, uuids=None, path=None, using=None):
+    """
+    Restaure en base de données les historiques archivés d'un mois, par exemple pour permettre leur restauration
+    :param month: Date comprise dans le mois
+    :param uuids: Identifiants uniques des entités dont les historiques sont à restaurer (toutes par défaut)
+    :param path: Répertoire des archives (par défaut HISTORY_ARCHIVE_PATH)
+    :param using: Alias de la base de données
+    :return: Nombre d'historiques restaurés
+    """
+    using = using or router.db_for_write(History)
+    connection = connections[using]
+    month = get_month_start(month)
+    filename = get_archive_path(month, path=path)
+    if not os.path.exists(filename):
+        logger.warning(_("Aucune archive disponible pour le mois {:%m/%Y}.").format(month))
+        return 0
+    uuids = {str(uuid) for uuid in uuids} if uuids else None
+    for model in (History, HistoryField):
+        if is_partitioned(connection, model._meta.db_table):
+            create_month_partition(connection, model._meta.db_table, month)
+    existing = set()
+    count = 0
+    with transaction.atomic(using=using), gzip.open(filename, 'rt', encoding='utf-8') as file:
+        histories, fields = [], []
+        for line in file:
+            if not line.strip():
+                continue
+            data = json_decode(line)
+            history = data['history']
+            if uuids and str(history.get('object_uid')) not in uuids:
+                continue
+            histories.append(History(**history))
+            fields.extend(HistoryField(**field) for field in data.get('fields', []))
+            if len(histories) >= ARCHIVE_BATCH_SIZE:
+                count += _insert_histories(histories, fields, existing, using)
+                histories, fields = [], []
+        count += _insert_histories(histories, fields, existing, using)
+    logger.info(_("{} historique(s) restauré(s) pour le mois {:%m/%Y}.").format(count, month))
+    return count
+
+
+def _insert_histories(histories, fields, existing, using):
+    """
+    Insère en masse les historiques restaurés qui ne sont pas déjà présents en base de données
+    """
+    if not histories:
+        return 0
+    existing.update(History.objects.using(using).filter(
+        pk__in=[history.pk for history in histories]).values_list('pk', flat=True))
+    # Une archive reprise après une interruption peut contenir des lignes en double
+    histories = list({history.pk: history for history in histories if history.pk not in existing}.values())
+    ids = {history.pk for history in histories}
+    # Les dates de création d'origine sont insérées telles quelles
+    _raw_insert(History, histories, using)
+    _raw_insert(HistoryField, list({field.pk: field for field in fields if field.history_id in ids}.values()), using)
+    existing.update(ids)
+    return len(histories)
+
+
+def _raw_insert(model, objs, using):
+    """
+    Insère en masse des instances avec leurs valeurs telles quelles (sans renseigner les dates automatiques)
+    """
+    fields = model._meta.concrete_fields
+    batch_size = max(connections[using].ops.bulk_batch_size(fields, objs), 1)
+    for index in range(0, len(objs), batch_size):
+        model._base_manager.using(using)._insert(objs[index:index + batch_size], fields=fields, raw=True, using=using)
+
+
+def create_history_partitions(months=1, using=None):
+    """
+    Crée les partitions mensuelles des historiques pour le mois en cours et les mois suivants
+    :param months: Nombre de mois à venir
+    :param using: Alias de la base de données
+    :return: Liste des partitions créées
+    """
+    using = using or router.db_for_write(History)
+    connection = connections[using]
+    partitions = []
+    month = get_month_start(datetime.date.today())
+    for index in range(months + 1):
+        for model in (History, HistoryField):
+            if is_partitioned(connection, model._meta.db_table):
+                partitions.append(create_month_partition(connection, model._meta.db_table, month))
+        month = get_next_month(month)
+    return partitions
+
+
+def get_metadata_archive_path(date, path=None):
+    """
+    Récupère le chemin du fichier d'archive des métadonnées expirées purgées à une date
+    :param date: Date de la purge
+    :param path: Répertoire des archives (par défaut HISTORY_ARCHIVE_PATH)
+    :return: Chemin du fichier
+    """
+    path = path or settings.HISTORY_ARCHIVE_PATH
+    assert path, _("An archive path is required.")
+    return os.path.join(path, '{}_{:%Y%m%d}.ndjson.gz'.format(MetaData._meta.db_table, date))
+
+
+def purge_metadata(before=None, archive=False, path=None, batch_size=PURGE_BATCH_SIZE, pause=0, progress=None,
+                   using=None):
+    """
+    Supprime définitivement les métadonnées expirées avant une date par lots de taille limitée, chaque lot étant
+    supprimé dans une transaction courte (les lots de chaque type d'entité sont lus dans l'ordre des identifiants à
+    l'aide de l'index sur le type, la date de suppression et l'identifiant)
+    Les métadonnées archivées sont écrites dans une copie de l'archive qui ne la remplace qu'une fois les suppressions
+    validées
+    :param before: Date limite d'expiration (par défaut la date courante)
+    :param archive: Archiver les métadonnées purgées dans un fichier NDJSON compressé ?
+    :param path: Répertoire des archives (par défaut HISTORY_ARCHIVE_PATH)
+    :param batch_size: Nombre de métadonnées supprimées par lot
+    :param pause: Temps d'attente en secondes entre deux lots
+    :param progress: Fonction appelée après chaque lot avec le type d'entité et le nombre de métadonnées purgées
+    :param using: Alias de la base de données
+    :return: Dictionnaire du nombre de métadonnées purgées par type d'entité
+    """
+    using = using or router.db_for_write(MetaData)
+    before = before or now()
+    filename = get_metadata_archive_path(before, path=path) if archive else None
+    if filename:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+    results = {}
+    with _open_archive(filename) if filename else nullcontext() as file:
+        for content_type in ContentType.objects.using(using).order_by('pk'):
+            queryset = MetaData.objects.using(using).filter(content_type=content_type, deletion_date__lt=before)
+            count, last_pk = 0, 0
+            while True:
+                with _archive_batch(file), transaction.atomic(using=using):
+                    batch = queryset.filter(pk__gt=last_pk).order_by('pk')
+                    if file:
+                        rows = list(batch.values()[:batch_size])
+                        ids = [row['id'] for row in rows]
+                    else:
+                        ids = list(batch.values_list('pk', flat=True)[:batch_size])
+                    if not ids:
+                        break
+                    if file:
+                        _write_archive(file, (json_encode(row) for row in rows))
+                    MetaData.objects.using(using).filter(pk__in=ids)._raw_delete(using)
+                count += len(ids)
+                last_pk = ids[-1]
+                if progress:
+                    progress(content_type, count)
+                if pause:
+                    time.sleep(pause)
+            if count:
+                results[content_type] = count
+                logger.info(_("{} métadonnée(s) expirée(s) purgée(s) pour le type {}.").format(count, content_type))
+    return results
@@ -420,6 +420,11 @@ class ImportExport(object):
             widths[column_letter] = len(str(cell.value)) + CELL_OFFSET
         # Récupération des données
         queryset = model.objects.select_related().order_by(code_field)
+        if hasattr(queryset, 'untracked'):
+            queryset = queryset.untracked()
+        # Préchargement des métadonnées de l'ensemble des éléments
+        if hasattr(queryset, 'with_metadata'):
+            queryset = queryset.with_metadata()
         row = 2
         for element in queryset:
             for column, (field_code, field_name) in enumerate(fields, start=1):
@@ -431,10 +436,11 @@ class ImportExport(object):
                     m2m_code_field = getattr(field.related_model, '_code_field', 'id')
                     value = ', '.join(str(v) for v in value.values_list(m2m_code_field, flat=True))
                 elif field.related_model is not None and field.related_model is MetaData:
-                    if len(element.get_metadata()) > 0:
+                    metadata = element.get_metadata()
+                    if metadata:
                         value = 'meta_{}_{}'.format(element._meta.model_name, row)
                         self.metadata[value] = []
-                        for key_meta, value_meta in element.get_metadata().items():
+                        for key_meta, value_meta in metadata.items():
                             self.metadata[value].append((key_meta, value_meta,))
                     else:
                         continue
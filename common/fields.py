@@ -1,13 +1,15 @@
 # coding: utf-8
 import base64
+import datetime
 import decimal
 import pickle
 
 from django import VERSION as django_version
-from django.core.exceptions import ValidationError
+from django.core.exceptions import FieldDoesNotExist, FieldError, ValidationError
 from django.db import models
 from django.db.models.fields import mixins
-from django.db.models import CharField, Lookup, TextField, Transform, lookups
+from django.db.models import CharField, DateTimeField, Lookup, TextField, Transform, lookups
+from django.utils.timezone import utc
 from django.utils.translation import gettext_lazy as _
 
 from common.settings import settings
@@ -657,6 +659,56 @@ class JsonEmpty(Lookup):
         return '%s IS NOT NULL AND %s%s NOT IN (%s)' % (lhs, lhs, cast, rhs), self.empty_values
 
 
+# Date de fin factice des périodes sans date de fin (recherche par intervalle hors PostgreSQL)
+SENTINEL_END_DATE = datetime.datetime(9999, 12, 31, tzinfo=utc)
+
+
+def get_sentinel_end_date(connection):
+    """
+    Récupère la représentation SQL de la date de fin factice, identique dans les index et dans les requêtes
+    :param connection: Connexion à la base de données
+    :return: Littéral SQL
+    """
+    return "'{}'".format(connection.ops.adapt_datetimefield_value(SENTINEL_END_DATE))
+
+
+@DateTimeField.register_lookup
+class ValidAt(lookups.FieldGetDbPrepValueMixin, Lookup):
+    """
+    Recherche les périodes [date d'effet, date de fin] contenant une date à partir du champ date d'effet
+    (le champ date de fin 'end_date' du même modèle est implicite et obligatoire), sous une forme exploitable par les
+    index : intervalle 'tstzrange' sur PostgreSQL, date de fin factice à la place de la date de fin nulle sinon
+    """
+    lookup_name = 'valid_at'
+    end_field = 'end_date'
+
+    def __init__(self, lhs, rhs):
+        super().__init__(lhs, rhs)
+        # Le lookup est disponible sur tous les champs date mais n'a de sens qu'en présence de la date de fin
+        target = getattr(lhs, 'target', None)
+        try:
+            end_field = target.model._meta.get_field(self.end_field) if target else None
+        except FieldDoesNotExist:
+            end_field = None
+        if not isinstance(end_field, DateTimeField) or not end_field.concrete:
+            raise FieldError(_("Le lookup '{}' nécessite un champ date de fin '{}' sur le modèle du champ {}.").format(
+                self.lookup_name, self.end_field, getattr(target, 'name', lhs)))
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        end_field = self.lhs.target.model._meta.get_field(self.end_field)
+        end, end_params = compiler.compile(end_field.get_col(self.lhs.alias))
+        if is_postgresql(connection):
+            sql = "%s IS NOT NULL AND TSTZRANGE(%s, %s, '[]') @> %s::timestamptz" % (lhs, lhs, end, rhs)
+            return sql, tuple(lhs_params) + tuple(lhs_params) + tuple(end_params) + tuple(rhs_params)
+        if is_sqlite(connection) or is_mysql(connection):
+            sql = '%s <= %s AND COALESCE(%s, %s) >= %s' % (lhs, rhs, end, get_sentinel_end_date(connection), rhs)
+            return sql, tuple(lhs_params) + tuple(rhs_params) + tuple(end_params) + tuple(rhs_params)
+        sql = '%s <= %s AND (%s >= %s OR %s IS NULL)' % (lhs, rhs, end, rhs, end)
+        return sql, tuple(lhs_params) + tuple(rhs_params) + tuple(end_params) + tuple(rhs_params) + tuple(end_params)
+
+
 # Bakery monkey-patch for CustomDecimalField and JsonField
 try:
     from model_bakery.generators import default_mapping
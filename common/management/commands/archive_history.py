@@ -0,0 +1,45 @@
+# coding: utf-8
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.translation import gettext_lazy as _
+
+from common.archives import archive_history, create_history_partitions, rehydrate_history
+from common.utils import parsedate
+
+
+# Logging
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Archive les historiques antérieurs à une date dans des fichiers compressés ou les restaure"
+    leave_locale_alone = True
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', dest='before', type=str, help=_("Date limite des historiques à archiver"))
+        parser.add_argument('--rehydrate', dest='rehydrate', type=str, nargs='*',
+                            help=_("Mois à restaurer depuis les archives (AAAA-MM)"))
+        parser.add_argument('--uuid', dest='uuids', type=str, nargs='*',
+                            help=_("Identifiants uniques des entités dont les historiques sont à restaurer"))
+        parser.add_argument('--partitions', dest='partitions', type=int,
+                            help=_("Nombre de partitions mensuelles à créer à l'avance"))
+        parser.add_argument('--path', dest='path', type=str, help=_("Répertoire des archives"))
+        parser.add_argument('--using', dest='using', type=str, help=_("Nom de la base de donnée ciblée"))
+
+    def handle(self, before=None, rehydrate=None, uuids=None, partitions=None, path=None, using=None, **options):
+        if partitions:
+            created = create_history_partitions(months=partitions, using=using)
+            logger.info(_("{} partition(s) mensuelle(s) vérifiée(s).").format(len(created)))
+        if rehydrate:
+            for month in rehydrate:
+                date = parsedate(month + '-01' if len(month) <= 7 else month)
+                if not date:
+                    raise CommandError(_("Mois invalide : {}").format(month))
+                rehydrate_history(date, uuids=uuids, path=path, using=using)
+        if before:
+            date = parsedate(before)
+            if not date:
+                raise CommandError(_("Date invalide : {}").format(before))
+            results = archive_history(date, path=path, using=using)
+            logger.info(_("{} historique(s) archivé(s).").format(sum(results.values())))
@@ -0,0 +1,52 @@
+# coding: utf-8
+import datetime
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.timezone import is_naive, make_aware
+from django.utils.translation import gettext_lazy as _
+
+from common.archives import PURGE_BATCH_SIZE, purge_metadata
+from common.utils import parsedate
+
+
+# Logging
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Supprime définitivement (ou archive) les métadonnées expirées avant une date"
+    leave_locale_alone = True
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', dest='before', type=str,
+                            help=_("Date limite d'expiration des métadonnées (par défaut la date courante)"))
+        parser.add_argument('--archive', dest='archive', action='store_true',
+                            help=_("Archive les métadonnées purgées dans un fichier compressé"))
+        parser.add_argument('--path', dest='path', type=str, help=_("Répertoire des archives"))
+        parser.add_argument('--batch-size', dest='batch_size', type=int, default=PURGE_BATCH_SIZE,
+                            help=_("Nombre de métadonnées supprimées par lot"))
+        parser.add_argument('--pause', dest='pause', type=float, default=0,
+                            help=_("Temps d'attente en secondes entre deux lots"))
+        parser.add_argument('--using', dest='using', type=str, help=_("Nom de la base de donnée ciblée"))
+
+    def handle(self, before=None, archive=False, path=None, batch_size=PURGE_BATCH_SIZE, pause=0, using=None,
+               verbosity=1, **options):
+        date = None
+        if before:
+            date = parsedate(before)
+            if not date:
+                raise CommandError(_("Date invalide : {}").format(before))
+            if not isinstance(date, datetime.datetime):
+                date = datetime.datetime.combine(date, datetime.time.min)
+            if is_naive(date):
+                date = make_aware(date)
+
+        def progress(content_type, count):
+            if verbosity > 1:
+                self.stdout.write(_("{} : {} métadonnée(s) purgée(s)").format(content_type, count))
+
+        results = purge_metadata(
+            before=date, archive=archive, path=path, batch_size=batch_size, pause=pause, progress=progress,
+            using=using)
+        logger.info(_("{} métadonnée(s) expirée(s) purgée(s).").format(sum(results.values())))
@@ -0,0 +1,78 @@
+# coding: utf-8
+import logging
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils.translation import gettext_lazy as _
+
+from common.outbox import OUTBOX_BATCH_SIZE, OUTBOX_MAX_ATTEMPTS, process_outbox
+
+
+# Logging
+logger = logging.getLogger(__name__)
+
+
+# Délai d'attente maximal (en secondes) entre deux lots entièrement en erreur
+OUTBOX_MAX_INTERVAL = 60.0
+
+
+def run_worker(batch_size=OUTBOX_BATCH_SIZE, max_attempts=OUTBOX_MAX_ATTEMPTS, interval=1.0, once=False, using=None):
+    """
+    Traite la boîte d'envoi par lots jusqu'à interruption (ou jusqu'à ce qu'elle soit vide)
+    Lorsqu'un lot ne contient que des tâches en erreur, le délai d'attente avant le lot suivant est doublé à chaque
+    nouvel échec (dans la limite de OUTBOX_MAX_INTERVAL)
+    :param batch_size: Nombre de tâches par lot
+    :param max_attempts: Nombre maximal de tentatives d'exécution d'une tâche en erreur
+    :param interval: Délai d'attente (en secondes) lorsque la boîte d'envoi est vide
+    :param once: Arrêter le traitement lorsque la boîte d'envoi est vide ?
+    :param using: Alias de la base de données
+    :return: Rien
+    """
+    attempts = 0
+    while True:
+        done, failed = process_outbox(batch_size=batch_size, max_attempts=max_attempts, using=using)
+        if done or failed:
+            logger.info(_("{} tâche(s) exécutée(s), {} en erreur.").format(done, failed))
+        if done:
+            attempts = 0
+            continue
+        if failed:
+            attempts += 1
+            time.sleep(min(interval * 2 ** (attempts - 1), max(interval, OUTBOX_MAX_INTERVAL)))
+            continue
+        attempts = 0
+        if once:
+            break
+        time.sleep(interval)
+
+
+class Command(BaseCommand):
+    help = "Exécute les tâches d'historisation et de notification de la boîte d'envoi"
+    leave_locale_alone = True
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', dest='workers', type=int, default=1, help=_("Nombre de processus"))
+        parser.add_argument('--batch-size', dest='batch_size', type=int, default=OUTBOX_BATCH_SIZE,
+                            help=_("Nombre de tâches traitées par lot"))
+        parser.add_argument('--max-attempts', dest='max_attempts', type=int, default=OUTBOX_MAX_ATTEMPTS,
+                            help=_("Nombre maximal de tentatives par tâche"))
+        parser.add_argument('--interval', dest='interval', type=float, default=1.0,
+                            help=_("Délai d'attente (en secondes) lorsque la boîte d'envoi est vide"))
+        parser.add_argument('--once', dest='once', action='store_true',
+                            help=_("Arrêter le traitement lorsque la boîte d'envoi est vide"))
+        parser.add_argument('--using', dest='using', type=str, help=_("Nom de la base de donnée ciblée"))
+
+    def handle(self, workers=1, batch_size=OUTBOX_BATCH_SIZE, max_attempts=OUTBOX_MAX_ATTEMPTS, interval=1.0,
+               once=False, using=None, **options):
+        kwargs = dict(batch_size=batch_size, max_attempts=max_attempts, interval=interval, once=once, using=using)
+        if workers <= 1:
+            return run_worker(**kwargs)
+        # Les connexions ouvertes ne doivent pas être partagées entre les processus
+        connections.close_all()
+        processes = [multiprocessing.Process(target=run_worker, kwargs=kwargs) for index in range(workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.1 on 2026-10-16 20:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0011_auto_20190201'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='history',
+            name='delta',
+            field=models.BooleanField(default=False, editable=False, verbose_name='différentiel'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.1.1 on 2026-10-16 20:52
+
+import common.fields
+import common.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0012_auto_20261016'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Outbox',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('creation_date', models.DateTimeField(auto_now_add=True, verbose_name='date')),
+                ('task', models.CharField(editable=False, max_length=100, verbose_name='tâche')),
+                ('args', common.fields.JsonField(decoder=common.utils.JsonDecoder, editable=False, encoder=common.utils.JsonEncoder, verbose_name='arguments')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='tentatives')),
+                ('error', models.TextField(blank=True, editable=False, null=True, verbose_name='erreur')),
+            ],
+            options={
+                'verbose_name': 'tâche en attente',
+                'verbose_name_plural': 'tâches en attente',
+            },
+        ),
+    ]
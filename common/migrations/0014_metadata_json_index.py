@@ -0,0 +1,15 @@
+# coding: utf-8
+from django.db import migrations
+
+from common.operations import CreateIndexJson
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0013_outbox'),
+    ]
+
+    operations = [
+        CreateIndexJson('metadata', fields=['value']),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.1 on 2026-10-16 22:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('common', '0014_metadata_json_index'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='metadata',
+            index_together={('content_type', 'deletion_date', 'id'), ('content_type', 'object_id', 'deletion_date'), ('content_type', 'object_id', 'deletion_date', 'key'), ('content_type', 'object_id')},
+        ),
+    ]
@@ -1,8 +1,11 @@
 # coding: utf-8
 import logging
 import pickle
+import threading
 import time
 import uuid
+from collections import OrderedDict
+from functools import lru_cache
 
 from django.apps import apps
 from django.contrib.auth import get_user_model
@@ -12,15 +15,18 @@ from django.contrib.contenttypes.models import ContentType
 from django.core import serializers
 from django.core.cache import cache
 from django.core.exceptions import ValidationError, FieldDoesNotExist
-from django.db import models
-from django.db.models import query, Q
+from django.db import connections, models, router, transaction
+from django.db.models import query, Case, Exists, OuterRef, Q, Value, When
 from django.db.models.deletion import Collector
-from django.db.models.signals import m2m_changed, post_init, post_save, pre_delete, pre_save
+from django.db.models.functions import Cast
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from django.forms.models import model_to_dict as django_model_to_dict
+from django.utils.encoding import force_str
+from django.utils.hashable import make_hashable
 from django.utils.text import camel_case_to_spaces
 from django.utils.timezone import now
-from django.utils.translation import gettext_lazy as _
+from django.utils.translation import get_language, gettext_lazy as _
 from rest_framework.renderers import JSONRenderer
 
 try:
@@ -33,9 +39,10 @@ try:
 except ImportError:
     YAMLRenderer = None
 
-from common.fields import JsonField, PickleField, json_encode
+from common.fields import JsonField, PickleField, is_mysql, is_postgresql, is_sqlite, json_encode
 from common.settings import settings
-from common.utils import get_current_app, get_current_user, get_pk_field, merge_dict, timed_cache, to_tuple
+from common.utils import (
+    get_current_app, get_current_user, get_pk_field, merge_dict, parsedate, prefetch_generics, timed_cache, to_tuple)
 
 # Logging
 logger = logging.getLogger(__name__)
@@ -74,6 +81,307 @@ def get_content_type(model):
     return content_type
 
 
+@lru_cache(maxsize=None)
+def get_tracked_fields(model):
+    """
+    Récupère les noms d'attributs des champs suivis pour la détection des modifications d'un modèle
+    :param model: Modèle
+    :return: Dictionnaire des noms de champs par nom d'attribut
+    """
+    return {field.attname: field.name for field in model._meta.concrete_fields}
+
+
+@lru_cache(maxsize=None)
+def get_m2m_fields(model):
+    """
+    Récupère les champs many-to-many d'un modèle indexés par leur modèle de liaison
+    :param model: Modèle
+    :return: Dictionnaire des champs par modèle de liaison
+    """
+    return {field.remote_field.through: field for field in model._meta.many_to_many}
+
+
+def is_empty(value):
+    """
+    Vérifie qu'une valeur est vide (les valeurs numériques ne sont jamais considérées comme vides)
+    :param value: Valeur
+    :return: Vrai si vide, faux sinon
+    """
+    return False if isinstance(value, (int, float, complex, bool)) else not bool(value)
+
+
+@lru_cache(maxsize=1024)
+def get_to_dict_plan(model, includes=None, excludes=None, editables=False, uids=False, display=False, labels=False,
+                     fks=False, m2m=False, no_ids=False, no_empty=False, raw=False, language=None):
+    """
+    Compile le plan de sérialisation des champs d'un modèle pour un jeu d'options de `.to_dict()`
+    Toutes les vérifications ne dépendant pas de l'instance (type de champ, inclusions, libellés,
+    méthodes d'affichage) sont réalisées une seule fois, le plan est ensuite mis en cache par modèle et par options
+    :param model: Modèle
+    :param includes: Noms des champs à inclure
+    :param excludes: Noms des champs à exclure
+    :param editables: Inclure les valeurs des attributs non éditables ?
+    :param uids: Inclure les identifiants uniques de toutes les entités liées ?
+    :param display: Inclure le libellé de l'attribut s'il existe ?
+    :param labels: Utiliser le libellé du champ à la place de son code ?
+    :param fks: Inclure les éléments liés via les clés étrangères ?
+    :param m2m: Inclure les identifiants des relations ManyToMany liées ?
+    :param no_ids: Ne pas inclure les identifiants des clés primaires et les identifiants des clés étrangères ?
+    :param no_empty: Ne pas inclure les données vides ou nulles ?
+    :param raw: Ne pas chercher à retourner des valeurs serialisables ?
+    :param language: Langue des libellés (uniquement pour différencier les plans traduits)
+    :return: Liste d'étapes de la forme step(instance, data, keywords)
+    """
+    meta = model._meta
+    plan = []
+    for field in meta.concrete_fields + meta.many_to_many:
+        # Champs éditables
+        if not editables and not getattr(field, 'editable', editables):
+            continue
+        # Champs inclus
+        if includes and field.name not in includes:
+            continue
+        # Champs exclus
+        if excludes and field.name in excludes:
+            continue
+        field_name = str(field.verbose_name or camel_case_to_spaces(field.name)) if labels else field.name
+        # Relations de type many-to-many
+        if isinstance(field, models.ManyToManyField):
+            if m2m:
+                plan.append(_get_m2m_step(field, field_name, uids=uids, labels=labels, fks=fks,
+                                          no_ids=no_ids, no_empty=no_empty))
+            continue
+        if field.primary_key and no_ids:
+            continue
+        plan.append(_get_field_step(model, field, field_name, uids=uids, display=display, labels=labels,
+                                    fks=fks, no_ids=no_ids, no_empty=no_empty, raw=raw))
+    return tuple(plan)
+
+
+def _get_m2m_step(field, field_name, uids=False, labels=False, fks=False, no_ids=False, no_empty=False):
+    """
+    Construit l'étape de sérialisation d'une relation de type many-to-many
+    """
+    ids_name = field_name + str(_(" (IDs)") if labels else '_ids')
+    uids_name = field_name + str(_(" (UIDs)") if labels else '_uids')
+    uids = uids and issubclass(field.related_model, Entity)
+
+    def step(instance, data, keywords):
+        if instance.pk is None:
+            data[field_name] = []
+            return
+        value = field.value_from_object(instance)
+        # Identifiants
+        if not no_ids:
+            result = [v.pk for v in value]
+            if result or not no_empty:
+                data[ids_name] = result
+        # Données
+        if fks:
+            result = [to_dict(v, **keywords) for v in value]
+            if result or not no_empty:
+                data[field_name] = result
+                for item in result:
+                    item.pop('_state', None)  # Non serialisable
+        # GUIDs (uniquement entités)
+        if uids:
+            result = [v.uuid for v in value]
+            if result or not no_empty:
+                data[uids_name] = result
+    return step
+
+
+def _get_field_step(model, field, field_name, uids=False, display=False, labels=False,
+                    fks=False, no_ids=False, no_empty=False, raw=False):
+    """
+    Construit l'étape de sérialisation d'un champ concret
+    """
+    attname = field.attname
+    display_name = 'get_{}_display'.format(field.name) if display and hasattr(model, 'get_{}_display'.format(
+        field.name)) else None
+    display_key = field_name + str(_(" (libellé)") if labels else '_display')
+
+    # Gestion des clés étrangères
+    if isinstance(field, (models.ForeignKey, models.OneToOneField)):
+        id_name = (field_name + str(_(" (ID)"))) if labels else attname
+        uid_name = field_name + str(_(" (UID)") if labels else '_uid')
+
+        def convert(instance, data, keywords, value):
+            # Identifiant
+            if not no_ids:
+                data[id_name] = value
+            if fks or uids:
+                fk = getattr(instance, field.name, None)
+                # Données
+                if fks and fk:
+                    data[field_name] = to_dict(fk, **keywords)
+                    data[field_name].pop('_state', None)  # Non serialisable
+                # GUID (uniquement entité)
+                if uids and isinstance(fk, Entity):
+                    data[uid_name] = fk.uuid
+    # Cas spécifique du champ binaire (pickle)
+    elif isinstance(field, PickleField):
+        def convert(instance, data, keywords, value):
+            if value is None and not no_empty:
+                data[field_name] = None
+                return
+            result = value if raw else pickle.dumps(value)
+            if result or not no_empty:
+                data[field_name] = result
+    # Cas spécifique des champs fichier & image
+    elif isinstance(field, (models.FileField, models.ImageField)):
+        def convert(instance, data, keywords, value):
+            if value is None and not no_empty:
+                data[field_name] = None
+                return
+            result = (value if raw else getattr(value, 'url', None)) if value else None
+            if result or not no_empty:
+                data[field_name] = result
+    # Autres champs
+    else:
+        json_name = 'get_{}_json'.format(field.name) if hasattr(model, 'get_{}_json'.format(field.name)) else None
+
+        def convert(instance, data, keywords, value):
+            if value is None:
+                if not no_empty:
+                    data[field_name] = None
+                    return
+            # Cas spécifique pour les listes
+            if isinstance(value, (list, set, tuple)):
+                result = list(value) if raw else ','.join(str(val) for val in value)
+                if result or not no_empty:
+                    data[field_name] = result
+            elif json_name:
+                result = getattr(instance, json_name)()
+                if result or not no_empty:
+                    data[field_name] = result
+            elif not is_empty(value) or not no_empty:
+                data[field_name] = value
+
+    def step(instance, data, keywords):
+        # Ignore les champs chargés en différé pour éviter une boucle de récursion dans to_dict()
+        if attname not in instance.__dict__:
+            return
+        convert(instance, data, keywords, field.value_from_object(instance))
+        if display_name:
+            result = getattr(instance, display_name)()
+            if result or not no_empty:
+                data[display_key] = result
+    return step
+
+
+@lru_cache(maxsize=1024)
+def get_values_plan(model, includes=None, excludes=None, editables=False, display=False, labels=False,
+                    no_ids=False, no_empty=False, raw=False, language=None):
+    """
+    Compile le plan de sérialisation d'un modèle à partir des données brutes issues de `.values()`
+    Seuls les champs ne nécessitant pas d'instance du modèle peuvent être sérialisés de cette manière
+    :param model: Modèle
+    :param includes: Noms des champs à inclure
+    :param excludes: Noms des champs à exclure
+    :param editables: Inclure les valeurs des attributs non éditables ?
+    :param display: Inclure le libellé de l'attribut s'il existe ?
+    :param labels: Utiliser le libellé du champ à la place de son code ?
+    :param no_ids: Ne pas inclure les identifiants des clés primaires et les identifiants des clés étrangères ?
+    :param no_empty: Ne pas inclure les données vides ou nulles ?
+    :param raw: Ne pas chercher à retourner des valeurs serialisables ?
+    :param language: Langue des libellés (uniquement pour différencier les plans traduits)
+    :return: Tuple (noms des attributs à récupérer, étapes de la forme step(row, data)) ou None si impossible
+    """
+    meta = model._meta
+    attnames, plan = [], []
+    for field in meta.concrete_fields:
+        if not editables and not getattr(field, 'editable', editables):
+            continue
+        if includes and field.name not in includes:
+            continue
+        if excludes and field.name in excludes:
+            continue
+        if field.primary_key and no_ids:
+            continue
+        # Les méthodes spécifiques du modèle nécessitent une instance
+        if hasattr(model, 'get_{}_json'.format(field.name)):
+            return None
+        if raw and isinstance(field, (models.FileField, models.ImageField)):
+            return None
+        choices = None
+        if display:
+            method = getattr(model, 'get_{}_display'.format(field.name), None)
+            if method is not None:
+                if not hasattr(method, '_partialmethod'):
+                    return None
+                choices = dict(make_hashable(field.flatchoices))
+        field_name = str(field.verbose_name or camel_case_to_spaces(field.name)) if labels else field.name
+        attnames.append(field.attname)
+        plan.append(_get_value_step(field, field_name, choices=choices, labels=labels,
+                                    no_ids=no_ids, no_empty=no_empty, raw=raw))
+    return tuple(attnames), tuple(plan)
+
+
+class ValuesRow(object):
+    """
+    Ligne de données brutes se faisant passer pour une instance afin d'appliquer les conversions des champs
+    """
+    pass
+
+
+def _get_value_step(field, field_name, choices=None, labels=False, no_ids=False, no_empty=False, raw=False):
+    """
+    Construit l'étape de sérialisation d'un champ concret à partir d'une ligne de données brutes
+    (reproduit à l'identique le comportement de l'étape construite par `_get_field_step`)
+    """
+    attname = field.attname
+    display_key = field_name + str(_(" (libellé)") if labels else '_display')
+
+    # Gestion des clés étrangères
+    if isinstance(field, (models.ForeignKey, models.OneToOneField)):
+        id_name = (field_name + str(_(" (ID)"))) if labels else attname
+
+        def convert(data, value):
+            if not no_ids:
+                data[id_name] = value
+    # Cas spécifique du champ binaire (pickle)
+    elif isinstance(field, PickleField):
+        def convert(data, value):
+            if value is None and not no_empty:
+                data[field_name] = None
+                return
+            result = value if raw else pickle.dumps(value)
+            if result or not no_empty:
+                data[field_name] = result
+    # Cas spécifique des champs fichier & image (les valeurs brutes sont les chemins des fichiers)
+    elif isinstance(field, (models.FileField, models.ImageField)):
+        def convert(data, value):
+            if value is None and not no_empty:
+                data[field_name] = None
+                return
+            result = field.storage.url(value) if value else None
+            if result or not no_empty:
+                data[field_name] = result
+    # Autres champs
+    else:
+        def convert(data, value):
+            if value is None:
+                if not no_empty:
+                    data[field_name] = None
+                    return
+            if isinstance(value, (list, set, tuple)):
+                result = list(value) if raw else ','.join(str(val) for val in value)
+                if result or not no_empty:
+                    data[field_name] = result
+            elif not is_empty(value) or not no_empty:
+                data[field_name] = value
+
+    def step(row, data):
+        value = field.value_from_object(row)
+        convert(data, value)
+        if choices is not None:
+            result = force_str(choices.get(make_hashable(value), value), strings_only=True)
+            if result or not no_empty:
+                data[display_key] = result
+    return step
+
+
 class Serialized(object):
     """
     Resultat de serialisation
@@ -123,19 +431,79 @@ class CustomGenericForeignKey(GenericForeignKey):
         setattr(instance, self.fk_field, fk)
         self.set_cached_value(instance, value)
 
+    def __get__(self, instance, cls=None):
+        # Une entité préchargée comme absente n'est pas recherchée à nouveau tant que la clé n'est pas modifiée
+        if instance is not None and self.is_cached(instance) and self.get_cached_value(instance) is None:
+            if instance.__dict__.get(self.missing_key) == self.get_key(instance):
+                return None
+        return super().__get__(instance, cls)
+
+    @property
+    def missing_key(self):
+        return '_missing_{}'.format(self.name)
+
+    def get_key(self, instance):
+        """
+        Récupère le type et l'identifiant de l'entité liée
+        :param instance: Instance porteuse de la relation
+        :return: Tuple (identifiant du type d'entité, identifiant de l'entité)
+        """
+        return getattr(instance, self.model._meta.get_field(self.ct_field).get_attname()), \
+            getattr(instance, self.fk_field)
+
+    def set_prefetched_value(self, instance, value):
+        """
+        Conserve l'entité liée préchargée, y compris son absence (voir common.utils.prefetch_generics)
+        :param instance: Instance porteuse de la relation
+        :param value: Entité liée ou None
+        :return: Rien
+        """
+        self.set_cached_value(instance, value)
+        if value is None:
+            instance.__dict__[self.missing_key] = self.get_key(instance)
+
 
-class MetaDataQuerySet(models.QuerySet):
+class GenericPrefetchMixin(object):
+    """
+    Préchargement des GenericForeignKey à l'évaluation du QuerySet (voir common.utils.prefetch_generics)
+    """
+    _prefetch_generics = False
+
+    def prefetch_generics(self):
+        """
+        Précharge les entités liées des GenericForeignKey lors de l'évaluation du QuerySet
+        :return: QuerySet
+        """
+        clone = self._chain()
+        clone._prefetch_generics = True
+        return clone
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._prefetch_generics = self._prefetch_generics
+        return clone
+
+    def _fetch_all(self):
+        fetched = self._result_cache is not None
+        super()._fetch_all()
+        if self._prefetch_generics and not fetched and issubclass(self._iterable_class, query.ModelIterable):
+            prefetch_generics(self._result_cache)
+
+
+class MetaDataQuerySet(GenericPrefetchMixin, models.QuerySet):
     """
     QuerySet des métadonnées
     """
 
-    def search(self, *, id=None, type=None, key=None, value=None, date=None, valid=True):
+    def search(self, *, id=None, type=None, key=None, value=None, contains=None, lookups=None, date=None, valid=True):
         """
         Effectue une recherche multi-critères dans les métadonnées
         :param id: instance de l'entité
         :param type: Type de l'entité concernée
         :param key: Clé de recherche
         :param value: Valeur après déserialisation
+        :param contains: Dictionnaire ou liste contenu dans la valeur (index GIN sur PostgreSQL)
+        :param lookups: Dictionnaire de recherches sur les chemins de clés de la valeur (ex: {'prix__gte': 10})
         :param date: Date de vérification (facultatif)
         :param valid: Uniquement les métadonnées valides ?
         :return: QuerySet
@@ -154,6 +522,15 @@ class MetaDataQuerySet(models.QuerySet):
         if value:
             from common.utils import json_encode
             queryset = queryset.filter(value=json_encode(value))
+        if contains:
+            # L'inclusion n'est pas supportée par tous les moteurs, elle est alors remplacée par une recherche par clé
+            if isinstance(contains, dict) and not is_postgresql(connections[queryset.db]) and not is_mysql(
+                    connections[queryset.db]):
+                queryset = queryset.filter(**{'value__' + path: val for path, val in contains.items()})
+            else:
+                queryset = queryset.filter(value__contains=contains)
+        if lookups:
+            queryset = queryset.filter(**{'value__' + lookup: val for lookup, val in lookups.items()})
         return queryset.select_valid(date=date, valid=valid)
 
     def select_valid(self, date=None, valid=True):
@@ -232,6 +609,51 @@ class MetaData(models.Model):
         queryset = queryset.only('key', 'value').order_by('key')
         return queryset if raw else {m.key: m.value for m in queryset}
 
+    @staticmethod
+    def get_many(instances, key=None, keys=None, date=None, valid=True):
+        """
+        Récupère les métadonnées d'un ensemble d'instances avec une requête par type d'entité
+        Les métadonnées récupérées sans clé spécifique sont conservées en cache sur chaque instance
+        et sont ensuite utilisées par `get_metadata()`
+        :param instances: Liste d'instances (éventuellement de modèles différents)
+        :param key: Clé de recherche (facultatif)
+        :param keys: Liste des clés à récupérer (toutes par défaut)
+        :param date: Date de vérification de la validité (facultatif)
+        :param valid: Uniquement les données valides ?
+        :return: Dictionnaire {instance: valeur} si une clé est fournie, {instance: {clé: valeur}} sinon
+        """
+        keys = {key} if key else set(keys) if keys is not None else None
+        by_type = {}
+        for instance in instances:
+            assert getattr(instance, 'pk', None), _("Unable to get metadata from an unsaved model instance.")
+            content_type = get_content_type(instance._meta.concrete_model)
+            by_type.setdefault(content_type, {}).setdefault(str(instance.pk), []).append(instance)
+        results = {}
+        for content_type, objects in by_type.items():
+            data = {object_id: {} for object_id in objects}
+            expiries = {}
+            queryset = MetaData.objects.filter(content_type=content_type, object_id__in=list(objects))
+            if keys is not None:
+                queryset = queryset.filter(key__in=keys)
+            queryset = queryset.select_valid(date=date, valid=valid or None).order_by('key').values_list(
+                'object_id', 'key', 'value', 'deletion_date')
+            for object_id, meta_key, value, deletion_date in queryset:
+                data[object_id][meta_key] = value
+                # Date à laquelle la première métadonnée valide de l'instance deviendra obsolète
+                if deletion_date and (object_id not in expiries or deletion_date < expiries[object_id]):
+                    expiries[object_id] = deletion_date
+            for object_id, values in data.items():
+                for instance in objects[object_id]:
+                    if key:
+                        results[instance] = values.get(key)
+                        continue
+                    results[instance] = values
+                    if valid:
+                        instance._metadata_cache = values
+                        instance._metadata_keys = frozenset(keys) if keys is not None else None
+                        instance._metadata_expiry = None if date else expiries.get(object_id)
+        return results
+
     @staticmethod
     def set(instance, key, value, date=None, queryset=None):
         """
@@ -261,6 +683,116 @@ class MetaData(models.Model):
             metadata.save()
         return metadata
 
+    @staticmethod
+    def set_many(instance, metas, date=None):
+        """
+        Permet d'ajouter ou modifier plusieurs métadonnées d'une instance en une seule requête
+        :param instance: Instance du modèle
+        :param metas: Dictionnaire des métadonnées {clé: valeur}
+        :param date: Date de péremption des métadonnées
+        :return: Nombre de métadonnées ajoutées ou modifiées
+        """
+        return MetaData._upsert([(instance, key, value) for key, value in metas.items()], date=date)
+
+    @staticmethod
+    def upsert(instances, key, value, date=None):
+        """
+        Permet d'ajouter ou modifier la même métadonnée sur un ensemble d'instances en une seule requête
+        :param instances: Liste d'instances (éventuellement de modèles différents)
+        :param key: Clé
+        :param value: Valeur
+        :param date: Date de péremption de la métadonnée
+        :return: Nombre de métadonnées ajoutées ou modifiées
+        """
+        return MetaData._upsert([(instance, key, value) for instance in instances], date=date)
+
+    @staticmethod
+    def _upsert(rows, date=None):
+        """
+        Insère ou met à jour des métadonnées en s'appuyant sur la contrainte d'unicité (type, identifiant, clé)
+        avec `INSERT ... ON CONFLICT` (PostgreSQL, SQLite) ou `INSERT ... ON DUPLICATE KEY` (MySQL)
+        :param rows: Liste de tuples (instance, clé, valeur)
+        :param date: Date de péremption des métadonnées
+        :return: Nombre de métadonnées ajoutées ou modifiées
+        """
+        values = {}
+        for instance, key, value in rows:
+            assert getattr(instance, 'pk', None), _("Unable to set metadata for an unsaved model instance.")
+            content_type = get_content_type(instance._meta.concrete_model)
+            values[content_type.pk, str(instance.pk), key] = (instance, value)
+        if not values:
+            return 0
+        using = router.db_for_write(MetaData)
+        connection = connections[using]
+        if not (is_postgresql(connection) or is_sqlite(connection) or is_mysql(connection)):
+            for (content_type_id, object_id, key), (instance, value) in values.items():
+                MetaData.set(instance, key=key, value=value, date=date)
+            return len(values)
+        meta = MetaData._meta
+        fields = [meta.get_field(name) for name in (
+            'content_type', 'object_id', 'key', 'value', 'creation_date', 'modification_date', 'deletion_date')]
+        updates = [meta.get_field(name).column for name in ('value', 'modification_date', 'deletion_date')]
+        quote = connection.ops.quote_name
+        sql = 'INSERT INTO {table} ({columns}) VALUES {{values}} '.format(
+            table=quote(meta.db_table), columns=', '.join(quote(field.column) for field in fields))
+        if is_mysql(connection):
+            sql += 'ON DUPLICATE KEY UPDATE ' + ', '.join(
+                '{column} = VALUES({column})'.format(column=quote(column)) for column in updates)
+        else:
+            sql += 'ON CONFLICT ({}) DO UPDATE SET '.format(', '.join(
+                quote(meta.get_field(name).column) for name in ('content_type', 'object_id', 'key'))) + ', '.join(
+                '{column} = EXCLUDED.{column}'.format(column=quote(column)) for column in updates)
+        current_date = now()
+        items = list(values.items())
+        batch_size = max(connection.ops.bulk_batch_size(fields, items), 1)
+        placeholder = '({})'.format(', '.join(['%s'] * len(fields)))
+        with transaction.atomic(using=using, savepoint=False), connection.cursor() as cursor:
+            for index in range(0, len(items), batch_size):
+                batch, params = items[index:index + batch_size], []
+                for (content_type_id, object_id, key), (instance, value) in batch:
+                    params.extend(field.get_db_prep_save(data, connection) for field, data in zip(fields, (
+                        content_type_id, object_id, key, value, current_date, current_date, date)))
+                cursor.execute(sql.format(values=', '.join([placeholder] * len(batch))), params)
+        return len(items)
+
+    @staticmethod
+    def copy(model, pks, using=None, batch_size=500):
+        """
+        Copie les métadonnées d'instances d'un modèle vers d'autres instances du même modèle
+        en une seule requête `INSERT ... SELECT` par lot
+        :param model: Modèle des instances
+        :param pks: Dictionnaire {identifiant de l'instance source: identifiant de l'instance cible}
+        :param using: Alias de la base de données
+        :param batch_size: Nombre d'instances sources par requête
+        :return: Nombre de métadonnées copiées
+        """
+        pks = {str(source): str(target) for source, target in pks.items() if source is not None and target is not None}
+        if not pks:
+            return 0
+        using = using or router.db_for_write(MetaData)
+        connection = connections[using]
+        meta = MetaData._meta
+        quote = connection.ops.quote_name
+        columns = {name: quote(meta.get_field(name).column) for name in (
+            'content_type', 'object_id', 'key', 'value', 'creation_date', 'modification_date', 'deletion_date')}
+        current_date = meta.get_field('creation_date').get_db_prep_save(now(), connection)
+        content_type = get_content_type(model._meta.concrete_model)
+        items, count = list(pks.items()), 0
+        with transaction.atomic(using=using, savepoint=False), connection.cursor() as cursor:
+            for index in range(0, len(items), batch_size):
+                batch = items[index:index + batch_size]
+                sql = (
+                    'INSERT INTO {table} ({insert}) SELECT {content_type}, CASE {object_id} {cases} END, {key}, '
+                    '{value}, %s, %s, {deletion_date} FROM {table} WHERE {content_type} = %s AND {object_id} IN ({ids})'
+                ).format(
+                    table=quote(meta.db_table), insert=', '.join(columns.values()),
+                    cases=' '.join(['WHEN %s THEN %s'] * len(batch)), ids=', '.join(['%s'] * len(batch)), **columns)
+                params = [value for item in batch for value in item]
+                params += [current_date, current_date, content_type.pk] + [source for source, target in batch]
+                cursor.execute(sql, params)
+                count += max(cursor.rowcount, 0)
+        return count
+
     @staticmethod
     def add(instance, key, value, allow_duplicate=True, queryset=None):
         """
@@ -296,7 +828,7 @@ class MetaData(models.Model):
         """
         Permet de supprimer une ou toutes les métadonnées
         :param instance: Instance du modèle
-        :param key: Clé
+        :param key: Clé ou liste de clés
         :param logic: Suppression logique ?
         :param date: Date de péremption de la métadonnée
         :param queryset: QuerySet de récupération des métadonnées
@@ -305,13 +837,12 @@ class MetaData(models.Model):
         assert getattr(instance, 'pk', None), _("Unable to delete metadata from an unsaved model instance.")
         content_type = get_content_type(instance.__class__)
         queryset = queryset or MetaData.objects.filter(content_type=content_type, object_id=instance.pk)
-        if key:
+        if isinstance(key, (list, tuple, set, frozenset)):
+            queryset = queryset.filter(key__in=key)
+        elif key:
             queryset = queryset.filter(key=key)
         if logic:
-            date = date or now()
-            for metadata in queryset.only('deletion_date').all():
-                metadata.deletion_date = date
-                metadata.save(update_fields=('deletion_date', ))
+            queryset.update(deletion_date=date or now())
         else:
             queryset.all().delete()
 
@@ -322,13 +853,79 @@ class MetaData(models.Model):
         index_together = (
             ('content_type', 'object_id'),
             ('content_type', 'object_id', 'deletion_date'),
-            ('content_type', 'object_id', 'deletion_date', 'key'))
+            ('content_type', 'object_id', 'deletion_date', 'key'),
+            ('content_type', 'deletion_date', 'id'))
+
+
+class UntrackedModelIterable(query.ModelIterable):
+    """
+    Itérateur des instances en lecture seule sans suivi des modifications
+    """
+
+    def __iter__(self):
+        for instance in super().__iter__():
+            if isinstance(instance, CommonModel):
+                instance._tracked = False
+                instance._readonly = True
+            yield instance
 
 
-class CommonQuerySet(models.QuerySet):
+class CommonQuerySet(GenericPrefetchMixin, models.QuerySet):
     """
     QuerySet des modèles communs
     """
+    _with_metadata = None
+
+    def untracked(self):
+        """
+        Récupère les instances en lecture seule, sans suivi des modifications ni historisation
+        (les instances ainsi récupérées ne peuvent être ni sauvegardées ni supprimées)
+        :return: QuerySet
+        """
+        clone = self._chain()
+        if clone._iterable_class is query.ModelIterable:
+            clone._iterable_class = UntrackedModelIterable
+        return clone
+
+    def with_metadata(self, keys=None, date=None):
+        """
+        Précharge les métadonnées valides de toutes les instances lors de l'évaluation du QuerySet
+        (en une seule requête, voir MetaData.get_many())
+        :param keys: Liste des clés à récupérer (toutes par défaut)
+        :param date: Date de vérification de la validité (facultatif)
+        :return: QuerySet
+        """
+        clone = self._chain()
+        clone._with_metadata = (frozenset(keys) if keys is not None else None, date)
+        return clone
+
+    def with_metadata_matching(self, key=None, value=None, contains=None, date=None, valid=True, **lookups):
+        """
+        Filtre les instances possédant au moins une métadonnée correspondant aux critères de recherche
+        (voir MetaDataQuerySet.search(), l'inclusion et les chemins de clés peuvent s'appuyer sur les index JSON)
+        :param key: Clé de la métadonnée
+        :param value: Valeur après déserialisation
+        :param contains: Dictionnaire ou liste contenu dans la valeur
+        :param date: Date de vérification (facultatif)
+        :param valid: Uniquement les métadonnées valides ?
+        :param lookups: Recherches sur les chemins de clés de la valeur (ex: prix__gte=10)
+        :return: QuerySet
+        """
+        metadata = MetaData.objects.search(
+            type=self.model, key=key, value=value, contains=contains, lookups=lookups, date=date, valid=valid)
+        return self.filter(Exists(metadata.filter(object_id=Cast(OuterRef('pk'), output_field=models.TextField()))))
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._with_metadata = self._with_metadata
+        return clone
+
+    def _fetch_all(self):
+        fetched = self._result_cache is not None
+        super()._fetch_all()
+        if self._with_metadata and not fetched and issubclass(self._iterable_class, query.ModelIterable):
+            keys, date = self._with_metadata
+            MetaData.get_many(self._result_cache, keys=keys, date=date)
 
     def serialize(self, format='json'):
         """
@@ -343,13 +940,80 @@ class CommonQuerySet(models.QuerySet):
         Retourne l'ensemble des entités du QuerySet sous forme de dictionnaire
         :return: Liste de dictionnaires
         """
+        if not args:
+            return list(self.iter_dict(**kwargs))
         return [item.to_dict(*args, **kwargs) if isinstance(item, CommonModel) else item for item in self]
 
+    def iter_dict(self, **options):
+        """
+        Itère sur l'ensemble des entités du QuerySet sous forme de dictionnaire
+        Les champs simples sont récupérés directement via `.values()` sans construire les instances du modèle
+        :param options: Paramètres de la fonction .to_dict()
+        :return: Générateur de dictionnaires
+        """
+        values_plan = self._get_values_plan(**options)
+        if values_plan is None:
+            queryset = self
+            # Préchargement des métadonnées de l'ensemble des instances
+            if options.get('metadata') and not self._with_metadata and self._result_cache is None:
+                queryset = self.with_metadata()
+            for item in queryset:
+                yield item.to_dict(**options) if isinstance(item, CommonModel) else item
+            return
+        attnames, plan = values_plan
+        row = ValuesRow()
+        for values in self.values(*attnames).iterator():
+            data = {}
+            row.__dict__ = values
+            for step in plan:
+                step(row, data)
+            yield data
+
+    def _get_values_plan(self, includes=None, excludes=None, editables=False, display=False, labels=False,
+                         no_ids=False, no_empty=False, raw=False, **options):
+        """
+        Récupère le plan de sérialisation par `.values()` si le QuerySet et les options le permettent
+        :return: Tuple (noms des attributs à récupérer, étapes) ou None
+        """
+        model = self.model
+        if any(options.values()) or not issubclass(model, CommonModel) or model.to_dict is not CommonModel.to_dict:
+            return None
+        if self._result_cache is not None or self._fields is not None or \
+                self._iterable_class not in (query.ModelIterable, UntrackedModelIterable) or \
+                self.query.deferred_loading != (frozenset(), True):
+            return None
+        if isinstance(includes, dict):
+            includes = set(includes.get('__all__') or []) | set(includes.get(model) or [])
+        if isinstance(excludes, dict):
+            excludes = set(excludes.get('__all__') or []) | set(excludes.get(model) or [])
+        return get_values_plan(
+            model,
+            includes=frozenset(includes) if includes else None,
+            excludes=frozenset(excludes) if excludes else None,
+            editables=editables, display=display, labels=labels, no_ids=no_ids, no_empty=no_empty, raw=raw,
+            language=get_language() if labels else None)
+
     def __json__(self):
         """
         Représentation de l'instance sous forme de dictionnaire pour sérialisation JSON
         :return: dict
         """
+        model = self.model
+        if model.__json__ is CommonModel.__json__ and not model._meta.many_to_many:
+            values_plan = self._get_values_plan(editables=True)
+            if values_plan is not None:
+                keywords = dict(
+                    editables=True, uids=False, metadata=False, names=False, types=True,
+                    display=False, labels=False, fks=False, m2m=False, no_ids=False, no_empty=False)
+                data_type = to_dict(get_content_type(model), **keywords)
+                data_type.pop('_state', None)  # Non serialisable
+                results = []
+                for values in self.iter_dict(editables=True):
+                    data = dict(_content_type=dict(data_type))
+                    data.update(values)
+                    data.update(_copy=values, _copy_m2m={})
+                    results.append(data)
+                return results
         return [item.__json__() if isinstance(item, CommonModel) else item for item in self]
 
 
@@ -361,10 +1025,110 @@ class CommonModel(models.Model):
     objects = CommonQuerySet.as_manager()
 
     # Propriétés liées à l'historisation et au type de modèle
-    _copy = {}
+    _snapshot = None
+    _dirty = frozenset()
+    _tracked = False
+    _readonly = False
     _copy_m2m = None
+    _snapshot_m2m = None
     _content_type = None
 
+    def __setattr__(self, name, value):
+        # Capture de l'état initial lors de la première modification d'un champ suivi et marquage du champ modifié
+        if self._tracked and name in get_tracked_fields(type(self)):
+            if self._snapshot is None:
+                self.take_snapshot()
+            self._dirty.add(name)
+        super().__setattr__(name, value)
+
+    def take_snapshot(self):
+        """
+        Capture les valeurs brutes des champs suivis de l'instance comme état de référence des modifications
+        :return: Rien
+        """
+        values = self.__dict__
+        self._dirty = set()
+        self._snapshot = {
+            attname: values[attname].copy() if isinstance(values[attname], (list, set, dict)) else values[attname]
+            for attname in get_tracked_fields(type(self)) if attname in values}
+
+    def update_snapshot(self, *attnames):
+        """
+        Considère les champs fournis comme sauvegardés en reportant leurs valeurs actuelles dans l'état de référence
+        Les modifications des autres champs suivis sont conservées
+        :param attnames: Noms d'attributs des champs sauvegardés
+        :return: Rien
+        """
+        if self._snapshot is None:
+            return
+        values = self.__dict__
+        for attname in attnames:
+            if attname in values:
+                value = values[attname]
+                self._snapshot[attname] = value.copy() if isinstance(value, (list, set, dict)) else value
+        self._dirty.difference_update(attnames)
+        if not self._dirty:
+            self._snapshot, self._dirty = None, frozenset()
+
+    def get_snapshot_instance(self):
+        """
+        Construit une instance fantôme représentant l'état de référence sans déclencher d'initialisation
+        :return: Instance
+        """
+        instance = self.__class__.__new__(self.__class__)
+        instance.__dict__.update(self.__dict__)
+        instance.__dict__.update(self._snapshot or {}, _tracked=False)
+        return instance
+
+    @property
+    def _copy(self):
+        """
+        Représentation de l'état de référence de l'instance (calculée à la demande)
+        """
+        if self._snapshot is None:
+            return self.to_dict(editables=True)
+        return self.get_snapshot_instance().to_dict(editables=True)
+
+    def get_m2m_snapshot(self, *field_names):
+        """
+        Récupère l'état connu des relations many-to-many de l'instance
+        Seules les relations encore inconnues sont lues depuis la base de données, l'état est ensuite tenu à jour
+        à chaque modification des relations de l'instance
+        :param field_names: Noms des champs many-to-many
+        :return: Dictionnaire des identifiants par champ
+        """
+        if self._snapshot_m2m is None:
+            self._snapshot_m2m = {}
+        snapshot = self._snapshot_m2m
+        missing = [field_name for field_name in field_names if field_name not in snapshot]
+        if missing:
+            snapshot.update(self.m2m_to_dict(fields=missing))
+        return {field_name: list(snapshot.get(field_name, [])) for field_name in field_names}
+
+    def update_m2m_snapshot(self, field_name, action, pk_set=None):
+        """
+        Met à jour l'état connu d'une relation many-to-many à partir des identifiants ajoutés ou supprimés
+        :param field_name: Nom du champ many-to-many
+        :param action: Action exécutée sur la relation (signal m2m_changed)
+        :param pk_set: Identifiants concernés par l'action
+        :return: Rien
+        """
+        if not self._snapshot_m2m or field_name not in self._snapshot_m2m:
+            return
+        values = self._snapshot_m2m[field_name]
+        if action == 'post_clear':
+            values = []
+        elif action == 'post_add':
+            values = values + [pk for pk in pk_set or () if pk not in values]
+        elif action == 'post_remove':
+            values = [pk for pk in values if pk not in (pk_set or ())]
+        self._snapshot_m2m[field_name] = values
+
+    def refresh_from_db(self, *args, **kwargs):
+        # L'état connu des relations many-to-many est invalidé au même titre que les données préchargées
+        self._snapshot_m2m = None
+        return super().refresh_from_db(*args, **kwargs)
+
     def validate_unique(self, exclude=None):
         """
         Surcharge de la validation de l'unicité pour les index uniques composés de champs nuls
@@ -415,16 +1179,94 @@ class CommonModel(models.Model):
             self.refresh_from_db()
         return count
 
+    def delete(self, *args, **kwargs):
+        """
+        Supprime l'instance du modèle
+        """
+        if self._readonly:
+            raise ValueError(_("Unable to delete a read-only model instance."))
+        return super().delete(*args, **kwargs)
+
     def save(self, *args, force_insert=False, _full_update=False, **kwargs):
         """
         Sauvegarde l'instance du modèle
         """
-        if not self._state.adding and not _full_update and not force_insert and self._meta.pk.name not in self.modified:
-            kwargs['update_fields'] = update_fields = set(kwargs.pop('update_fields', self.modified.keys()))
+        if self._readonly:
+            raise ValueError(_("Unable to save a read-only model instance."))
+        modified = None if self._state.adding or _full_update or force_insert else self.modified
+        if modified is not None and self._meta.pk.name not in modified:
+            kwargs['update_fields'] = update_fields = set(kwargs.pop('update_fields', modified.keys()))
             # Les champs de date avec auto_now=True ne sont modifiés que pendant la sauvegarde
             update_fields.update([field.name for field in self._meta.fields if getattr(field, 'auto_now', None)])
         return super().save(*args, force_insert=force_insert, **kwargs)
 
+    def get_metadata_cache(self):
+        """
+        Récupère les métadonnées valides de l'instance qui sont chargées une seule fois puis conservées en cache
+        (préchargement via `with_metadata()` ou `prefetch_related('metadata')` si disponible)
+        :return: Dictionnaire {clé: valeur}
+        """
+        cache = self.__dict__.get('_metadata_cache')
+        expiry = self.__dict__.get('_metadata_expiry')
+        if cache is not None and self.__dict__.get('_metadata_keys') is None and not (expiry and expiry <= now()):
+            return cache
+        prefetched = getattr(self, '_prefetched_objects_cache', {}).get('metadata')
+        if cache is None and prefetched is not None:
+            metadata = sorted((meta for meta in prefetched if meta.valid), key=lambda meta: meta.key)
+            expiries = [meta.deletion_date for meta in metadata if meta.deletion_date]
+            self._metadata_cache = {meta.key: meta.value for meta in metadata}
+            self._metadata_keys = None
+            self._metadata_expiry = min(expiries) if expiries else None
+            return self._metadata_cache
+        return MetaData.get_many([self])[self]
+
+    def _set_metadata_cache(self, metas, date=None):
+        """
+        Répercute l'ajout ou la modification de métadonnées sur le cache de l'instance
+        :param metas: Métadonnées {clé: valeur}
+        :param date: Date de péremption des métadonnées
+        """
+        cache = self._get_full_metadata_cache()
+        if cache is None:
+            return
+        if date and date <= now():
+            for key in metas:
+                cache.pop(key, None)
+            return
+        cache.update(metas)
+        if date:
+            expiry = self.__dict__.get('_metadata_expiry')
+            self._metadata_expiry = min(expiry, date) if expiry else date
+
+    def _del_metadata_cache(self, keys=None, date=None):
+        """
+        Répercute la suppression de métadonnées sur le cache de l'instance
+        :param keys: Clés supprimées (toutes par défaut)
+        :param date: Date de péremption des métadonnées en cas de suppression logique
+        """
+        cache = self._get_full_metadata_cache()
+        if cache is None:
+            return
+        if date and date > now():
+            expiry = self.__dict__.get('_metadata_expiry')
+            self._metadata_expiry = min(expiry, date) if expiry else date
+        elif keys is None:
+            cache.clear()
+        else:
+            for key in keys:
+                cache.pop(key, None)
+
+    def _get_full_metadata_cache(self):
+        """
+        Récupère le cache complet des métadonnées de l'instance avant modification,
+        le cache partiel ou les métadonnées préchargées par Django sont invalidés
+        :return: Dictionnaire {clé: valeur} ou None
+        """
+        getattr(self, '_prefetched_objects_cache', {}).pop('metadata', None)
+        if self.__dict__.get('_metadata_keys') is not None:
+            self.__dict__.pop('_metadata_cache', None)
+        return self.__dict__.get('_metadata_cache')
+
     def get_metadata(self, key=None, valid=True, raw=False):
         """
         Permet de récupérer une valeur de métadonnée à partir de sa clé
@@ -433,6 +1275,13 @@ class CommonModel(models.Model):
         :param raw: Retourner les entités à la place des valeurs ?
         :return: Valeur ou entité
         """
+        if valid and not raw:
+            # Utilisation des métadonnées partiellement préchargées (voir CommonQuerySet.with_metadata())
+            keys = self.__dict__.get('_metadata_keys')
+            if key and keys is not None and key in keys and '_metadata_cache' in self.__dict__:
+                return self._metadata_cache.get(key)
+            cache = self.get_metadata_cache()
+            return cache.get(key) if key else dict(cache)
         return MetaData.get(self, key=key, valid=valid, raw=raw, queryset=self.metadata)
 
     def set_metadata(self, key, value, date=None):
@@ -443,7 +1292,20 @@ class CommonModel(models.Model):
         :param date: Date de péremption de la métadonnée
         :return: Vrai en cas de succès, faux sinon
         """
-        return MetaData.set(self, key=key, value=value, date=date, queryset=self.metadata)
+        metadata = MetaData.set(self, key=key, value=value, date=date, queryset=self.metadata)
+        self._set_metadata_cache({key: value}, date=date)
+        return metadata
+
+    def set_metadata_many(self, metas, date=None):
+        """
+        Permet d'ajouter ou modifier plusieurs métadonnées en une seule requête
+        :param metas: Dictionnaire des métadonnées {clé: valeur}
+        :param date: Date de péremption des métadonnées
+        :return: Nombre de métadonnées ajoutées ou modifiées
+        """
+        count = MetaData.set_many(self, metas, date=date)
+        self._set_metadata_cache(metas, date=date)
+        return count
 
     def add_metadata(self, key, value, allow_duplicate=True):
         """
@@ -454,17 +1316,22 @@ class CommonModel(models.Model):
         :param allow_duplicate: Autorise l'ajout de doublons dans les listes de valeur (par défaut)
         :return: Métadonnée
         """
-        return MetaData.add(self, key=key, value=value, allow_duplicate=allow_duplicate, queryset=self.metadata)
+        metadata = MetaData.add(self, key=key, value=value, allow_duplicate=allow_duplicate, queryset=self.metadata)
+        self._set_metadata_cache({key: metadata.value}, date=metadata.deletion_date)
+        return metadata
 
     def del_metadata(self, key=None, logic=False, date=None):
         """
         Permet de supprimer une métadonnée
-        :param key: Clé
+        :param key: Clé ou liste de clés
         :param logic: Suppression logique ?
         :param date: Date de péremption de la métadonnée
         :return: Vrai en cas de succès, faux sinon
         """
-        return MetaData.remove(self, key=key, logic=logic, date=date, queryset=self.metadata)
+        result = MetaData.remove(self, key=key, logic=logic, date=date, queryset=self.metadata)
+        keys = key if isinstance(key, (list, tuple, set, frozenset)) else [key] if key else None
+        self._del_metadata_cache(keys, date=date if logic else None)
+        return result
 
     def to_dict(self, includes=None, excludes=None,
                 editables=False, uids=False, metadata=False, names=False, types=False, display=False, labels=False,
@@ -503,8 +1370,6 @@ class CommonModel(models.Model):
             keywords.update(excludes=excludes)
             excludes = set(excludes.get('__all__') or []) | set(excludes.get(meta.model) or [])
         keywords.update(kwargs)
-        # Utilitaires
-        is_empty = lambda value: False if isinstance(value, (int, float, complex, bool)) else not bool(value)
         # Données textuelles de l'entité (nom, modèle, représentation, etc...)
         if names:
             data.update(
@@ -520,95 +1385,16 @@ class CommonModel(models.Model):
             data_type = to_dict(get_content_type(self), **keywords)
             data_type.pop('_state', None)  # Non serialisable
             data.update(_content_type=data_type)
-        deferred_fields = self.get_deferred_fields()
-        for field in meta.concrete_fields + meta.many_to_many:
-            # Ignore les champs chargés en différé pour éviter une boucle de récursion dans to_dict()
-            if field.attname in deferred_fields:
-                continue
-            # Champs éditables
-            if not editables and not getattr(field, 'editable', editables):
-                continue
-            # Champs inclus
-            if includes and field.name not in includes:
-                continue
-            # Champs exclus
-            if excludes and field.name in excludes:
-                continue
-            field_name = str(field.verbose_name or camel_case_to_spaces(field.name)) if labels else field.name
-            # Relations de type many-to-many
-            if isinstance(field, models.ManyToManyField):
-                if not m2m:
-                    continue
-                if self.pk is None:
-                    data[field_name] = []
-                else:
-                    value = field.value_from_object(self)
-                    related = field.related_model
-                    # Identifiants
-                    if not no_ids:
-                        result = [v.pk for v in value]
-                        if result or not no_empty:
-                            data[field_name + str(_(" (IDs)") if labels else '_ids')] = result
-                    # Données
-                    if fks:
-                        result = [to_dict(v, **keywords) for v in value]
-                        if result or not no_empty:
-                            data[field_name] = result
-                            for item in result:
-                                item.pop('_state', None)  # Non serialisable
-                    # GUIDs (uniquement entités)
-                    if uids and issubclass(related, Entity):
-                        result = [v.uuid for v in value]
-                        if result or not no_empty:
-                            data[field_name + str(_(" (UIDs)") if labels else '_uids')] = result
-            # Autres champs
-            else:
-                # Valeur du champ
-                value = field.value_from_object(self)
-                if field.primary_key and no_ids:
-                    continue
-                # Gestion des clés étrangères
-                if isinstance(field, (models.ForeignKey, models.OneToOneField)):
-                    # Identifiant
-                    if not no_ids:
-                        data[(field_name + str(_(" (ID)"))) if labels else field.attname] = value
-                    if fks or uids:
-                        fk = getattr(self, field.name, None)
-                        # Données
-                        if fks and fk:
-                            data[field_name] = to_dict(fk, **keywords)
-                            data[field_name].pop('_state', None)  # Non serialisable
-                        # GUID (uniquement entité)
-                        if uids and isinstance(fk, Entity):
-                            data[field_name + str(_(" (UID)") if labels else '_uid')] = fk.uuid
-                # Gestion des valeurs nulles (hors clés étrangères)
-                elif value is None and not no_empty:
-                    data[field_name] = None
-                # Cas spécifique du champ binaire (pickle)
-                elif isinstance(field, PickleField):
-                    result = value if raw else pickle.dumps(value)
-                    if result or not no_empty:
-                        data[field_name] = result
-                # Cas spécifique des champs fichier & image
-                elif isinstance(field, (models.FileField, models.ImageField)):
-                    result = (value if raw else getattr(value, 'url', None)) if value else None
-                    if result or not no_empty:
-                        data[field_name] = result
-                # Cas spécifique pour les listes
-                elif isinstance(value, (list, set, tuple)):
-                    result = list(value) if raw else ','.join(str(val) for val in value)
-                    if result or not no_empty:
-                        data[field_name] = result
-                elif hasattr(self, 'get_{}_json'.format(field.name)):
-                    result = getattr(self, 'get_{}_json'.format(field.name))()
-                    if result or not no_empty:
-                        data[field_name] = result
-                elif not is_empty(value) or not no_empty:
-                    data[field_name] = value
-                if display and hasattr(self, 'get_{}_display'.format(field.name)):
-                    result = getattr(self, 'get_{}_display'.format(field.name))()
-                    if result or not no_empty:
-                        data[field_name + str(_(" (libellé)") if labels else '_display')] = result
+        # Application du plan de sérialisation des champs du modèle
+        plan = get_to_dict_plan(
+            meta.model,
+            includes=frozenset(includes) if includes else None,
+            excludes=frozenset(excludes) if excludes else None,
+            editables=editables, uids=uids, display=display, labels=labels, fks=fks, m2m=m2m,
+            no_ids=no_ids, no_empty=no_empty, raw=raw,
+            language=get_language() if labels else None)
+        for step in plan:
+            step(self, data, keywords)
         # Gestion des métadonnées
         if metadata:
             current_metadata = self.get_metadata()
@@ -655,23 +1441,30 @@ class CommonModel(models.Model):
                     data[field] = item
         return data
 
-    def m2m_to_dict(self, raw=False, as_dict=False, *args, **kwargs):
+    def m2m_to_dict(self, raw=False, as_dict=False, *args, fields=None, **kwargs):
         """
         Retourne toutes les relations de type ManyToMany classées par attribut
         :param raw: Récupère les instances des modèles à la place des identifiants
         :param as_dict: Récupère les instances des modèles en tant que dictionnaires et non d'objets
+        :param fields: Noms des champs many-to-many à récupérer (tous par défaut)
         :return: Dictionnaire
         """
         data = {}
         if self.pk is None:
             return data
         meta = self._meta
+        prefetched = getattr(self, '_prefetched_objects_cache', None) or {}
         for field in meta.many_to_many:
+            if fields is not None and field.name not in fields:
+                continue
             if raw or as_dict:
                 values = field.value_from_object(self)
                 if as_dict:
                     values = [to_dict(value) for value in values]
                 data[field.name] = values
+            elif field.name in prefetched:
+                # Réutilisation des données préchargées
+                data[field.name] = [value.pk for value in prefetched[field.name]]
             else:
                 data[field.name] = list(getattr(self, field.name).values_list('pk', flat=True))
         return data
@@ -721,9 +1514,13 @@ class CommonModel(models.Model):
         :param options: Paramètres de la fonction .to_dict()
         :return: Set structuré par (champ, (valeur avant, valeur après))
         """
-        old_data = self._copy
-        if options:
-            old_data = type(self)(**self._copy).to_dict(**options)
+        if self._snapshot is None or not self._dirty:
+            return {}
+        # Seuls les champs affectés depuis la capture de l'état initial sont comparés
+        if not set(options) - {'editables'}:
+            fields = get_tracked_fields(type(self))
+            options.update(includes=[fields[attname] for attname in self._dirty])
+        old_data = self.get_snapshot_instance().to_dict(**options)
         new_data = self.to_dict(**options)
         keys = set(old_data.keys()) | set(new_data.keys())
         return {k: (old_data.get(k), new_data.get(k)) for k in keys if old_data.get(k) != new_data.get(k)}
@@ -740,7 +1537,8 @@ class CommonModel(models.Model):
         """
         Retourne les identifiants modifiés sur les relations de type many-to-many de l'entité
         """
-        old_data, new_data = self._copy_m2m, self.m2m_to_dict()
+        old_data = self._copy_m2m or {}
+        new_data = self.get_m2m_snapshot(*old_data)
         keys = set(old_data.keys()) | set(new_data.keys())
         return {k: (old_data.get(k), new_data.get(k)) for k in keys if old_data.get(k) != new_data.get(k)}
 
@@ -787,6 +1585,197 @@ class CommonModel(models.Model):
         abstract = True
 
 
+class HistoryQuerySet(CommonQuerySet):
+    """
+    QuerySet des historiques
+    """
+
+    def restore_bulk(self, *, ignore_log=None, current_user=None, reason=None, from_admin=None, all_fields=False):
+        """
+        Restaure en masse les entités des historiques du QuerySet
+        Les historiques sont regroupés par type d'entité : les entités existantes sont chargées en une seule requête
+        par type puis modifiées via `bulk_update`, les entités supprimées sont recréées via `bulk_create`,
+        les relations many-to-many et les données du collecteur sont rejouées de manière ensembliste
+        et les historiques de restauration sont insérés en masse
+        :param ignore_log: Ignorer l'historisation ?
+        :param current_user: Utilisateur à l'origine de la restauration
+        :param reason: Message d'information associé aux historiques de restauration
+        :param from_admin: Indique que la restauration a été demandée via l'interface d'administration ?
+        :param all_fields: Restaurer également les données non éditables ?
+        :return: Dictionnaire du résultat par identifiant d'historique (vrai, faux ou erreur rencontrée)
+        """
+        current_user = current_user or get_current_user()
+        groups, results = {}, {}
+        # Comme pour une restauration unitaire du plus récent au plus ancien,
+        # c'est l'historique le plus ancien de chaque entité qui détermine son état final
+        for history in self.select_related('content_type').order_by('-creation_date', '-pk'):
+            if not history.content_type:
+                results[history.pk] = False
+                continue
+            histories = groups.setdefault(history.content_type, {})
+            others = histories.pop(history.object_id, (None, []))[1]
+            histories[history.object_id] = (history, others + [history.pk])
+        for content_type, histories in groups.items():
+            model = content_type.model_class()
+            try:
+                with transaction.atomic(using=router.db_for_write(model)):
+                    restored = self._restore_entities(
+                        model, dict((key, history) for key, (history, others) in histories.items()),
+                        ignore_log=ignore_log, current_user=current_user, reason=reason,
+                        from_admin=from_admin, all_fields=all_fields)
+                for history, others in histories.values():
+                    results.update({pk: history.pk in restored for pk in others})
+            except Exception as error:
+                logger.warning(error, exc_info=True)
+                for history, others in histories.values():
+                    results.update({pk: error for pk in others})
+        date = now()
+        for restored in (True, False):
+            pks = [pk for pk, result in results.items() if (result is True) is restored]
+            if pks:
+                History.objects.filter(pk__in=pks).update(restored=restored, restoration_date=date)
+        return results
+
+    @staticmethod
+    def _restore_entities(model, histories, *, ignore_log=None, current_user=None, reason=None,
+                          from_admin=None, all_fields=False):
+        """
+        Restaure en masse les entités d'un même type
+        :param model: Modèle des entités
+        :param histories: Historiques à restaurer par identifiant d'entité
+        :return: Identifiants des historiques restaurés
+        """
+        meta = model._meta
+        date = now()
+        tracked = get_tracked_fields(model)
+        entities = {str(pk): entity for pk, entity in model._default_manager.in_bulk(list(histories)).items()}
+        restored, updated, created, datas = [], [], [], []
+        for object_id, history in histories.items():
+            data = dict(history.get_full_data() or {})
+            if not data:
+                continue
+            entity = entities.get(str(object_id)) or model()
+            for field_name, value in data.items():
+                try:
+                    field = meta.get_field(field_name)
+                except FieldDoesNotExist:
+                    continue
+                if not field.concrete or field.many_to_many or (not all_fields and not field.editable):
+                    continue
+                setattr(entity, field.attname, field.to_python(value))
+            entity._from_admin, entity._restore = from_admin, True
+            entity._current_user, entity._reason = current_user, reason
+            if isinstance(entity, Entity):
+                entity.current_user = current_user
+            # Les champs de date avec auto_now=True ne sont pas gérés par bulk_update
+            for field in meta.concrete_fields:
+                if getattr(field, 'auto_now', False):
+                    setattr(entity, field.attname, date)
+            status = None
+            if entity._state.adding and entity.pk is None:
+                # Sans clé primaire connue, l'entité est recréée par la sauvegarde habituelle (historique compris)
+                entity.save(_current_user=current_user, _ignore_log=ignore_log, _reason=reason)
+            elif entity._state.adding:
+                status = History.CREATE
+                created.append(entity)
+            else:
+                status = History.UPDATE
+                updated.append(entity)
+            datas.append((entity, history, data, entity._copy, status))
+            restored.append(history.pk)
+
+        # Écriture des entités (l'historisation et les notifications des entités sont gérées ci-après)
+        options = dict(_force_default=True) if issubclass(model, Entity) else {}
+        if updated:
+            fields = {tracked[attname] for entity in updated for attname in entity._dirty} - {meta.pk.name}
+            if fields:
+                model._default_manager.bulk_update(updated, fields=sorted(fields), **options)
+        if created:
+            model._default_manager.bulk_create(created, **options)
+            for entity in created:
+                entity._state.adding = False
+            if issubclass(model, Entity):
+                Global.objects.register(created)
+
+        # Relations many-to-many remplacées en une suppression et une insertion par champ
+        for field in meta.many_to_many:
+            values = {}
+            for entity, history, data, old_data, status in datas:
+                value = data.get(field.name, []) or data.get(field.name + '_ids', [])
+                if value:
+                    values[entity.pk] = {field.target_field.to_python(item) for item in value}
+            if not values:
+                continue
+            try:
+                through = field.remote_field.through
+                source = through._meta.get_field(field.m2m_field_name()).attname
+                target = through._meta.get_field(field.m2m_reverse_field_name()).attname
+                links = through._default_manager.filter(**{source + '__in': list(values)})
+                removed, existing = [], set()
+                for pk, source_id, target_id in links.values_list('pk', source, target):
+                    if target_id in values[source_id]:
+                        existing.add((source_id, target_id))
+                    else:
+                        removed.append(pk)
+                if removed:
+                    through._default_manager.filter(pk__in=removed).delete()
+                through._default_manager.bulk_create([
+                    through(**{source: pk, target: target_id})
+                    for pk, target_ids in values.items() for target_id in target_ids
+                    if (pk, target_id) not in existing])
+            except Exception as error:
+                logger.warning(error, exc_info=True)
+
+        # Données du collecteur rejouées en une requête par modèle et par champ
+        updates, inserts = {}, {}
+        for entity, history, data, old_data, status in datas:
+            for model_label, fields in (history.collector_update or {}).items():
+                for field_name, values in fields.items():
+                    updates.setdefault((model_label, field_name), {}).setdefault(entity.pk, []).extend(values)
+            for model_label, values in (history.collector_delete or {}).items():
+                inserts.setdefault(model_label, []).extend(values)
+        for (model_label, field_name), values in updates.items():
+            try:
+                related = apps.get_model(model_label)
+                field = related._meta.get_field(field_name)
+                pks = [pk for items in values.values() for pk in items]
+                filters = Q(**{field_name + '__isnull': True})
+                if all(isinstance(v, str) for v in pks):
+                    filters |= Q(**{field_name: ''})
+                related.objects.filter(filters, pk__in=pks).update(**{field_name: Case(*[
+                    When(pk__in=items, then=Value(pk, output_field=field)) for pk, items in values.items()])})
+            except Exception as error:
+                logger.warning(error, exc_info=True)
+        for model_label, values in inserts.items():
+            try:
+                related = apps.get_model(model_label)
+                objects = []
+                for value in values:
+                    value = {key if key.endswith('_id') else key + '_id': item for key, item in value.items()}
+                    # Seules les valeurs des champs du modèle sont conservées
+                    objects.append(related(**{field.attname: value[field.attname] for field in related._meta.fields
+                                              if field.attname in value}))
+                related.objects.bulk_create(objects, ignore_conflicts=True)
+            except Exception as error:
+                logger.warning(error, exc_info=True)
+
+        # Historiques de restauration et notifications
+        histories = []
+        for entity, history, data, old_data, status in datas:
+            if not status:
+                continue
+            new_data = entity.to_dict(editables=True)
+            if issubclass(model, Entity) and not ignore_log and not settings.IGNORE_LOG:
+                changes = get_changes(old_data, new_data)
+                if changes:
+                    histories.append(build_save_history(TaskPayload.encode(
+                        entity, History.RESTORE, data=old_data, changes=changes)))
+            run_notify_changes(entity, status, old_data=old_data, new_data=new_data)
+            entity._snapshot, entity._dirty = None, frozenset()
+        save_histories(histories)
+        return restored
+
+
 class HistoryCommon(CommonModel):
     """
     Abstraction commune aux historiques et champs modifiés
@@ -862,7 +1851,11 @@ class History(HistoryCommon):
     collector_delete = JsonField(
         blank=True, null=True, editable=False,
         verbose_name=_("suppressions"))
+    delta = models.BooleanField(
+        default=False, editable=False,
+        verbose_name=_("différentiel"))
     entity = CustomGenericForeignKey()
+    objects = HistoryQuerySet.as_manager()
 
     _model = None
 
@@ -878,6 +1871,36 @@ class History(HistoryCommon):
             status=self.get_status_display(),
             content_type=self.content_type, object_id=self.object_id)
 
+    def get_full_data(self):
+        """
+        Reconstitue les données complètes de l'entité avant la modification historisée
+        Pour un historique différentiel, les différences sont rejouées à rebours depuis le point de contrôle suivant
+        le plus proche ou à défaut depuis l'état actuel de l'entité
+        :return: Dictionnaire
+        """
+        if not self.delta:
+            return self.data
+        histories = History.objects.filter(
+            content_type_id=self.content_type_id, object_id=self.object_id, pk__gt=self.pk)
+        checkpoint = histories.filter(
+            status__in=(History.UPDATE, History.RESTORE, History.DELETE), delta=False).order_by('pk').first()
+        deltas = histories.filter(status__in=(History.UPDATE, History.RESTORE), delta=True)
+        if checkpoint:
+            data = dict(checkpoint.data or {})
+            deltas = deltas.filter(pk__lt=checkpoint.pk)
+            # Les relations many-to-many de l'historique de suppression ne sont pas reconstituées
+            if checkpoint.status == History.DELETE and self.model:
+                for field in self.model._meta.many_to_many:
+                    data.pop(field.name, None)
+                    data.pop(field.name + '_ids', None)
+        else:
+            entity = self.entity
+            data = entity.to_dict(editables=True) if entity else {}
+        for delta in deltas.order_by('-pk').values_list('data', flat=True):
+            data.update(delta or {})
+        data.update(self.data or {})
+        return data
+
     def restore(self, *, ignore_log=None, current_user=None, reason=None,
                 force_default=False, from_admin=None, all_fields=False, override=None):
         """
@@ -891,7 +1914,7 @@ class History(HistoryCommon):
         :param override: Surcharge des données de la restauration
         """
         try:
-            data = self.data
+            data = self.get_full_data()
             data.update(override or {})
             entity = self.entity
             if not entity:
@@ -1085,20 +2108,225 @@ class HistoryField(HistoryCommon):
         verbose_name_plural = _("historiques de champs modifiés")
 
 
-class GlobalManager(models.Manager):
+def get_states_as_of(model, date, queryset):
     """
-    Manager global
+    Reconstitue l'état des entités à une date passée à partir de leur historique
+    Pour chaque entité, seules les données du premier historique postérieur à la date et des historiques différentiels
+    le séparant du point de contrôle suivant sont lues, le nombre de requêtes ne dépend pas du nombre d'entités
+    :param model: Modèle
+    :param date: Date de référence
+    :param queryset: QuerySet des entités concernées
+    :return: Dictionnaire des données de chaque entité par clé primaire (None si l'entité n'existait pas)
     """
-
-    def entity(self, uuid):
-        """
-        Récupération directe d'une entité à partir de son identifiant unique
+    date = parsedate(date)
+    assert date, _("A valid reference date is required.")
+    # Etat actuel des entités, utilisé en l'absence de modification ultérieure ou de point de contrôle
+    pk_name = model._meta.pk.name
+    currents = {str(data[pk_name]): data for data in queryset.iter_dict(editables=True)}
+    states = {object_id: data[pk_name] for object_id, data in currents.items()}
+
+    # Parcours des historiques postérieurs à la date sans leurs données
+    histories = History.objects.filter(
+        content_type=get_content_type(model),
+        object_id__in=queryset.annotate(_object_id=Cast('pk', models.TextField())).values('_object_id'),
+        creation_date__gt=date,
+        status__in=(History.CREATE, History.UPDATE, History.RESTORE, History.DELETE))
+    chains, closed = {}, set()
+    for pk, object_id, status, delta in histories.order_by('pk').values_list(
+            'pk', 'object_id', 'status', 'delta').iterator():
+        if object_id in closed:
+            continue
+        chains.setdefault(object_id, []).append((pk, status, delta))
+        if not delta:
+            closed.add(object_id)  # Point de contrôle atteint
+
+    # Récupération des données strictement nécessaires à la reconstitution
+    needed = [pk for chain in chains.values() if chain[0][1] != History.CREATE for pk, status, delta in chain]
+    datas = {}
+    for index in range(0, len(needed), 1000):
+        datas.update(History.objects.filter(pk__in=needed[index:index + 1000]).values_list('pk', 'data'))
+
+    # Les différences sont rejouées à rebours depuis le point de contrôle ou l'état actuel de l'entité
+    m2m_names = [field.name for field in model._meta.many_to_many]
+    results = {}
+    for object_id, pk in states.items():
+        chain = chains.get(object_id)
+        if not chain:
+            results[pk] = currents[object_id]
+            continue
+        if chain[0][1] == History.CREATE:
+            results[pk] = None
+            continue
+        last_pk, last_status, last_delta = chain[-1]
+        if last_delta:
+            data = dict(currents[object_id])
+        else:
+            data = dict(datas.get(last_pk) or {})
+            chain = chain[:-1]
+            if last_status == History.DELETE:
+                for name in m2m_names:
+                    data.pop(name, None)
+        for history_pk, status, delta in reversed(chain):
+            data.update(datas.get(history_pk) or {})
+        results[pk] = data
+    return results
+
+
+class GlobalIndex(object):
+    """
+    Index des références globales (identifiant unique vers type et identifiant de l'entité) sur deux niveaux :
+    un cache LRU propre au processus puis le cache de Django, les références inconnues étant lues en une seule requête
+    Les références sont invalidées à la sauvegarde et à la suppression des références globales ; cette invalidation ne
+    concernant que le cache local du processus courant, les références locales expirent comme celles du cache de Django
+    """
+    _local = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def to_uuid(value):
         """
+        Convertit une valeur en identifiant unique
+        :param value: Valeur
+        :return: UUID ou None si la valeur est invalide
+        """
+        if isinstance(value, uuid.UUID):
+            return value
         try:
-            return self.get(object_uid=uuid).entity
-        except Exception:
+            return uuid.UUID(str(value))
+        except (AttributeError, TypeError, ValueError):
             return None
 
+    @staticmethod
+    def get_key(object_uid):
+        return 'GLOBAL_{}'.format(object_uid)
+
+    @classmethod
+    def resolve(cls, uuids):
+        """
+        Récupère les références globales d'un ensemble d'identifiants uniques
+        :param uuids: Identifiants uniques (UUID)
+        :return: Dictionnaire des tuples (identifiant du type d'entité, identifiant de l'entité) par UUID
+        """
+        results, missing = {}, set()
+        current_time = time.monotonic()
+        with cls._lock:
+            for object_uid in uuids:
+                reference, expiry = cls._local.get(object_uid, (None, None))
+                if reference is None or (expiry is not None and expiry <= current_time):
+                    cls._local.pop(object_uid, None)
+                    missing.add(object_uid)
+                else:
+                    cls._local.move_to_end(object_uid)
+                    results[object_uid] = reference
+        if not missing:
+            return results
+        found = {}
+        keys = {cls.get_key(object_uid): object_uid for object_uid in missing}
+        for key, reference in cache.get_many(list(keys)).items():
+            found[keys[key]] = tuple(reference)
+        missing -= set(found)
+        if missing:
+            references = {
+                object_uid: (content_type_id, object_id)
+                for object_uid, content_type_id, object_id in Global.objects.filter(
+                    object_uid__in=list(missing)).values_list('object_uid', 'content_type_id', 'object_id')}
+            if references:
+                cache.set_many({
+                    cls.get_key(object_uid): reference for object_uid, reference in references.items()},
+                    timeout=settings.GLOBAL_CACHE_TIMEOUT)
+            found.update(references)
+        timeout = settings.GLOBAL_CACHE_TIMEOUT
+        expiry = None if timeout is None else current_time + timeout
+        with cls._lock:
+            cls._local.update({object_uid: (reference, expiry) for object_uid, reference in found.items()})
+            while len(cls._local) > settings.GLOBAL_CACHE_SIZE:
+                cls._local.popitem(last=False)
+        results.update(found)
+        return results
+
+    @classmethod
+    def invalidate(cls, *uuids):
+        """
+        Invalide les références globales d'identifiants uniques
+        :param uuids: Identifiants uniques (UUID)
+        :return: Rien
+        """
+        with cls._lock:
+            for object_uid in uuids:
+                cls._local.pop(object_uid, None)
+        cache.delete_many([cls.get_key(object_uid) for object_uid in uuids])
+
+    @classmethod
+    def clear(cls):
+        """
+        Vide le cache local des références globales
+        :return: Rien
+        """
+        with cls._lock:
+            cls._local.clear()
+
+
+class GlobalQuerySet(GenericPrefetchMixin, models.QuerySet):
+    """
+    QuerySet des références globales
+    """
+
+
+class GlobalManager(models.Manager.from_queryset(GlobalQuerySet)):
+    """
+    Manager global
+    """
+
+    def entity(self, uuid):
+        """
+        Récupération directe d'une entité à partir de son identifiant unique
+        """
+        return self.entities([uuid]).get(uuid)
+
+    def entities(self, uuids):
+        """
+        Récupération directe d'un ensemble d'entités à partir de leurs identifiants uniques
+        Les références sont lues depuis l'index (voir GlobalIndex) puis les entités en une requête par type d'entité
+        :param uuids: Identifiants uniques
+        :return: Dictionnaire des entités par identifiant unique (tel que fourni, les entités inconnues sont absentes)
+        """
+        keys = {}
+        for value in uuids:
+            object_uid = GlobalIndex.to_uuid(value)
+            if object_uid:
+                keys[object_uid] = value
+        if not keys:
+            return {}
+        groups = {}
+        for object_uid, (content_type_id, object_id) in GlobalIndex.resolve(keys).items():
+            groups.setdefault(content_type_id, {})[object_id] = keys[object_uid]
+        results = {}
+        for content_type_id, references in groups.items():
+            model = ContentType.objects.get_for_id(content_type_id).model_class()
+            if not model:
+                continue
+            for pk, instance in model._base_manager.in_bulk(list(references)).items():
+                key = references.get(str(pk))
+                if key is not None:
+                    results[key] = instance
+        return results
+
+    def register(self, instances, batch_size=None):
+        """
+        Référence en masse des entités nouvellement créées dans le référentiel global
+        :param instances: Instances des entités (d'un même type)
+        :param batch_size: Nombre de références par requête
+        :return: Références créées
+        """
+        instances = [
+            instance for instance in instances
+            if instance.pk is not None and instance.uuid and not instance._ignore_global]
+        if settings.IGNORE_GLOBAL or not instances or instances[0]._meta.pk.remote_field:
+            return []
+        return self.bulk_create([
+            Global(content_type=instance.model_type, object_id=instance.pk, object_uid=instance.uuid)
+            for instance in instances], batch_size=batch_size)
+
 
 class Global(models.Model):
     """
@@ -1128,6 +2356,35 @@ class Global(models.Model):
         unique_together = ('content_type', 'object_id')
 
 
+class Outbox(models.Model):
+    """
+    Boîte d'envoi des tâches d'historisation et de notification
+    Les tâches y sont inscrites dans la transaction de la modification puis exécutées par `run_outbox_worker`
+    """
+    creation_date = models.DateTimeField(
+        auto_now_add=True, editable=False,
+        verbose_name=_("date"))
+    task = models.CharField(
+        max_length=100, editable=False,
+        verbose_name=_("tâche"))
+    args = JsonField(
+        editable=False,
+        verbose_name=_("arguments"))
+    attempts = models.PositiveSmallIntegerField(
+        default=0, editable=False,
+        verbose_name=_("tentatives"))
+    error = models.TextField(
+        blank=True, null=True, editable=False,
+        verbose_name=_("erreur"))
+
+    def __str__(self):  # pragma: no cover
+        return _("{task} #{id}").format(task=self.task, id=self.pk)
+
+    class Meta:
+        verbose_name = _("tâche en attente")
+        verbose_name_plural = _("tâches en attente")
+
+
 class EntityQuerySet(CommonQuerySet):
     """
     QuerySet des entités
@@ -1140,13 +2397,28 @@ class EntityQuerySet(CommonQuerySet):
     _from_admin = False
     _force_default = False
 
-    def delete(self, _ignore_log=None, _current_user=None, _reason=None, _force_default=False):
+    # Nombre d'entités supprimées par lot
+    delete_batch_size = 1000
+
+    def _clone(self):
+        clone = super()._clone()
+        for key in ('_ignore_log', '_current_user', '_reason', '_from_admin', '_force_default'):
+            if key in self.__dict__:
+                setattr(clone, key, self.__dict__[key])
+        return clone
+
+    def delete(self, _ignore_log=None, _current_user=None, _reason=None, _force_default=False, _batch_size=None):
         """
         Surcharge de la suppression des entités du QuerySet
+        Les entités sont supprimées par lots au sein d'une même transaction : pour chaque lot, les données des entités
+        et les identifiants de leurs relations many-to-many sont lus en une requête par relation, les historiques de
+        suppression (données du collecteur comprises) sont insérés en masse puis les entités sont supprimées
         :param _ignore_log: Ignorer l'historique de suppression ?
         :param _current_user: Utilisateur à l'origine de la suppression
         :param _reason: Raison de la suppression
         :param _force_default: Force la suppression directe ?
+        :param _batch_size: Nombre d'entités supprimées par lot
+        :return: Tuple (nombre total d'éléments supprimés, nombre d'éléments supprimés par modèle)
         """
         if _force_default or self._force_default:
             return super().delete()
@@ -1155,30 +2427,110 @@ class EntityQuerySet(CommonQuerySet):
         if self._fields is not None:
             raise TypeError(_("Cannot call delete() after .values() or .values_list()"))
 
-        del_query = self._clone()
-        for element in del_query:
-            element._ignore_log = _ignore_log or self._ignore_log
-            element._current_user = _current_user or self._current_user or get_current_user()
-            element._reason = _reason or self._reason
-            element._from_admin = self._from_admin
-
+        del_query = self._chain()
         del_query._for_write = True
         del_query.query.select_for_update = False
         del_query.query.select_related = False
         del_query.query.clear_ordering(force_empty=True)
 
-        collector = Collector(using=del_query.db)
-        collector.collect(del_query)
-        self._collector_update = {key._meta.label: {
-            field.name: [instance.pk for instance in instances] for (field, value), instances in value.items()
-        } for key, value in collector.field_updates.items()}
-        self._collector_delete = {key._meta.label: [
-            to_dict(value, excludes=('id', )) for value in values
-        ] for key, values in collector.data.items() if key._meta.auto_created}
-        deleted, _rows_count = collector.delete()
+        options = dict(
+            _ignore_log=_ignore_log or self._ignore_log,
+            _current_user=_current_user or self._current_user or get_current_user(),
+            _reason=_reason or self._reason,
+            _from_admin=self._from_admin)
+        batch_size = _batch_size or self.delete_batch_size
+        deleted, rows_count, last_pk = 0, {}, None
+        # La suppression reste atomique, les lots ne servent qu'à borner la mémoire et la taille des requêtes
+        with transaction.atomic(using=del_query.db):
+            while True:
+                # Identifiants lus par lot dans l'ordre des clés primaires à partir du dernier lot supprimé
+                queryset = del_query if last_pk is None else del_query.filter(pk__gt=last_pk)
+                pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+                if not pks:
+                    break
+                batch_deleted, batch_rows_count = self._delete_batch(pks, **options)
+                deleted += batch_deleted
+                for label, count in batch_rows_count.items():
+                    rows_count[label] = rows_count.get(label, 0) + count
+                last_pk = pks[-1]
 
         self._result_cache = None
-        return deleted, _rows_count
+        return deleted, rows_count
+
+    def _delete_batch(self, pks, **options):
+        """
+        Supprime un lot d'entités après avoir inséré en masse leurs historiques de suppression
+        Les relations many-to-many de l'entité sont lues puis supprimées en une requête par relation, seules les
+        entités et leurs dépendances sont collectées par Django (instances construites sans suivi des modifications)
+        :param pks: Identifiants des entités
+        :param options: Propriétés liées à l'historisation des entités supprimées
+        :return: Tuple (nombre d'éléments supprimés, nombre d'éléments supprimés par modèle)
+        """
+        model, using = self.model, self.db
+        log = not settings.IGNORE_LOG and not options['_ignore_log']
+        # Relations many-to-many lues et supprimées en une requête par relation
+        m2m, m2m_delete, m2m_count = {pk: {} for pk in pks}, {pk: {} for pk in pks}, {}
+        for field in model._meta.many_to_many:
+            through = field.remote_field.through
+            if not through._meta.auto_created:
+                continue
+            source = through._meta.get_field(field.m2m_field_name())
+            target = through._meta.get_field(field.m2m_reverse_field_name())
+            queryset = through._base_manager.using(using).filter(**{source.attname + '__in': pks})
+            if log:
+                content_type = to_dict(get_content_type(through), types=False)
+                for pk in pks:
+                    m2m[pk][field.name + '_ids'] = []
+                for values in queryset.order_by('pk').values('pk', source.attname, target.attname):
+                    source_id, target_id = values[source.attname], values[target.attname]
+                    m2m[source_id][field.name + '_ids'].append(target_id)
+                    m2m_delete[source_id].setdefault(through._meta.label, []).append({
+                        'id': values['pk'], source.name: source_id, target.name: target_id,
+                        '_content_type': content_type})
+            count = queryset._raw_delete(using)
+            if count:
+                m2m_count[through._meta.label] = count
+        queryset = model._base_manager.using(using).filter(pk__in=pks)
+        queryset._iterable_class = UntrackedModelIterable
+        collector = Collector(using=using)
+        collector.collect(queryset)
+        for instances in collector.data.values():
+            for instance in instances:
+                for key, value in options.items():
+                    setattr(instance, key, value)
+        instances = [instance for instance in collector.data.get(model, ()) if isinstance(instance, Entity)]
+        if instances and log:
+            pks = [instance.pk for instance in instances]
+            # Données du collecteur réparties entre les entités supprimées
+            collector_update, collector_delete = {pk: {} for pk in pks}, {pk: m2m_delete.get(pk, {}) for pk in pks}
+            for related, values in collector.field_updates.items():
+                for (field, value), objs in values.items():
+                    if field.related_model is not model:
+                        continue
+                    for obj in objs:
+                        collector_update.get(getattr(obj, field.attname), {}).setdefault(
+                            related._meta.label, {}).setdefault(field.name, []).append(obj.pk)
+            for related, objs in collector.data.items():
+                if not related._meta.auto_created:
+                    continue
+                fields = [field for field in related._meta.fields if field.related_model is model]
+                for obj in objs:
+                    pk = next((getattr(obj, field.attname) for field in fields), None)
+                    collector_delete.get(pk, {}).setdefault(related._meta.label, []).append(
+                        to_dict(obj, excludes=('id', )))
+            histories = []
+            for instance in instances:
+                instance._collector_update = collector_update[instance.pk] or None
+                instance._collector_delete = collector_delete[instance.pk] or None
+                data = dict(instance.to_dict(editables=True), **m2m[instance.pk])
+                histories.append((TaskPayload.new_history(TaskPayload.encode(instance, History.DELETE), data), ()))
+                # L'historique de suppression est enregistré ci-dessous en une seule insertion
+                instance._ignore_log = True
+            save_histories(histories)
+        deleted, rows_count = collector.delete()
+        for label, count in m2m_count.items():
+            rows_count[label] = rows_count.get(label, 0) + count
+        return deleted + sum(m2m_count.values()), rows_count
 
     def create(self, _ignore_log=None, _current_user=None, _reason=None, _force_default=False, **kwargs):
         """
@@ -1195,6 +2547,201 @@ class EntityQuerySet(CommonQuerySet):
                  _ignore_log=_ignore_log, _current_user=_current_user or get_current_user(), _reason=_reason)
         return obj
 
+    def update(self, _ignore_log=None, _current_user=None, _reason=None, _force_default=False, _auto_now=False,
+               **kwargs):
+        """
+        Surcharge de la mise à jour des entités du QuerySet
+        Les données précédentes sont lues en une seule requête avant la mise à jour, les historiques de modification
+        sont ensuite insérés en masse et les changements notifiés en un seul message (la lecture préalable n'est
+        effectuée que si les changements sont historisés ou notifiés)
+        :param _ignore_log: Ignorer l'historique de modification ?
+        :param _current_user: Utilisateur à l'origine de la modification
+        :param _reason: Raison de la modification
+        :param _force_default: Force la mise à jour directe ?
+        :param _auto_now: Met également à jour les dates de modification et le dernier utilisateur des entités ?
+        :param kwargs: Valeurs à modifier
+        :return: Nombre d'entités modifiées
+        """
+        if _force_default or self._force_default:
+            return super().update(**kwargs)
+        assert self.query.can_filter(), _("Cannot update a query once a slice has been taken.")
+        current_user = _current_user or self._current_user or get_current_user()
+        if _auto_now:
+            for field in self.model._meta.concrete_fields:
+                if getattr(field, 'auto_now', False):
+                    kwargs.setdefault(field.name, now())
+            kwargs.setdefault('current_user', current_user)
+        if not self._is_tracked(History.UPDATE, _ignore_log):
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db, savepoint=False):
+            instances = list(self.untracked())
+            old_datas = [instance.to_dict(editables=True) for instance in instances]
+            rows = super().update(**kwargs)
+            if any(hasattr(value, 'resolve_expression') for value in kwargs.values()):
+                # Les valeurs calculées par la base de données sont relues en une seule requête
+                news = self.model.objects.untracked().in_bulk([instance.pk for instance in instances])
+                instances = [news.get(instance.pk, instance) for instance in instances]
+            else:
+                for instance in instances:
+                    for key, value in kwargs.items():
+                        setattr(instance, key, value)
+            changes = [(old_data, instance.to_dict(editables=True)) for instance, old_data in zip(instances, old_datas)]
+            self._log_changes(History.UPDATE, instances, changes, _ignore_log, current_user, _reason)
+        return rows
+
+    def bulk_create(self, objs, batch_size=None, ignore_conflicts=False,
+                    _ignore_log=None, _current_user=None, _reason=None, _force_default=False):
+        """
+        Surcharge de la création en masse des entités
+        Les entités sont référencées dans le référentiel global, historisées et notifiées par lots
+        (les clés primaires non retournées par la base de données sont relues à partir des UUID, sauf en cas
+        d'insertion ignorant les conflits où seules les entités dont la clé primaire est connue sont concernées)
+        :param objs: Entités à créer
+        :param batch_size: Nombre d'entités par requête
+        :param ignore_conflicts: Ignorer les entités en conflit ?
+        :param _ignore_log: Ignorer l'historique de création ?
+        :param _current_user: Utilisateur à l'origine de la création
+        :param _reason: Raison de la création
+        :param _force_default: Force la création directe ?
+        :return: Entités
+        """
+        if _force_default or self._force_default:
+            return super().bulk_create(objs, batch_size=batch_size, ignore_conflicts=ignore_conflicts)
+        objs = list(objs)
+        current_user = _current_user or self._current_user or get_current_user()
+        for obj in objs:
+            obj.uuid = obj.uuid or uuid.uuid4()
+            obj._current_user = obj.current_user = obj._current_user or current_user
+        old_datas = [obj.to_dict(editables=True) for obj in objs]
+        with transaction.atomic(using=self.db, savepoint=False):
+            objs = super().bulk_create(objs, batch_size=batch_size, ignore_conflicts=ignore_conflicts)
+            if not ignore_conflicts:
+                self._set_missing_pks(objs)
+            created = [(obj, old_data) for obj, old_data in zip(objs, old_datas) if obj.pk is not None]
+            Global.objects.register([obj for obj, old_data in created], batch_size=batch_size)
+            self._log_changes(
+                History.CREATE, [obj for obj, old_data in created],
+                [(old_data, obj.to_dict(editables=True)) for obj, old_data in created],
+                _ignore_log, current_user, _reason)
+        for obj in objs:
+            obj._snapshot, obj._dirty = None, frozenset()
+        return objs
+
+    def _set_missing_pks(self, objs):
+        """
+        Récupère les clés primaires des entités insérées en masse lorsque la base de données ne les retourne pas
+        :param objs: Entités insérées
+        :return: Rien
+        """
+        missing = {obj.uuid: obj for obj in objs if obj.pk is None}
+        if not missing:
+            return
+        uuids = list(missing)
+        batch_size = max(connections[self.db].ops.bulk_batch_size(['uuid'], uuids), 1)
+        queryset = self.model._base_manager.using(self.db)
+        for index in range(0, len(uuids), batch_size):
+            for uid, pk in queryset.filter(uuid__in=uuids[index:index + batch_size]).values_list('uuid', 'pk'):
+                obj = missing[uid]
+                obj.pk = pk
+                obj._state.adding, obj._state.db = False, self.db
+
+    def bulk_update(self, objs, fields, batch_size=None,
+                    _ignore_log=None, _current_user=None, _reason=None, _force_default=False):
+        """
+        Surcharge de la modification en masse des entités
+        Les données précédentes sont lues en une seule requête, les historiques de modification sont ensuite insérés
+        en masse et les changements notifiés en un seul message
+        :param objs: Entités à modifier
+        :param fields: Noms des champs à modifier
+        :param batch_size: Nombre d'entités par requête
+        :param _ignore_log: Ignorer l'historique de modification ?
+        :param _current_user: Utilisateur à l'origine de la modification
+        :param _reason: Raison de la modification
+        :param _force_default: Force la modification directe ?
+        :return: Rien
+        """
+        if _force_default or self._force_default:
+            return super().bulk_update(objs, fields, batch_size=batch_size)
+        objs = list(objs)
+        if not objs:
+            return
+        current_user = _current_user or self._current_user or get_current_user()
+        date = now()
+        concrete_fields = {field.name: field for field in self.model._meta.concrete_fields}
+        fields = set(fields)
+        for field in concrete_fields.values():
+            if getattr(field, 'auto_now', False):
+                fields.add(field.name)
+                for obj in objs:
+                    setattr(obj, field.attname, date)
+        for obj in objs:
+            obj._current_user = obj._current_user or current_user
+        if 'current_user' in concrete_fields:
+            fields.add('current_user')
+            for obj in objs:
+                obj.current_user = obj._current_user
+        # Seuls les champs écrits en base sont historisés et considérés comme sauvegardés sur les instances
+        attnames = {concrete_fields[field_name].attname for field_name in fields if field_name in concrete_fields}
+        keys = attnames | fields
+        with transaction.atomic(using=self.db, savepoint=False):
+            olds = self.model.objects.untracked().in_bulk([obj.pk for obj in objs])
+            # Les mises à jour exécutées par Django ne doivent pas être historisées une seconde fois
+            queryset = self._chain()
+            queryset._force_default = True
+            super(EntityQuerySet, queryset).bulk_update(objs, list(fields), batch_size=batch_size)
+            changes = []
+            for obj in objs:
+                old_data = olds[obj.pk].to_dict(editables=True) if obj.pk in olds else {}
+                new_data = dict(old_data, **{
+                    key: value for key, value in obj.to_dict(editables=True).items() if key in keys})
+                changes.append((old_data, new_data))
+            self._log_changes(History.UPDATE, objs, changes, _ignore_log, current_user, _reason)
+        for obj in objs:
+            obj.update_snapshot(*attnames)
+
+    def _is_tracked(self, status, _ignore_log=None):
+        """
+        Détermine si les changements sur les entités du QuerySet seront historisés ou notifiés
+        :param status: Statut du changement
+        :param _ignore_log: Ignorer l'historisation ?
+        :return: Vrai ou faux
+        """
+        if not settings.IGNORE_LOG and not (_ignore_log or self._ignore_log):
+            return True
+        return bool(settings.NOTIFY_CHANGES and (settings.WEBSOCKET_ENABLED or self.model().has_webhook(status)))
+
+    def _log_changes(self, status, instances, changes, _ignore_log=None, _current_user=None, _reason=None):
+        """
+        Historise en masse et notifie en un seul message les changements d'un ensemble d'entités
+        :param status: Statut du changement
+        :param instances: Instances des entités
+        :param changes: Couples (données précédentes, données actuelles) de chaque entité
+        :param _ignore_log: Ignorer l'historisation ?
+        :param _current_user: Utilisateur à l'origine des changements
+        :param _reason: Raison des changements
+        :return: Rien
+        """
+        histories = []
+        if not settings.IGNORE_LOG and not (_ignore_log or self._ignore_log):
+            for instance, (old_data, new_data) in zip(instances, changes):
+                instance._current_user = _current_user
+                instance._reason = _reason or self._reason
+                instance._from_admin = self._from_admin
+                diff = get_changes(old_data, new_data)
+                if diff:
+                    histories.append(build_save_history(TaskPayload.encode(
+                        instance, status, data=old_data, changes=diff)))
+        save_histories(histories)
+        run_notify_bulk_changes(instances, status, changes)
+
+    def as_of(self, date):
+        """
+        Reconstitue l'état des entités du QuerySet à une date passée à partir de leur historique
+        :param date: Date de référence
+        :return: Dictionnaire des données de chaque entité par clé primaire (None si l'entité n'existait pas)
+        """
+        return get_states_as_of(self.model, date, self)
+
     def distinct_on_fields(self, *fields, order_by=False):
         """
         Permet de faire un distinct sur un/des champs précis du modèle sur tous les backends
@@ -1276,7 +2823,7 @@ class Entity(CommonModel):
         self._reason = _reason or self._reason
         self._force_default = _force_default or self._force_default
         if force_insert:
-            self.pk = self.id = None
+            self.pk = self.id = self._history = None
             self.uuid = uuid.uuid4()
         return super().save(*args, force_insert=force_insert, **kwargs)
 
@@ -1292,6 +2839,8 @@ class Entity(CommonModel):
         """
         if _force_default:
             return super().delete(*args, **kwargs)
+        if self._readonly:
+            raise ValueError(_("Unable to delete a read-only model instance."))
         assert self.pk is not None, _(
             "{} can't be deleted because it doesn't exists in database.").format(self._meta.object_name)
         self._ignore_log = _ignore_log or self._ignore_log
@@ -1337,37 +2886,62 @@ class Entity(CommonModel):
             self.__class__._init = True
         super().__init__(*args, **kwargs)
 
+    def as_of(self, date):
+        """
+        Reconstitue l'état de l'entité à une date passée à partir de son historique
+        :param date: Date de référence
+        :return: Dictionnaire des données de l'entité ou None si elle n'existait pas
+        """
+        queryset = type(self)._default_manager.filter(pk=self.pk)
+        return get_states_as_of(type(self), date, queryset).get(self.pk)
+
     def _get_uid(self, fk_field):
         return getattr(self, fk_field).uuid
 
     def _set_uid(self, fk_field, value):
         field = self._meta.get_field(fk_field)
-        unique = Global.objects.select_related().get(object_uid=value)
-        model_from = unique.content_type.model_class()
-        model_to = field.related_model
-        assert model_from == model_to, _("Unexpected model '{}' used instead of expected model '{}'.").format(
-            model_from._meta.verbose_name_raw, model_to._meta.verbose_name_raw
-        )
-        setattr(self, fk_field + '_id', unique.object_id)
+        if value is None and field.null:
+            setattr(self, field.attname, None)
+            return
+        content_type_id, object_id = self._get_references(field, [value])[0]
+        setattr(self, field.attname, object_id)
 
     def _get_uids(self, m2m_field):
         return getattr(self, m2m_field).values_list('uuid', flat=True)
 
-    def _set_uids(self, m2m_field, values):
+    def _set_uids(self, m2m_field, values, strict=False):
         if not values:
             getattr(self, m2m_field).clear()
             return
         field = self._meta.get_field(m2m_field)
-        uniques = Global.objects.select_related().filter(object_uid__in=values)
-        assert uniques.values_list('content_type', flat=True).distinct(
-        ).count() == 1, _("Multiple model types are found in values.")
-        model_from = uniques.first().content_type.model_class()
+        references = self._get_references(field, values, strict=strict)
+        getattr(self, m2m_field).set([object_id for content_type_id, object_id in references])
+
+    @staticmethod
+    def _get_references(field, values, strict=True):
+        """
+        Récupère et valide les références globales des entités liées à un champ à partir de leurs identifiants uniques
+        :param field: Champ relationnel
+        :param values: Identifiants uniques des entités liées
+        :param strict: Lever une erreur pour les identifiants inconnus (sinon ils sont ignorés) ?
+        :return: Liste des tuples (identifiant du type d'entité, identifiant de l'entité)
+        """
+        uuids = [GlobalIndex.to_uuid(value) for value in values]
+        references = GlobalIndex.resolve([object_uid for object_uid in uuids if object_uid])
+        unknowns = [value for value, object_uid in zip(values, uuids) if object_uid not in references]
+        if unknowns and strict:
+            raise Global.DoesNotExist(_("Unknown UUID(s): {}").format(', '.join(map(str, unknowns))))
+        references = [references[object_uid] for object_uid in uuids if object_uid in references]
+        if not references:
+            return []
+        content_type_ids = {content_type_id for content_type_id, object_id in references}
+        assert len(content_type_ids) == 1, _("Multiple model types are found in values.")
+        model_from = ContentType.objects.get_for_id(content_type_ids.pop()).model_class()
         model_to = field.related_model
         assert model_from == model_to, _("Unexpected model '{}' used instead of expected model '{}'.").format(
             model_from._meta.verbose_name_raw, model_to._meta.verbose_name_raw
         )
-        ids = uniques.values_list('object_id', flat=True)
-        getattr(self, m2m_field).set(ids)
+        return references
 
     def __json__(self):
         """
@@ -1388,10 +2962,7 @@ class Entity(CommonModel):
         :param uuid: UUID
         :return: Instance
         """
-        reference = Global.objects.filter(object_uid=uuid).first()
-        if reference:
-            return reference.entity
-        return None
+        return Global.objects.entity(uuid)
 
     class Meta:
         abstract = True
@@ -1412,14 +2983,86 @@ class PerishableEntityQuerySet(EntityQuerySet):
         if valid is None:
             return self
         date = date or now()
-        query = Q(start_date__lte=date, end_date__gte=date)
-        query |= Q(start_date__lte=date, end_date__isnull=True)
+        if getattr(self.model, '_range_index', False):
+            # Forme exploitable par les index d'intervalle (voir common.operations.CreateIndexRange)
+            query = Q(start_date__valid_at=date)
+        else:
+            query = Q(start_date__lte=date, end_date__gte=date)
+            query |= Q(start_date__lte=date, end_date__isnull=True)
         if not valid:
             return self.exclude(query)
         return self.filter(query)
 
     valid = property(select_valid)
 
+    # Nombre d'entités remplacées par lot
+    supersede_batch_size = 1000
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """
+        Surcharge de la création en masse des entités périssables pour initialiser leur date d'effet
+        """
+        objs = list(objs)
+        current_date = now()
+        for obj in objs:
+            obj.start_date = obj.start_date or current_date
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def supersede(self, changes=None, date=None, batch_size=None,
+                  _ignore_log=None, _current_user=None, _reason=None, **values):
+        """
+        Remplace en masse les entités du QuerySet par de nouvelles versions : pour chaque lot, les versions
+        précédentes sont clôturées en une seule mise à jour, les nouvelles versions sont insérées en masse
+        (référentiel global et historiques compris) et leurs métadonnées copiées en une seule requête
+        :param changes: Dictionnaire des modifications par entité {identifiant: {champ: valeur}} (facultatif)
+        :param date: Date de fin des versions précédentes et d'effet des nouvelles versions (par défaut maintenant)
+        :param batch_size: Nombre d'entités remplacées par lot
+        :param _ignore_log: Ignorer l'historique des modifications ?
+        :param _current_user: Utilisateur à l'origine des modifications
+        :param _reason: Raison des modifications
+        :param values: Modifications communes à toutes les entités
+        :return: Liste des nouvelles versions
+        """
+        model, using = self.model, self.db
+        changes = changes or {}
+        date = date or now()
+        current_user = _current_user or self._current_user or get_current_user()
+        options = dict(_ignore_log=_ignore_log, _current_user=current_user, _reason=_reason)
+        queryset = self.filter(pk__in=list(changes)) if changes else self
+        pks = list(queryset.order_by('pk').values_list('pk', flat=True))
+        batch_size = batch_size or self.supersede_batch_size
+        fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+        # Seules les dates de fin et d'effet dépendent de la date de remplacement
+        current_date = now()
+        updates = {field.name: current_date for field in fields if getattr(field, 'auto_now', False)}
+        updates.update(end_date=date, current_user=current_user)
+        results = []
+        for index in range(0, len(pks), batch_size):
+            with transaction.atomic(using=using, savepoint=False):
+                olds = list(model.objects.using(using).untracked().filter(pk__in=pks[index:index + batch_size]))
+                old_datas = [old.to_dict(editables=True) for old in olds]
+                # Clôture des versions précédentes
+                model.objects.using(using).filter(pk__in=[old.pk for old in olds]).update(
+                    _force_default=True, **updates)
+                for old in olds:
+                    for key, value in updates.items():
+                        setattr(old, key, value)
+                self._log_changes(
+                    History.UPDATE, olds, [(old_data, old.to_dict(editables=True)) for old, old_data in zip(
+                        olds, old_datas)], _ignore_log, current_user, _reason)
+                # Création des nouvelles versions
+                news = []
+                for old in olds:
+                    new = model(**{field.attname: getattr(old, field.attname) for field in fields})
+                    new.uuid, new.start_date, new.end_date = None, date, None
+                    for key, value in dict(values, **changes.get(old.pk, {})).items():
+                        setattr(new, key, value)
+                    news.append(new)
+                news = model.objects.using(using).bulk_create(news, **options)
+                MetaData.copy(model, {old.pk: new.pk for old, new in zip(olds, news)}, using=using)
+            results.extend(news)
+        return results
+
 
 class PerishableEntity(Entity):
     """
@@ -1433,6 +3076,9 @@ class PerishableEntity(Entity):
         verbose_name=_("date de fin"))
     objects = PerishableEntityQuerySet.as_manager()
 
+    # Recherche des entités valides par intervalle (nécessite l'index créé par common.operations.CreateIndexRange)
+    _range_index = False
+
     def save(self, *args, _force_default=False, force_insert=False, force_update=False, **kwargs):
         """
         Surcharge de la sauvegarde de l'entité périssable
@@ -1448,17 +3094,19 @@ class PerishableEntity(Entity):
         if not force_update:
             previous = None
             if self.pk:
-                previous = self.__class__.objects.get(pk=self.pk)
-                previous.end_date = self.end_date or current_date
-                previous.save(force_update=True, **kwargs)
+                # Clôture de la version précédente en une seule mise à jour
+                previous, end_date = self.pk, self.end_date or current_date
+                self.__class__.objects.using(kwargs.get('using') or router.db_for_write(
+                    self.__class__, instance=self)).filter(pk=previous).update(
+                    end_date=end_date, _auto_now=True,
+                    _ignore_log=kwargs.get('_ignore_log') or self._ignore_log,
+                    _current_user=kwargs.get('_current_user') or self._current_user,
+                    _reason=kwargs.get('_reason') or self._reason)
                 self.pk = self.id = self.end_date = self.uuid = None
-                self.start_date = previous.end_date or current_date
-            result = super().save(force_insert=True, **kwargs)
+                self.start_date = end_date
+            result = super().save(*args, force_insert=True, **kwargs)
             if previous:
-                for metadata in previous.metadata.all():
-                    metadata.pk = metadata.id = None
-                    metadata.entity = self
-                    metadata.save(force_insert=True)
+                MetaData.copy(self.__class__, {previous: self.pk}, using=self._state.db)
             return result
         return super().save(force_insert=force_insert, force_update=force_update, *args, **kwargs)
 
@@ -1661,6 +3309,183 @@ class Webhook(BaseWebhook):
         verbose_name_plural = _("webhooks")
 
 
+class HistoryBuffer(object):
+    """
+    Tampon d'écriture des historiques et des champs modifiés lié à la transaction en cours
+    Les données sont insérées en masse à la validation de la transaction et abandonnées en cas d'annulation
+    """
+    _local = threading.local()
+
+    def __init__(self, using):
+        self.using = using
+        self.histories = []
+        self.fields = []
+        self.pending = {}
+        # Dernier état connu des fonctions à exécuter à la validation de la transaction (voir is_pending)
+        self._hooks, self._scheduled = None, False
+
+    @classmethod
+    def get(cls, using=None):
+        """
+        Récupère le tampon d'écriture de la transaction (ou du point de sauvegarde) en cours
+        :param using: Alias de la base de données
+        :return: Tampon ou None en l'absence de transaction
+        """
+        using = using or router.db_for_write(History)
+        connection = transaction.get_connection(using)
+        if not settings.BULK_LOG or not connection.in_atomic_block:
+            return None
+        buffers = cls._local.__dict__.setdefault('buffers', {})
+        key = (using, tuple(connection.savepoint_ids))
+        buffer = buffers.get(key)
+        if buffer is None or not buffer.is_pending(connection):
+            # Les tampons des transactions et points de sauvegarde annulés sont abandonnés
+            for other_key, other in list(buffers.items()):
+                if other.using == using and not other.is_pending(connection):
+                    del buffers[other_key]
+            buffer = buffers[key] = cls(using)
+            transaction.on_commit(buffer.flush, using=using)
+            buffer._hooks, buffer._scheduled = connection.run_on_commit, True
+        return buffer
+
+    @classmethod
+    def get_pending(cls, ref):
+        """
+        Récupère un historique en attente d'insertion dans les tampons du fil d'exécution en cours
+        :param ref: Référence de l'historique attribuée lors de son ajout au tampon (voir add)
+        :return: Historique ou None
+        """
+        for buffer in cls._local.__dict__.get('buffers', {}).values():
+            history = buffer.pending.get(ref)
+            if history is not None and history.pk is None:
+                return history
+        return None
+
+    @classmethod
+    def flush_all(cls, using=None):
+        """
+        Insère immédiatement les historiques de tous les tampons en attente du fil d'exécution en cours
+        :param using: Alias de la base de données
+        :return: Rien
+        """
+        using = using or router.db_for_write(History)
+        connection = transaction.get_connection(using)
+        for buffer in list(cls._local.__dict__.get('buffers', {}).values()):
+            if buffer.using == using and buffer.is_pending(connection):
+                buffer.flush()
+
+    def is_pending(self, connection):
+        """
+        Vérifie que l'écriture du tampon est toujours prévue à la validation de la transaction
+        :param connection: Connexion à la base de données
+        :return: Vrai ou faux
+        """
+        hooks = connection.run_on_commit
+        if hooks is not self._hooks:
+            # Django ne fait qu'ajouter des fonctions à cette liste, qui n'est remplacée qu'à la validation ou à
+            # l'annulation de la transaction ou d'un point de sauvegarde : elle n'est parcourue que dans ce cas
+            self._hooks, self._scheduled = hooks, any(func == self.flush for sids, func in hooks)
+        return self._scheduled
+
+    def add(self, history, fields=()):
+        """
+        Ajoute un historique et ses champs modifiés au tampon
+        :param history: Historique
+        :param fields: Champs modifiés
+        :return: Rien
+        """
+        if history.pk is None:
+            # Référence explicite de l'historique transmise aux tâches en attendant son insertion
+            ref = history.__dict__.get('_buffer_ref')
+            if ref is None:
+                ref = history._buffer_ref = uuid.uuid4().hex
+            if ref not in self.pending:
+                self.pending[ref] = history
+                self.histories.append(history)
+        self.fields.extend(fields)
+
+    def flush(self):
+        """
+        Insère en masse les historiques et champs modifiés du tampon
+        :return: Rien
+        """
+        buffers = self._local.__dict__.get('buffers', {})
+        for key, buffer in list(buffers.items()):
+            if buffer is self:
+                del buffers[key]
+        histories, fields = self.histories, self.fields
+        self.histories, self.fields, self.pending = [], [], {}
+        self._scheduled = False
+        write_history(histories, fields, using=self.using)
+
+
+def write_history(histories, fields=(), using=None):
+    """
+    Insère les historiques et les champs modifiés en base de données
+    :param histories: Historiques
+    :param fields: Champs modifiés
+    :param using: Alias de la base de données
+    :return: Rien
+    """
+    using = using or router.db_for_write(History)
+    # Les historiques ont pu être insérés entre temps par un tampon précédent de la même transaction
+    histories = [history for history in histories if history.pk is None]
+    if histories:
+        if len(histories) > 1 and connections[using].features.can_return_rows_from_bulk_insert:
+            History.objects.using(using).bulk_create(histories)
+        else:
+            for history in histories:
+                history.save(using=using)
+    if fields:
+        for field in fields:
+            field.history_id = field.history.pk
+        HistoryField.objects.using(using).bulk_create(fields)
+
+
+def save_history(history, fields=()):
+    """
+    Enregistre un historique et ses champs modifiés, en différé jusqu'à la validation de la transaction en cours
+    :param history: Historique
+    :param fields: Champs modifiés
+    :return: Rien
+    """
+    buffer = HistoryBuffer.get()
+    if buffer is None:
+        write_history([history], fields)
+    else:
+        buffer.add(history, fields)
+
+
+def save_histories(histories):
+    """
+    Enregistre en masse des historiques et leurs champs modifiés (voir save_history)
+    :param histories: Liste de tuples (historique, champs modifiés)
+    :return: Rien
+    """
+    if not histories:
+        return
+    buffer = HistoryBuffer.get()
+    if buffer is None:
+        write_history([history for history, fields in histories], [
+            field for history, fields in histories for field in fields])
+    else:
+        for history, fields in histories:
+            buffer.add(history, fields)
+
+
+@receiver(post_save, sender=Global)
+@receiver(post_delete, sender=Global)
+def global_changed_receiver(sender, instance, *args, **kwargs):
+    """
+    Exécuté après chaque sauvegarde ou suppression d'une référence globale
+    :param sender: Modèle des références globales
+    :param instance: Référence globale
+    :return: Rien
+    """
+    if instance.object_uid:
+        GlobalIndex.invalidate(GlobalIndex.to_uuid(instance.object_uid))
+
+
 @receiver(post_init)
 def post_init_receiver(sender, instance, *args, **kwargs):
     """
@@ -1670,8 +3495,8 @@ def post_init_receiver(sender, instance, *args, **kwargs):
     :return: Rien
     """
     if isinstance(instance, CommonModel):
-        # Copie des données de l'entité
-        instance._copy = instance.to_dict(editables=True)
+        # Active le suivi des modifications, la copie des données n'est faite qu'à la première modification
+        instance._tracked = True
 
 
 @receiver(pre_save)
@@ -1690,6 +3515,193 @@ def pre_save_receiver(sender, instance, raw, *args, **kwargs):
         return
 
 
+class TaskPayload(object):
+    """
+    Codec des données transmises aux tâches d'historisation et de notification
+    Seuls les identifiants de l'entité, le statut et les différences calculées au moment de la sauvegarde sont
+    transmis, les tâches n'ont ainsi plus besoin de l'instance complète de l'entité
+    """
+    VERSION = 1
+
+    @classmethod
+    def encode(cls, instance, status, **data):
+        """
+        Construit les données à transmettre à une tâche
+        :param instance: Instance de l'entité
+        :param status: Statut du changement
+        :param data: Données complémentaires propres à la tâche
+        :return: Dictionnaire
+        """
+        user = getattr(instance, '_current_user', None) or get_current_user()
+        object_uid = getattr(instance, 'uuid', None)
+        history = getattr(instance, '_history', None)
+        payload = dict(
+            version=cls.VERSION,
+            content_type=instance.model_type.pk,
+            pk=instance.pk,
+            uuid=str(object_uid) if object_uid else None,
+            user=user.pk if user and user.pk else None,
+            status=status,
+            str=str(instance),
+            reason=getattr(instance, '_reason', None),
+            admin=bool(getattr(instance, '_from_admin', False)),
+            collector_update=getattr(instance, '_collector_update', None),
+            collector_delete=getattr(instance, '_collector_delete', None),
+            history=history.pk if history else None,
+            # Référence à l'historique en attente d'insertion dans la transaction en cours
+            history_ref=getattr(history, '_buffer_ref', None) if history and history.pk is None else None)
+        payload.update(data)
+        return payload
+
+    @classmethod
+    def decode(cls, payload):
+        """
+        Vérifie et retourne les données transmises à une tâche
+        :param payload: Dictionnaire
+        :return: Dictionnaire
+        """
+        version = payload.get('version') if isinstance(payload, dict) else None
+        if version != cls.VERSION:
+            raise ValueError(_("Version des données de tâche non supportée : {}").format(version))
+        return payload
+
+    @staticmethod
+    def get_model(payload):
+        """
+        Récupère le modèle de l'entité concernée
+        :param payload: Dictionnaire
+        :return: Modèle
+        """
+        return ContentType.objects.get_for_id(payload['content_type']).model_class()
+
+    @staticmethod
+    def get_history(payload):
+        """
+        Récupère l'historique de l'entité auquel rattacher les modifications s'il existe
+        :param payload: Dictionnaire
+        :return: Historique ou None
+        """
+        if payload.get('history'):
+            return History.objects.filter(pk=payload['history']).first()
+        if payload.get('history_ref'):
+            history = HistoryBuffer.get_pending(payload['history_ref'])
+            if history and history.content_type_id == payload['content_type'] and \
+                    str(history.object_id) == str(payload['pk']):
+                return history
+        return None
+
+    @staticmethod
+    def new_history(payload, data, delta=False):
+        """
+        Construit un nouvel historique à partir des données transmises
+        :param payload: Dictionnaire
+        :param data: Données de l'historique
+        :param delta: Les données ne contiennent-elles que les valeurs précédentes des champs modifiés ?
+        :return: Historique (non sauvegardé)
+        """
+        return History(
+            delta=delta,
+            user_id=payload['user'],
+            status=payload['status'],
+            content_type_id=payload['content_type'],
+            object_id=payload['pk'],
+            object_uid=payload['uuid'],
+            object_str=payload['str'],
+            reason=payload['reason'],
+            data=data,
+            data_size=len(json_encode(data)),
+            admin=payload['admin'],
+            collector_update=payload['collector_update'],
+            collector_delete=payload['collector_delete'])
+
+
+def run_task(task, *args):
+    """
+    Exécute une tâche d'historisation ou de notification, ou l'inscrit dans la boîte d'envoi si OUTBOX est activé
+    (la tâche est alors enregistrée dans la même transaction que la modification qui l'a déclenchée)
+    :param task: Tâche
+    :param args: Arguments de la tâche
+    :return: Résultat de la tâche ou None si elle est différée
+    """
+    if settings.OUTBOX:
+        Outbox.objects.using(router.db_for_write(Outbox)).create(task=task.name, args=list(args))
+        return None
+    return task.apply_async(args=args, retry=False)
+
+
+def get_changes(old_data, new_data):
+    """
+    Calcule les différences entre deux représentations d'une entité
+    :param old_data: Données précédentes
+    :param new_data: Données actuelles
+    :return: Dictionnaire des couples (ancienne valeur, nouvelle valeur) par champ modifié
+    """
+    if not set(to_tuple(new_data)) ^ set(to_tuple(old_data)):
+        return {}
+    return {
+        key: (old_data.get(key, None), new_data.get(key, None))
+        for key in new_data if old_data.get(key, None) != new_data.get(key, None)}
+
+
+def get_m2m_changes(old_m2m, new_m2m):
+    """
+    Calcule les identifiants retirés et ajoutés sur les relations many-to-many
+    :param old_m2m: Relations précédentes
+    :param new_m2m: Relations actuelles
+    :return: Tuple (identifiants retirés par champ, identifiants ajoutés par champ)
+    """
+    diff_m2m_prev, diff_m2m_next = {}, {}
+    for field in set(old_m2m) | set(new_m2m):
+        old_value = old_m2m.get(field, ())
+        new_value = new_m2m.get(field, ())
+        if set(old_value) ^ set(new_value):
+            diff_m2m_prev[field] = list(set(old_value) - set(new_value))
+            diff_m2m_next[field] = list(set(new_value) - set(old_value))
+    return diff_m2m_prev, diff_m2m_next
+
+
+def is_checkpoint(payload):
+    """
+    Détermine si l'historique de modification doit conserver l'intégralité des données de l'entité
+    (une fois tous les LOG_CHECKPOINT historiques, les autres ne conservant que les différences)
+    :param payload: Données de la tâche (voir TaskPayload)
+    :return: Vrai ou faux
+    """
+    checkpoint = settings.LOG_CHECKPOINT
+    if not checkpoint or checkpoint <= 1:
+        return True
+    deltas = list(History.objects.filter(
+        content_type_id=payload['content_type'], object_id=payload['pk'],
+        status__in=(History.CREATE, History.UPDATE, History.RESTORE),
+    ).order_by('-pk').values_list('delta', flat=True)[:checkpoint - 1])
+    return len(deltas) == checkpoint - 1 and all(deltas)
+
+
+def is_editable(model, field_name):
+    """
+    Détermine si un champ du modèle est éditable
+    :param model: Modèle
+    :param field_name: Nom du champ
+    :return: Vrai ou faux
+    """
+    try:
+        return model._meta.get_field(field_name).editable
+    except Exception as error:
+        logger.warning(error, exc_info=True)
+        return True
+
+
+def set_history(instance, result):
+    """
+    Conserve l'historique retourné par une tâche exécutée de manière synchrone
+    :param instance: Instance de l'entité
+    :param result: Résultat de la tâche
+    :return: Rien
+    """
+    if isinstance(result, History):
+        instance._history = result
+
+
 @receiver(post_save)
 def post_save_receiver(sender, instance, created, raw, *args, **kwargs):
     """
@@ -1700,6 +3712,7 @@ def post_save_receiver(sender, instance, created, raw, *args, **kwargs):
     :param raw: Entité créée depuis les fixtures ?
     :return: Rien
     """
+    old_data, new_data = None, None
     if isinstance(instance, Entity):
         # Ajoute le point d'entrée global de l'entité
         if not settings.IGNORE_GLOBAL and not instance._ignore_global:
@@ -1711,65 +3724,68 @@ def post_save_receiver(sender, instance, created, raw, *args, **kwargs):
             instance._force_default = True
             return
         if not settings.IGNORE_LOG and not instance._ignore_log:
-            log_save.apply_async(args=(instance, created, ), retry=False)
+            # Les différences sont calculées au moment de la sauvegarde
+            old_data, new_data = instance._copy, instance.to_dict(editables=True)
+            changes = get_changes(old_data, new_data)
+            if changes:
+                status = History.RESTORE if instance._restore else [History.UPDATE, History.CREATE][created]
+                payload = TaskPayload.encode(instance, status, data=old_data, changes=changes)
+                set_history(instance, run_task(log_save, payload))
     if isinstance(instance, CommonModel):
         # Alerte des changements potentiels
         status = History.CREATE if created else History.UPDATE
-        run_notify_changes(instance, status)
-        # Copie des données de l'entité
-        instance._copy = instance.to_dict(editables=True)
+        run_notify_changes(instance, status, old_data=old_data, new_data=new_data)
+        # L'état sauvegardé devient le nouvel état de référence
+        instance._snapshot, instance._dirty = None, frozenset()
 
 
 @app.task(ignore_result=True, name='common.log_save')
-def log_save(instance, created):
+def log_save(payload, created=False):
     """
     Enregistre un historique de création/modification de l'entité
-    :param instance: Instance de l'entité
-    :param created: Entité nouvellement créée ?
-    :return: Rien
+    :param payload: Données de la tâche (voir TaskPayload)
+    :param created: Entité nouvellement créée ? (uniquement si une instance est transmise à la place des données)
+    :return: Historique
     """
+    # Compatibilité avec les tâches transmettant l'instance de l'entité
+    if isinstance(payload, Entity):
+        instance = payload
+        old_data = instance._copy
+        status = History.RESTORE if instance._restore else [History.UPDATE, History.CREATE][created]
+        payload = TaskPayload.encode(
+            instance, status, data=old_data, changes=get_changes(old_data, instance.to_dict(editables=True)))
+    payload = TaskPayload.decode(payload)
     # Sauvegarde la création/modification de l'entité
-    if settings.IGNORE_LOG or instance._ignore_log:
-        return
-    user = instance._current_user or get_current_user()
-    if user and not user.pk:
-        user = None
-    # Vérification des changements entre les anciennes et nouvelles données
-    old_data = instance._copy
-    new_data = instance.to_dict(editables=True)
-    diff = set(to_tuple(new_data)) ^ set(to_tuple(old_data))
-    if not diff:
+    if settings.IGNORE_LOG or not payload['changes']:
         return
+    history, fields = build_save_history(payload)
+    save_history(history, fields)
+    logger.debug("Create/update log saved for entity {} #{} ({})".format(
+        TaskPayload.get_model(payload)._meta.object_name, payload['pk'], payload['uuid']))
+    return history
+
+
+def build_save_history(payload):
+    """
+    Construit l'historique de création/modification de l'entité et ses champs modifiés sans les sauvegarder
+    :param payload: Données de la tâche (voir TaskPayload)
+    :return: Tuple (historique, champs modifiés)
+    """
+    old_data = payload['data']
+    model = TaskPayload.get_model(payload)
     # Sauvegarde l'historique de création ou de modification
-    history = instance._history
+    history = TaskPayload.get_history(payload)
     if not history:
-        history = History.objects.create(
-            user=user,
-            status=History.RESTORE if instance._restore else [History.UPDATE, History.CREATE][created],
-            content_type=instance.model_type,
-            object_id=instance.pk,
-            object_uid=instance.uuid,
-            object_str=str(instance),
-            reason=instance._reason,
-            data=old_data,
-            data_size=len(json_encode(old_data)),
-            admin=instance._from_admin,
-            collector_update=instance._collector_update,
-            collector_delete=instance._collector_delete)
-        instance._history = history
+        if payload['status'] in (History.UPDATE, History.RESTORE) and not is_checkpoint(payload):
+            # Seules les valeurs précédentes des champs modifiés sont conservées entre deux points de contrôle
+            delta = {key: old_value for key, (old_value, new_value) in payload['changes'].items()}
+            history = TaskPayload.new_history(payload, delta, delta=True)
+        else:
+            history = TaskPayload.new_history(payload, old_data)
     # Sauvegarde les champs modifiés
-    if history.status in (History.UPDATE, History.RESTORE) and old_data.get(instance._meta.pk.name):
-        fields = []
-        for key in new_data:
-            old_value = old_data.get(key, None)
-            new_value = new_data.get(key, None)
-            if old_value == new_value:
-                continue
-            try:
-                editable = instance._meta.get_field(key).editable
-            except Exception as error:
-                logger.warning(error, exc_info=True)
-                editable = True
+    fields = []
+    if history.status in (History.UPDATE, History.RESTORE) and old_data.get(model._meta.pk.name):
+        for key, (old_value, new_value) in payload['changes'].items():
             fields.append(HistoryField(
                 history=history,
                 field_name=key,
@@ -1777,10 +3793,8 @@ def log_save(instance, created):
                 new_value=None if new_value is None else str(new_value),
                 data=old_value,
                 data_size=len(json_encode(old_value)),
-                editable=editable))
-        HistoryField.objects.bulk_create(fields)
-    logger.debug("Create/update log saved for entity {} #{} ({})".format(
-        instance._meta.object_name, instance.pk, instance.uuid))
+                editable=is_editable(model, key)))
+    return history, fields
 
 
 COPY_M2M_ACTIONS = ['pre_clear', 'pre_add', 'pre_remove']
@@ -1802,36 +3816,54 @@ def m2m_changed_receiver(sender, instance, model, action, *args, **kwargs):
     :return: Rien
     """
     status_m2m = LOG_M2M_ACTIONS.get(action)
-    if isinstance(instance, Entity):
-        if status_m2m and not settings.IGNORE_LOG and not instance._ignore_log:
-            # Sauvegarde l'historique des changements de champs many-to-many
-            log_m2m.apply_async(args=(instance, model, status_m2m, ), retry=False)
+    if getattr(instance, '_readonly', False):
+        return
     if isinstance(instance, CommonModel):
+        # Seule la relation modifiée est suivie (aucune pour les modifications depuis la relation inverse)
+        field = None if kwargs.get('reverse') else get_m2m_fields(type(instance)).get(sender)
         if action in COPY_M2M_ACTIONS:
-            # Copie les anciennes données des champs many-to-many
-            instance._copy_m2m = instance.m2m_to_dict()
-        if status_m2m:
-            # Alerte d'un changement dans les many-to-many
-            run_notify_changes(instance, History.M2M, status_m2m)
+            # Copie les anciennes données du champ many-to-many
+            instance._copy_m2m = instance.get_m2m_snapshot(field.name) if field else {}
+        elif status_m2m and field:
+            # Mise à jour de l'état connu de la relation sans nouvelle lecture
+            instance.update_m2m_snapshot(field.name, action, kwargs.get('pk_set'))
+    if not status_m2m or not isinstance(instance, CommonModel):
+        return
+    old_m2m = instance._copy_m2m or {}
+    new_m2m = instance.get_m2m_snapshot(*old_m2m)
+    if isinstance(instance, Entity) and not settings.IGNORE_LOG and not instance._ignore_log:
+        # Sauvegarde l'historique des changements de champs many-to-many
+        if any(set(old_m2m.get(key, [])) ^ set(new_m2m.get(key, [])) for key in set(old_m2m) | set(new_m2m)):
+            payload = TaskPayload.encode(
+                instance, History.M2M, old_m2m=old_m2m, new_m2m=new_m2m, status_m2m=status_m2m)
+            set_history(instance, run_task(log_m2m, payload))
+    # Alerte d'un changement dans les many-to-many
+    run_notify_changes(instance, History.M2M, status_m2m, m2m_changes=get_m2m_changes(old_m2m, new_m2m))
 
 
 @app.task(ignore_result=True, name='common.log_m2m')
-def log_m2m(instance, model, status_m2m):
+def log_m2m(payload, model=None, status_m2m=None):
     """
     Enregistre un historique de modification des relations de type ManyToMany de l'entité
-    :param instance: Instance de l'entité
-    :param model: Modèle lié à la relation ManyToMany
-    :param status: Statut de modification de la relation
-    :return: Rien
+    :param payload: Données de la tâche (voir TaskPayload)
+    :param model: Modèle lié à la relation ManyToMany (uniquement si une instance est transmise)
+    :param status_m2m: Statut de modification de la relation (uniquement si une instance est transmise)
+    :return: Historique
     """
+    # Compatibilité avec les tâches transmettant l'instance de l'entité
+    if isinstance(payload, Entity):
+        instance = payload
+        old_m2m = instance._copy_m2m or {}
+        payload = TaskPayload.encode(
+            instance, History.M2M, old_m2m=old_m2m, new_m2m=instance.get_m2m_snapshot(*old_m2m),
+            status_m2m=status_m2m)
+    payload = TaskPayload.decode(payload)
     # Sauvegarde la mise à jour de relations M2M de l'entité
-    if settings.IGNORE_LOG or instance._ignore_log:
+    if settings.IGNORE_LOG:
         return
-    user = instance._current_user or get_current_user()
-    if user and not user.pk:
-        user = None
-    old_m2m = instance._copy_m2m
-    new_m2m = instance.m2m_to_dict()
+    model = TaskPayload.get_model(payload)
+    old_m2m, new_m2m = payload['old_m2m'], payload['new_m2m']
+    history = TaskPayload.get_history(payload)
     for field in set(old_m2m) | set(new_m2m):
         # S'il n'y a aucun changement entre les anciennes et nouvelles données
         old_value = old_m2m.get(field, [])
@@ -1840,43 +3872,28 @@ def log_m2m(instance, model, status_m2m):
         if not diff:
             continue
         # Sauvegarde de l'historique si ce n'est pas déjà fait
-        history = instance._history
         if not history:
-            history = History.objects.create(
-                user=user,
-                status=History.M2M,
-                content_type=instance.model_type,
-                object_id=instance.pk,
-                object_uid=instance.uuid,
-                object_str=str(instance),
-                reason=instance._reason,
-                data=old_m2m,
-                data_size=len(json_encode(old_m2m)),
-                admin=instance._from_admin,
-                collector_update=instance._collector_update,
-                collector_delete=instance._collector_delete)
-            instance._history = history
+            history = TaskPayload.new_history(payload, old_m2m)
         else:
             history.data.update(old_m2m)
             history.data_size = len(json_encode(history.data))
-            history.save(update_fields=('data', 'data_size'))
+            # L'historique encore en attente d'insertion est complété directement
+            if history.pk is not None:
+                history.save(update_fields=('data', 'data_size'))
         # Sauvegarde la relation modifiée
-        try:
-            editable = instance._meta.get_field(field).editable
-        except Exception as error:
-            logger.warning(error, exc_info=True)
-            editable = True
-        field = HistoryField.objects.create(
+        field = HistoryField(
             history=history,
             field_name=field,
             old_value=' | '.join(str(value) for value in old_value) if old_value else None,
             new_value=' | '.join(str(value) for value in new_value) if new_value else None,
             data=old_value,
             data_size=len(json_encode(old_value)),
-            status_m2m=status_m2m,
-            editable=editable)
+            status_m2m=payload['status_m2m'],
+            editable=is_editable(model, field))
+        save_history(history, [field])
         logger.debug("Many-to-many log saved for field '{}' in entity {} #{} ({})".format(
-            field, instance._meta.object_name, instance.pk, instance.uuid))
+            field, model._meta.object_name, payload['pk'], payload['uuid']))
+    return history
 
 
 @receiver(pre_delete)
@@ -1890,99 +3907,182 @@ def pre_delete_receiver(sender, instance, *args, **kwargs):
     if isinstance(instance, Entity):
         # Sauvegarde l'historique de suppression
         if not settings.IGNORE_LOG and not instance._ignore_log:
-            log_delete.apply_async(args=(instance, ), retry=False)
+            payload = TaskPayload.encode(instance, History.DELETE, data=instance.to_dict(m2m=True, editables=True))
+            set_history(instance, run_task(log_delete, payload))
     if isinstance(instance, CommonModel):
         # Alerte de la suppression
         run_notify_changes(instance, History.DELETE)
 
 
 @app.task(ignore_result=True, name='common.log_delete')
-def log_delete(instance):
+def log_delete(payload):
     """
     Enregistre un historique de suppression de l'entité
-    :param instance: Instance de l'entité
-    :return: Rien
+    :param payload: Données de la tâche (voir TaskPayload)
+    :return: Historique
     """
+    # Compatibilité avec les tâches transmettant l'instance de l'entité
+    if isinstance(payload, Entity):
+        payload = TaskPayload.encode(payload, History.DELETE, data=payload.to_dict(m2m=True, editables=True))
+    payload = TaskPayload.decode(payload)
     # Sauvegarde la suppression de l'entité
-    if settings.IGNORE_LOG or instance._ignore_log:
+    if settings.IGNORE_LOG:
         return
-    user = instance._current_user or get_current_user()
-    if user and not user.pk:
-        user = None
-    data = instance.to_dict(m2m=True, editables=True)
     # Sauvegarde de l'historique de suppression
-    history = History.objects.create(
-        user=user,
-        status=History.DELETE,
-        content_type=instance.model_type,
-        object_id=instance.pk,
-        object_uid=instance.uuid,
-        object_str=str(instance),
-        reason=instance._reason,
-        data=data,
-        data_size=len(json_encode(data)),
-        admin=instance._from_admin,
-        collector_update=instance._collector_update,
-        collector_delete=instance._collector_delete)
-    instance._history = history
+    history = TaskPayload.new_history(payload, payload['data'])
+    save_history(history)
     logger.debug("Delete log saved for entity {} #{} ({})".format(
-        instance._meta.object_name, instance.pk, instance.uuid))
+        TaskPayload.get_model(payload)._meta.object_name, payload['pk'], payload['uuid']))
+    return history
 
 
-def run_notify_changes(instance, status, status_m2m=None):
+def run_notify_changes(instance, status, status_m2m=None, old_data=None, new_data=None, m2m_changes=None):
     """
     Notification des changements sur une entité (par broadcast websocket et/ou API callback)
     :param instance: Instance de l'entité
     :param status: Statut général du changement
     :param status_m2m: Sous-statut concernant un changement sur les champs many-to-many
+    :param old_data: Données précédentes de l'entité si elles ont déjà été calculées
+    :param new_data: Données actuelles de l'entité si elles ont déjà été calculées
+    :param m2m_changes: Différences de relations many-to-many déjà calculées (voir get_m2m_changes)
     :return: Rien
     """
-    filters = {Webhook.STATUS_FILTERS.get(status): True}
-    filters.update(dict(types__in=[instance.model_type]))
-    if settings.NOTIFY_CHANGES and (settings.WEBSOCKET_ENABLED or instance.has_webhook(status)):
-        return notify_changes.apply_async(args=(instance, status, status_m2m, ), retry=False)
+    if not settings.NOTIFY_CHANGES or not (settings.WEBSOCKET_ENABLED or instance.has_webhook(status)):
+        return
+    payload = get_notify_payload(
+        instance, status, status_m2m=status_m2m, old_data=old_data, new_data=new_data, m2m_changes=m2m_changes)
+    return run_task(notify_changes, payload)
 
 
-@app.task(ignore_result=True, name='common.notify_changes')
-def notify_changes(instance, status, status_m2m=None):
+def run_notify_bulk_changes(instances, status, changes=None):
     """
-    Notification des changements sur une entité (par broadcast websocket et/ou API callback)
+    Notification groupée des changements sur un ensemble d'entités d'un même type (en un seul message)
+    :param instances: Instances des entités
+    :param status: Statut général du changement
+    :param changes: Couples (données précédentes, données actuelles) de chaque entité si déjà calculés
+    :return: Rien
+    """
+    if not instances or not settings.NOTIFY_CHANGES or not (
+            settings.WEBSOCKET_ENABLED or instances[0].has_webhook(status)):
+        return
+    changes = changes or [(None, None)] * len(instances)
+    payloads = [
+        get_notify_payload(instance, status, old_data=old_data, new_data=new_data)
+        for instance, (old_data, new_data) in zip(instances, changes)]
+    return run_task(notify_bulk_changes, payloads)
+
+
+def get_notify_payload(instance, status, status_m2m=None, old_data=None, new_data=None, m2m_changes=None):
+    """
+    Construit les données de notification des changements sur une entité
     :param instance: Instance de l'entité
     :param status: Statut général du changement
     :param status_m2m: Sous-statut concernant un changement sur les champs many-to-many
-    :return: Rien
+    :param old_data: Données précédentes de l'entité si elles ont déjà été calculées
+    :param new_data: Données actuelles de l'entité si elles ont déjà été calculées
+    :param m2m_changes: Différences de relations many-to-many déjà calculées (voir get_m2m_changes)
+    :return: Dictionnaire (voir TaskPayload)
     """
     # Différences de données entre la version précédente et la version actuelle
     diff_data_prev, diff_data_next = None, None
     if status in [History.UPDATE, History.RESTORE]:
-        old_data = to_tuple(instance._copy)
-        new_data = to_tuple(instance.to_dict(editables=True))
+        old_data = to_tuple(instance._copy if old_data is None else old_data)
+        new_data = to_tuple(instance.to_dict(editables=True) if new_data is None else new_data)
         if set(new_data) ^ set(old_data):
             diff_data_prev = dict(set(old_data) - set(new_data))
             diff_data_next = dict(set(new_data) - set(old_data))
-    has_diff_data = diff_data_prev and diff_data_next
     # Différences de many-to-many entre la version précédente et la version actuelle
     diff_m2m_prev, diff_m2m_next = {}, {}
     if status == History.M2M:
-        old_m2m = instance._copy_m2m
-        new_m2m = instance.m2m_to_dict()
-        for field in set(old_m2m) | set(new_m2m):
-            old_value = old_m2m.get(field, ())
-            new_value = new_m2m.get(field, ())
-            if set(old_value) ^ set(new_value):
-                diff_m2m_prev[field] = list(set(old_value) - set(new_value))
-                diff_m2m_next[field] = list(set(new_value) - set(old_value))
+        if m2m_changes is None:
+            old_m2m = instance._copy_m2m or {}
+            m2m_changes = get_m2m_changes(old_m2m, instance.get_m2m_snapshot(*old_m2m))
+        diff_m2m_prev, diff_m2m_next = m2m_changes
+    get_data = getattr(instance, 'get_webhook_data', lambda *a, **k: instance.to_dict(**settings.NOTIFY_OPTIONS))
+    payload = TaskPayload.encode(
+        instance, status, status_m2m=status_m2m,
+        diff_data=(diff_data_prev, diff_data_next), diff_m2m=(diff_m2m_prev, diff_m2m_next),
+        data=get_data(status=status, status_m2m=status_m2m))
+    return payload
+
+
+@app.task(ignore_result=True, name='common.notify_changes')
+def notify_changes(payload, status=None, status_m2m=None):
+    """
+    Notification des changements sur une entité (par broadcast websocket et/ou API callback)
+    :param payload: Données de la tâche (voir TaskPayload)
+    :param status: Statut général du changement (uniquement si une instance est transmise)
+    :param status_m2m: Sous-statut concernant un changement sur les champs many-to-many (idem)
+    :return: Rien
+    """
+    # Compatibilité avec les tâches transmettant l'instance de l'entité
+    if isinstance(payload, CommonModel):
+        return run_notify_changes(payload, status, status_m2m)
+    data = get_notification(TaskPayload.decode(payload))
+
+    # Envoi des données par websocket si sctivé
+    if settings.WEBSOCKET_ENABLED:
+        Webhook.send_websocket(data)
+
+    # Envoi des données par requête HTTP
+    filters = {Webhook.STATUS_FILTERS.get(payload['status']): True}
+    filters.update(dict(types__in=[payload['content_type']]))
+    for webhook in Webhook.objects.filter(**filters):
+        webhook.send_http(data)
+    return data
+
+
+@app.task(ignore_result=True, name='common.notify_bulk_changes')
+def notify_bulk_changes(payloads):
+    """
+    Notification groupée des changements sur un ensemble d'entités d'un même type et d'un même statut
+    Un seul message contenant la notification de chaque entité est transmis par websocket et à chaque webhook
+    :param payloads: Liste des données de la tâche (voir TaskPayload)
+    :return: Message transmis
+    """
+    if not payloads:
+        return
+    payloads = [TaskPayload.decode(payload) for payload in payloads]
+    data = {
+        'id': str(uuid.uuid4()),
+        'date': now(),
+        'bulk': True,
+        'items': [get_notification(payload) for payload in payloads],
+    }
+
+    # Envoi des données par websocket si sctivé
+    if settings.WEBSOCKET_ENABLED:
+        Webhook.send_websocket(data)
+
+    # Envoi des données par requête HTTP
+    filters = {Webhook.STATUS_FILTERS.get(payloads[0]['status']): True}
+    filters.update(dict(types__in=[payloads[0]['content_type']]))
+    for webhook in Webhook.objects.filter(**filters):
+        webhook.send_http(data)
+    return data
+
+
+def get_notification(payload):
+    """
+    Construit le message de notification des changements sur une entité
+    :param payload: Données de la tâche (voir TaskPayload)
+    :return: Dictionnaire
+    """
+    status, status_m2m = payload['status'], payload['status_m2m']
+    diff_data_prev, diff_data_next = payload['diff_data']
+    diff_m2m_prev, diff_m2m_next = payload['diff_m2m']
+    has_diff_data = diff_data_prev and diff_data_next
     has_diff_m2m = diff_m2m_prev and diff_m2m_next
+    content_type = ContentType.objects.get_for_id(payload['content_type'])
 
     # Création du message à transmettre
-    get_data = getattr(instance, 'get_webhook_data', lambda *a, **k: instance.to_dict(**settings.NOTIFY_OPTIONS))
     data = {
         'id': str(uuid.uuid4()),
         'date': now(),
         'meta': {
-            'id': instance.pk,
-            'uuid': getattr(instance, 'uuid', None),
-            'type': to_dict(get_content_type(instance)),
+            'id': payload['pk'],
+            'uuid': payload['uuid'],
+            'type': to_dict(content_type),
             'status': status,
             'status_display': str(dict(History.LOG_STATUS).get(status, '')) or None,
             'status_m2m': status_m2m,
@@ -1998,19 +4098,13 @@ def notify_changes(instance, status, status_m2m=None):
                 'current': diff_m2m_next,
             } if has_diff_m2m else None,
         } if (has_diff_data or has_diff_m2m) else None,
-        'data': get_data(status=status, status_m2m=status_m2m),
+        'data': payload['data'],
     }
+    return data
 
-    # Envoi des données par websocket si sctivé
-    if settings.WEBSOCKET_ENABLED:
-        Webhook.send_websocket(data)
 
-    # Envoi des données par requête HTTP
-    filters = {Webhook.STATUS_FILTERS.get(status): True}
-    filters.update(dict(types__in=[instance.model_type]))
-    for webhook in Webhook.objects.filter(**filters):
-        webhook.send_http(data)
-    return data
+# Tâches exécutables depuis la boîte d'envoi (voir run_task)
+OUTBOX_TASKS = {task.name: task for task in (log_save, log_m2m, log_delete, notify_changes, notify_bulk_changes)}
 
 
 @receiver(post_save)
@@ -1,4 +1,5 @@
 # coding: utf-8
+import datetime
 import logging
 
 from django.db.migrations.operations.base import Operation
@@ -137,3 +138,370 @@ class CreateIndexUnaccent(Operation):
             # Suppression des index de la base de données
             schema_editor.execute(query.format(index_name=index_name, method='gin'))
             schema_editor.execute(query.format(index_name=index_name, method='btree'))
+
+
+class CreateIndexJson(Operation):
+    """
+    Création d'index sur des champs JSON d'un modèle dans la base de données PostgreSQL :
+    un index GIN (jsonb_path_ops) pour les recherches par inclusion (lookup 'contains', opérateur @>) et
+    des index d'expression BTREE pour les recherches par égalité ou intervalle sur des chemins de clés
+    """
+    reversible = True
+
+    def __init__(self, model_name, fields, paths=None):
+        self.model_name = model_name
+        self.fields = fields
+        self.paths = paths or []
+
+    def state_forwards(self, app_label, state):
+        return
+
+    def get_indexes(self, model, schema_editor):
+        """
+        Récupère les index à créer sur le modèle
+        :param model: Modèle
+        :param schema_editor: Editeur de schéma
+        :return: Liste de tuples (nom de l'index, méthode, expression)
+        """
+        db_table = model._meta.db_table
+        quote = schema_editor.quote_name
+        indexes = []
+        for field_name in self.fields:
+            column = model._meta.get_field(field_name).column
+            index_name = schema_editor._create_index_name(db_table, [column], suffix='_gin')
+            indexes.append((index_name, 'gin', '{} jsonb_path_ops'.format(quote(column))))
+            for path in self.paths:
+                keys = path.split('__') if isinstance(path, str) else list(path)
+                # Même expression que celle générée par les lookups sur les chemins de clés (value__key__subkey)
+                expression = '({} {} {})'.format(
+                    quote(column), '->' if len(keys) == 1 else '#>', schema_editor.quote_value(
+                        keys[0] if len(keys) == 1 else '{{{}}}'.format(','.join(keys))))
+                index_name = schema_editor._create_index_name(db_table, [column] + keys, suffix='_json')
+                indexes.append((index_name, 'btree', expression))
+        return indexes
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        # Applicable uniquement sur une base de données PostgreSQL
+        if schema_editor.connection.vendor != 'postgresql':
+            logger.info(_("Les index JSON ne peuvent être créés que sur PostgreSQL."))
+            return
+
+        # Template de la requête de création d'index
+        query = "CREATE INDEX IF NOT EXISTS {index_name} ON {db_table} USING {method} ({expression});"
+
+        model = to_state.apps.get_model(app_label, self.model_name)
+        for index_name, method, expression in self.get_indexes(model, schema_editor):
+            schema_editor.execute(query.format(
+                index_name=index_name, db_table=schema_editor.quote_name(model._meta.db_table),
+                method=method, expression=expression))
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        # Applicable uniquement sur une base de données PostgreSQL
+        if schema_editor.connection.vendor != 'postgresql':
+            logger.info(_("Les index JSON ne peuvent être supprimés que sur PostgreSQL."))
+            return
+
+        # Template de requête de suppression d'index
+        query = "DROP INDEX IF EXISTS {index_name};"
+
+        model = to_state.apps.get_model(app_label, self.model_name)
+        for index_name, method, expression in self.get_indexes(model, schema_editor):
+            schema_editor.execute(query.format(index_name=index_name))
+
+    def describe(self):
+        return "Create JSON indexes on {} ({})".format(self.model_name, ', '.join(self.fields))
+
+
+class CreateIndexRange(Operation):
+    """
+    Création d'un index sur la période de validité [date d'effet, date de fin] d'un modèle périssable :
+    index GIST sur l'intervalle 'tstzrange' sur PostgreSQL, index sur la date de fin (date factice si nulle) et la date
+    d'effet sur SQLite et MySQL (voir le lookup 'valid_at' et PerishableEntity._range_index)
+    """
+    reversible = True
+
+    def __init__(self, model_name, start_field='start_date', end_field='end_date'):
+        self.model_name = model_name
+        self.start_field = start_field
+        self.end_field = end_field
+
+    def state_forwards(self, app_label, state):
+        return
+
+    def get_index(self, model, schema_editor):
+        """
+        Récupère le nom de l'index et la requête de création de l'index
+        :param model: Modèle
+        :param schema_editor: Editeur de schéma
+        :return: Tuple (nom de l'index, requête) ou None si la base de données n'est pas supportée
+        """
+        from common.fields import get_sentinel_end_date, is_mysql, is_postgresql, is_sqlite
+        connection = schema_editor.connection
+        db_table = model._meta.db_table
+        start = model._meta.get_field(self.start_field).column
+        end = model._meta.get_field(self.end_field).column
+        index_name = schema_editor._create_index_name(db_table, [start, end], suffix='_range')
+        quote = schema_editor.quote_name
+        if is_postgresql(connection):
+            expression = "USING gist (TSTZRANGE({start}, {end}, '[]'))"
+        elif is_sqlite(connection):
+            expression = "(COALESCE({end}, {sentinel}), {start})"
+        elif is_mysql(connection):
+            expression = "((COALESCE({end}, {sentinel})), {start})"
+        else:
+            return None
+        expression = expression.format(
+            start=quote(start), end=quote(end), sentinel=get_sentinel_end_date(connection))
+        query = "CREATE INDEX {exists}{index_name} ON {db_table} {expression};".format(
+            exists='' if is_mysql(connection) else 'IF NOT EXISTS ', index_name=quote(index_name),
+            db_table=quote(db_table), expression=expression)
+        return index_name, query
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        index = self.get_index(model, schema_editor)
+        if not index:
+            logger.error(_("L'opération ne peut s'exécuter que sur PostgreSQL, SQLite ou MySQL."))
+            return
+        index_name, query = index
+        schema_editor.execute(query)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        index = self.get_index(model, schema_editor)
+        if not index:
+            logger.error(_("L'opération ne peut s'exécuter que sur PostgreSQL, SQLite ou MySQL."))
+            return
+        index_name, query = index
+        if schema_editor.connection.vendor == 'mysql':
+            schema_editor.execute("DROP INDEX {} ON {};".format(
+                schema_editor.quote_name(index_name), schema_editor.quote_name(model._meta.db_table)))
+        else:
+            schema_editor.execute("DROP INDEX IF EXISTS {};".format(schema_editor.quote_name(index_name)))
+
+    def describe(self):
+        return "Create validity range index on {}".format(self.model_name)
+
+
+def get_month_start(date):
+    """
+    Récupère le premier jour du mois d'une date
+    :param date: Date
+    :return: Date
+    """
+    return datetime.date(date.year, date.month, 1)
+
+
+def get_next_month(date):
+    """
+    Récupère le premier jour du mois suivant une date
+    :param date: Date
+    :return: Date
+    """
+    return (get_month_start(date).replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+
+
+def get_partition_name(db_table, date):
+    """
+    Récupère le nom de la partition mensuelle d'une table
+    :param db_table: Nom de la table
+    :param date: Date comprise dans le mois de la partition
+    :return: Nom de la partition
+    """
+    return '{}_p{:%Y%m}'.format(db_table, date)
+
+
+def is_partitioned(connection, db_table):
+    """
+    Vérifie qu'une table est partitionnée
+    :param connection: Connexion à la base de données
+    :param db_table: Nom de la table
+    :return: Vrai ou faux
+    """
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM pg_partitioned_table WHERE partrelid = to_regclass(%s);", [db_table])
+        return bool(cursor.fetchone()[0])
+
+
+def create_month_partition(connection, db_table, date):
+    """
+    Crée la partition mensuelle d'une table partitionnée si elle n'existe pas
+    :param connection: Connexion à la base de données
+    :param db_table: Nom de la table
+    :param date: Date comprise dans le mois de la partition
+    :return: Nom de la partition
+    """
+    start = get_month_start(date)
+    name = get_partition_name(db_table, start)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s);".format(
+                name=connection.ops.quote_name(name), table=connection.ops.quote_name(db_table)),
+            [start.isoformat(), get_next_month(start).isoformat()])
+    return name
+
+
+def drop_month_partition(connection, db_table, date):
+    """
+    Supprime la partition mensuelle d'une table partitionnée si elle existe et qu'elle est vide
+    :param connection: Connexion à la base de données
+    :param db_table: Nom de la table
+    :param date: Date comprise dans le mois de la partition
+    :return: Vrai si la partition a été supprimée
+    """
+    name = get_partition_name(db_table, date)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL;", [name])
+        if not cursor.fetchone()[0]:
+            return False
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM {});".format(connection.ops.quote_name(name)))
+        if cursor.fetchone()[0]:
+            return False
+        cursor.execute("DROP TABLE {};".format(connection.ops.quote_name(name)))
+    return True
+
+
+class PartitionByMonth(Operation):
+    """
+    Partitionnement mensuel d'une table existante sur un champ date dans la base de données PostgreSQL
+    Les contraintes de clés étrangères pointant vers la table sont supprimées (la clé primaire inclut le champ de
+    partitionnement), les relations restent gérées par Django. Une partition par défaut recueille les données hors
+    des partitions créées, les partitions des mois suivants peuvent être créées par la commande 'archive_history'.
+    """
+    reversible = True
+
+    def __init__(self, model_name, field_name='creation_date', months_ahead=12, app_label=None):
+        self.model_name = model_name
+        self.field_name = field_name
+        self.months_ahead = months_ahead
+        self.app_label = app_label
+
+    def state_forwards(self, app_label, state):
+        return
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        # Applicable uniquement sur une base de données PostgreSQL
+        connection = schema_editor.connection
+        if connection.vendor != 'postgresql':
+            logger.error(_("L'opération ne peut s'exécuter que sur PostgreSQL."))
+            return
+
+        # Récupération du modèle
+        model = to_state.apps.get_model(self.app_label or app_label, self.model_name)
+        db_table = model._meta.db_table
+        if is_partitioned(connection, db_table):
+            logger.warning(_("La table '{}' est déjà partitionnée.").format(db_table))
+            return
+        quote = connection.ops.quote_name
+        pk_column = model._meta.pk.column
+        column = model._meta.get_field(self.field_name).column
+        legacy_table = db_table + '_legacy'
+
+        cursor = connection.cursor()
+        # Suppression des contraintes de clés étrangères pointant vers la table
+        cursor.execute(
+            "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+            "WHERE contype = 'f' AND confrelid = to_regclass(%s);", [db_table])
+        for table, constraint in cursor.fetchall():
+            logger.warning(_("Suppression de la contrainte '{}' sur la table '{}'.").format(constraint, table))
+            schema_editor.execute("ALTER TABLE {} DROP CONSTRAINT {};".format(table, quote(constraint)))
+
+        # Définition des index non uniques et des clés étrangères à recréer sur la table partitionnée
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexdef NOT LIKE 'CREATE UNIQUE%%';",
+            [db_table])
+        indexes = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE contype = 'f' AND conrelid = to_regclass(%s);", [db_table])
+        constraints = cursor.fetchall()
+
+        # Création de la table partitionnée à partir de la table existante
+        schema_editor.execute("ALTER TABLE {} RENAME TO {};".format(quote(db_table), quote(legacy_table)))
+        schema_editor.execute(
+            "CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            "PARTITION BY RANGE ({column});".format(
+                table=quote(db_table), legacy=quote(legacy_table), column=quote(column)))
+        schema_editor.execute("ALTER TABLE {} ADD PRIMARY KEY ({}, {});".format(
+            quote(db_table), quote(pk_column), quote(column)))
+        cursor.execute("SELECT pg_get_serial_sequence(%s, %s);", [legacy_table, pk_column])
+        sequence = cursor.fetchone()[0]
+        if sequence:
+            schema_editor.execute("ALTER SEQUENCE {} OWNED BY {}.{};".format(
+                sequence, quote(db_table), quote(pk_column)))
+        schema_editor.execute("CREATE TABLE {} PARTITION OF {} DEFAULT;".format(
+            quote(db_table + '_default'), quote(db_table)))
+
+        # Création des partitions mensuelles couvrant les données existantes et les mois à venir
+        cursor.execute("SELECT MIN({column}) FROM {legacy};".format(column=quote(column), legacy=quote(legacy_table)))
+        today = datetime.date.today()
+        month = get_month_start(cursor.fetchone()[0] or today)
+        last_month = get_month_start(today)
+        for index in range(self.months_ahead):
+            last_month = get_next_month(last_month)
+        while month <= last_month:
+            create_month_partition(connection, db_table, month)
+            month = get_next_month(month)
+
+        # Transfert des données et recréation des index
+        schema_editor.execute("INSERT INTO {} SELECT * FROM {};".format(quote(db_table), quote(legacy_table)))
+        schema_editor.execute("DROP TABLE {};".format(quote(legacy_table)))
+        for index in indexes:
+            schema_editor.execute(index + ';')
+        for constraint, definition in constraints:
+            schema_editor.execute("ALTER TABLE {} ADD CONSTRAINT {} {};".format(
+                quote(db_table), quote(constraint), definition))
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        # Applicable uniquement sur une base de données PostgreSQL
+        connection = schema_editor.connection
+        if connection.vendor != 'postgresql':
+            logger.error(_("L'opération ne peut s'exécuter que sur PostgreSQL."))
+            return
+
+        # Récupération du modèle
+        model = to_state.apps.get_model(self.app_label or app_label, self.model_name)
+        db_table = model._meta.db_table
+        if not is_partitioned(connection, db_table):
+            return
+        quote = connection.ops.quote_name
+        pk_column = model._meta.pk.column
+        partitioned_table = db_table + '_partitioned'
+
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexdef NOT LIKE 'CREATE UNIQUE%%';",
+            [db_table])
+        indexes = [row[0].replace(' ONLY ', ' ') for row in cursor.fetchall()]
+
+        # Recréation d'une table simple à partir de la table partitionnée
+        schema_editor.execute("ALTER TABLE {} RENAME TO {};".format(quote(db_table), quote(partitioned_table)))
+        schema_editor.execute(
+            "CREATE TABLE {table} (LIKE {partitioned} INCLUDING DEFAULTS INCLUDING CONSTRAINTS);".format(
+                table=quote(db_table), partitioned=quote(partitioned_table)))
+        schema_editor.execute("INSERT INTO {} SELECT * FROM {};".format(quote(db_table), quote(partitioned_table)))
+        cursor.execute("SELECT pg_get_serial_sequence(%s, %s);", [partitioned_table, pk_column])
+        sequence = cursor.fetchone()[0]
+        if sequence:
+            schema_editor.execute("ALTER SEQUENCE {} OWNED BY {}.{};".format(
+                sequence, quote(db_table), quote(pk_column)))
+        schema_editor.execute("DROP TABLE {} CASCADE;".format(quote(partitioned_table)))
+        schema_editor.execute("ALTER TABLE {} ADD PRIMARY KEY ({});".format(quote(db_table), quote(pk_column)))
+        for index in indexes:
+            schema_editor.execute(index + ';')
+
+        # Recréation des contraintes de clés étrangères de la table et pointant vers la table
+        foreign_keys = [
+            (model, field) for field in model._meta.concrete_fields
+            if field.many_to_one and field.db_constraint] + [
+            (related.related_model, related.field) for related in model._meta.related_objects
+            if related.field.many_to_one and related.field.db_constraint]
+        for from_model, field in foreign_keys:
+            # Les clés étrangères pointant vers une table toujours partitionnée ne peuvent pas être recréées
+            if is_partitioned(connection, field.related_model._meta.db_table):
+                logger.warning(_("La contrainte de clé étrangère '{}.{}' ne peut pas être recréée.").format(
+                    from_model._meta.db_table, field.column))
+                continue
+            schema_editor.execute(schema_editor._create_fk_sql(from_model, field, "_fk_%(to_table)s_%(to_column)s"))
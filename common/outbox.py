@@ -0,0 +1,57 @@
+# coding: utf-8
+import logging
+
+from django.db import connections, router, transaction
+from django.utils.translation import gettext_lazy as _
+
+from common.models import HistoryBuffer, OUTBOX_TASKS, Outbox
+
+
+# Logging
+logger = logging.getLogger(__name__)
+
+# Nombre de tâches traitées par lot
+OUTBOX_BATCH_SIZE = 100
+
+# Nombre maximal de tentatives d'exécution d'une tâche
+OUTBOX_MAX_ATTEMPTS = 5
+
+
+def process_outbox(batch_size=OUTBOX_BATCH_SIZE, max_attempts=OUTBOX_MAX_ATTEMPTS, using=None):
+    """
+    Exécute un lot de tâches de la boîte d'envoi
+    Les tâches sont verrouillées (SELECT ... FOR UPDATE SKIP LOCKED si supporté) afin que plusieurs processus puissent
+    traiter la boîte d'envoi en parallèle, et ne sont supprimées qu'une fois exécutées dans la même transaction :
+    en cas d'interruption, le lot entier sera de nouveau traité (exécution au moins une fois)
+    :param batch_size: Nombre de tâches du lot
+    :param max_attempts: Nombre maximal de tentatives d'exécution d'une tâche en erreur
+    :param using: Alias de la base de données
+    :return: Tuple (nombre de tâches exécutées, nombre de tâches en erreur)
+    """
+    using = using or router.db_for_write(Outbox)
+    connection = connections[using]
+    done, failed = [], []
+    with transaction.atomic(using=using):
+        queryset = Outbox.objects.using(using).filter(attempts__lt=max_attempts).order_by('pk')
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        for event in queryset[:batch_size]:
+            try:
+                task = OUTBOX_TASKS.get(event.task)
+                if not task:
+                    raise ValueError(_("Tâche inconnue : {}").format(event.task))
+                with transaction.atomic(using=using):
+                    task(*event.args)
+                done.append(event.pk)
+            except Exception as error:
+                logger.error(error, exc_info=True)
+                event.attempts += 1
+                event.error = str(error)
+                failed.append(event)
+        # Les historiques sont insérés avant la validation de la transaction qui supprime les tâches exécutées
+        HistoryBuffer.flush_all(using=using)
+        if done:
+            Outbox.objects.using(using).filter(pk__in=done).delete()
+        if failed:
+            Outbox.objects.using(using).bulk_update(failed, fields=['attempts', 'error'])
+    return len(done), len(failed)
@@ -18,7 +18,13 @@ class Settings:
         SERVICE_USAGE_DATA={},
         SERVICE_USAGE_LIMIT_ONLY=False,
         IGNORE_LOG=False,
+        BULK_LOG=False,
+        LOG_CHECKPOINT=0,
+        HISTORY_ARCHIVE_PATH='',
+        OUTBOX=False,
         IGNORE_GLOBAL=False,
+        GLOBAL_CACHE_SIZE=10000,
+        GLOBAL_CACHE_TIMEOUT=3600,
         NOTIFY_CHANGES=False,
         NOTIFY_OPTIONS={},
         WEBSOCKET_ENABLED=False,
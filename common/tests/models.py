@@ -0,0 +1,53 @@
+# coding: utf-8
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections, models
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
+
+from common.models import Entity, PerishableEntity
+
+
+class Article(Entity):
+    """
+    Entité de test
+    """
+    name = models.CharField(max_length=100)
+    count = models.IntegerField(default=0)
+    groups = models.ManyToManyField('auth.Group', blank=True, related_name='+')
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        app_label = 'common'
+        managed = False
+
+
+class Price(PerishableEntity):
+    """
+    Entité périssable de test
+    """
+    name = models.CharField(max_length=100)
+    value = models.IntegerField(default=0)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        app_label = 'common'
+        managed = False
+
+
+@receiver(post_migrate)
+def create_test_tables(sender, using='default', **kwargs):
+    """
+    Création des tables des modèles de test (non gérés par les migrations) lors de la création de la base de test
+    """
+    connection = connections[using]
+    tables = connection.introspection.table_names()
+    with connection.schema_editor() as editor:
+        for model in (Article, Price):
+            if model._meta.db_table not in tables:
+                editor.create_model(model)
+    # Les types d'entité sont absents de l'état des migrations et conservés en cache par Django
+    ContentType.objects.db_manager(using).get_for_models(Article, Price)
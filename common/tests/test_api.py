@@ -1,6 +1,13 @@
 # coding: utf-8
-from common.tests import create_api_test_class
+from django.test import override_settings
+from django.utils.timezone import now
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from common.api.utils import create_model_serializer_and_viewset
+from common.tests import AuthenticatedBaseApiTestCase, create_api_test_class
 from common.models import MetaData, Webhook
+from common.tests.models import Article
 
 
 RECIPES = {}
@@ -9,3 +16,39 @@ RECIPES = {}
 # Tests automatisées pour tous les modèles liés à une API REST
 for model in [MetaData, Webhook]:
     create_api_test_class(model, namespace='common-api', data=RECIPES.get(model, None))
+
+
+@override_settings(BULK_LOG=False)
+class CommonModelViewSetAsOfTestCase(AuthenticatedBaseApiTestCase):
+
+    def get_as_of(self, model, **params):
+        serializer, viewset = create_model_serializer_and_viewset(model)
+        request = APIRequestFactory().get('/as_of/', params)
+        force_authenticate(request, user=self.user_admin)
+        return viewset.as_view({'get': 'as_of'})(request)
+
+    def test_as_of(self):
+        articles = [Article.objects.create(name='article{}'.format(index)) for index in range(3)]
+        date = now()
+        article = Article.objects.get(pk=articles[0].pk)
+        article.name = 'updated'
+        article.save()
+        # Etat reconstitué sur la page demandée uniquement
+        response = self.get_as_of(Article, as_of=date.isoformat(), order_by='id', page_size=2)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['count'], response.data['pages']), (3, 2))
+        self.assertEqual([(result['id'], result['data']['name']) for result in response.data['results']], [
+            (articles[0].pk, 'article0'), (articles[1].pk, 'article1')])
+        # Le paramètre 'as_of' est réservé et n'est pas interprété comme un filtre
+        response = self.get_as_of(Article, as_of=date.isoformat(), name='updated', all='true')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(result['id'], result['data']['name']) for result in response.data], [
+            (articles[0].pk, 'article0')])
+
+    def test_as_of_errors(self):
+        response = self.get_as_of(Article, as_of='invalid')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('as_of', response.data)
+        # Historique indisponible pour les modèles qui ne sont pas des entités
+        response = self.get_as_of(MetaData, as_of=now().isoformat())
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,831 @@
+# coding: utf-8
+import gzip
+import os
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.exceptions import FieldError
+from django.db import DatabaseError, connection, transaction
+from django.db.migrations.state import ProjectState
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+
+from common.archives import archive_history, purge_metadata, rehydrate_history
+from common.fields import get_sentinel_end_date, json_decode, json_encode
+from common.management.commands.run_outbox_worker import run_worker
+from common.models import (
+    EntityQuerySet, Global, GlobalIndex, History, HistoryBuffer, HistoryField, MetaData, Outbox, ServiceUsage,
+    TaskPayload, Webhook, get_changes, get_notify_payload, get_states_as_of, log_save, notify_bulk_changes, run_task,
+    save_history)
+from common.operations import CreateIndexRange
+from common.outbox import process_outbox
+from common.tests.models import Article, Price
+
+
+class CommonModelTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('user', 'user@test.fr', 'user')
+        cls.usage = ServiceUsage.objects.create(name='service', user=cls.user, address='127.0.0.1')
+
+    def test_snapshot_lazy(self):
+        usage = ServiceUsage.objects.get(pk=self.usage.pk)
+        self.assertIsNone(usage._snapshot)
+        self.assertEqual(usage.modified, {})
+        usage.count = 5
+        self.assertIsNotNone(usage._snapshot)
+        self.assertEqual(usage.modified, {'count': (0, 5)})
+        self.assertEqual(usage._copy['count'], 0)
+
+    def test_snapshot_reset_on_save(self):
+        usage = ServiceUsage.objects.get(pk=self.usage.pk)
+        usage.count = 3
+        usage.save()
+        self.assertIsNone(usage._snapshot)
+        self.assertEqual(usage.modified, {})
+        self.assertEqual(ServiceUsage.objects.get(pk=self.usage.pk).count, 3)
+
+    def test_untracked(self):
+        queryset = ServiceUsage.objects.untracked().filter(pk=self.usage.pk)
+        usage = queryset.get()
+        self.assertTrue(usage._readonly)
+        self.assertFalse(usage._tracked)
+        usage.count = 10
+        self.assertIsNone(usage._snapshot)
+        with self.assertRaises(ValueError):
+            usage.save()
+        with self.assertRaises(ValueError):
+            usage.delete()
+        self.assertEqual(list(queryset.values_list('count', flat=True)), [0])
+
+    def test_dirty_fields(self):
+        usage = ServiceUsage.objects.get(pk=self.usage.pk)
+        usage.count = 0
+        usage.limit = 10
+        self.assertEqual(usage._dirty, {'count', 'limit'})
+        self.assertEqual(usage.modified, {'limit': (None, 10)})
+        self.assertEqual(usage.get_modified(display=True, no_empty=True), {'limit': (None, 10)})
+
+    def test_save_update_fields(self):
+        usage = ServiceUsage.objects.get(pk=self.usage.pk)
+        ServiceUsage.objects.filter(pk=self.usage.pk).update(address='192.168.0.1')
+        usage.count = 7
+        usage.save()
+        usage = ServiceUsage.objects.get(pk=self.usage.pk)
+        self.assertEqual((usage.count, usage.address), (7, '192.168.0.1'))
+
+    def test_values_to_dict(self):
+        queryset = ServiceUsage.objects.filter(pk=self.usage.pk)
+        all_options = (
+            dict(), dict(editables=True), dict(display=True, labels=True), dict(no_empty=True, no_ids=True))
+        for options in all_options:
+            self.assertIsNotNone(queryset._get_values_plan(**options))
+            with self.assertNumQueries(1):
+                self.assertEqual(queryset.to_dict(**options), [self.usage.to_dict(**options)])
+        self.assertIsNone(queryset._get_values_plan(fks=True))
+        self.assertEqual(queryset.to_dict(fks=True), [self.usage.to_dict(fks=True)])
+
+    def test_values_json(self):
+        queryset = ServiceUsage.objects.filter(pk=self.usage.pk)
+        usage = ServiceUsage.objects.get(pk=self.usage.pk)
+        self.assertEqual(queryset.__json__(), [usage.__json__()])
+
+    def test_global_entities(self):
+        references = {}
+        for instance in (self.usage, self.user):
+            reference = Global.objects.create(
+                content_type=ContentType.objects.get_for_model(instance), object_id=instance.pk,
+                object_uid=uuid.uuid4())
+            references[str(reference.object_uid)] = instance
+        # Une requête pour les références puis une requête par type d'entité
+        with self.assertNumQueries(3):
+            entities = Global.objects.entities(list(references) + [str(uuid.uuid4()), 'invalid'])
+        self.assertEqual(entities, references)
+        uid = next(iter(references))
+        self.assertEqual(Global.objects.entity(uid), references[uid])
+        self.assertIsNone(Global.objects.entity('invalid'))
+
+    def test_global_index(self):
+        reference = Global.objects.create(
+            content_type=ContentType.objects.get_for_model(ServiceUsage), object_id=self.usage.pk,
+            object_uid=uuid.uuid4())
+        expected = {reference.object_uid: (reference.content_type_id, str(self.usage.pk))}
+        with self.assertNumQueries(1):
+            self.assertEqual(GlobalIndex.resolve([reference.object_uid]), expected)
+        # Cache local puis cache de Django
+        with self.assertNumQueries(0):
+            self.assertEqual(GlobalIndex.resolve([reference.object_uid]), expected)
+            GlobalIndex.clear()
+            self.assertEqual(GlobalIndex.resolve([reference.object_uid]), expected)
+        reference.delete()
+        self.assertEqual(GlobalIndex.resolve([reference.object_uid]), {})
+
+    @override_settings(GLOBAL_CACHE_TIMEOUT=60)
+    def test_global_index_timeout(self):
+        reference = Global.objects.create(
+            content_type=ContentType.objects.get_for_model(ServiceUsage), object_id=self.usage.pk,
+            object_uid=uuid.uuid4())
+        current_time = time.monotonic()
+        with mock.patch('common.models.time.monotonic', return_value=current_time):
+            GlobalIndex.resolve([reference.object_uid])
+        # Suppression par un autre processus : seul le cache de Django est invalidé
+        Global.objects.filter(pk=reference.pk)._raw_delete(connection.alias)
+        cache.delete(GlobalIndex.get_key(reference.object_uid))
+        with mock.patch('common.models.time.monotonic', return_value=current_time + 30):
+            with self.assertNumQueries(0):
+                self.assertIn(reference.object_uid, GlobalIndex.resolve([reference.object_uid]))
+        with mock.patch('common.models.time.monotonic', return_value=current_time + 60):
+            with self.assertNumQueries(1):
+                self.assertEqual(GlobalIndex.resolve([reference.object_uid]), {})
+
+    def test_set_uids_unknown(self):
+        group = Group.objects.create(name='group')
+        reference = Global.objects.create(
+            content_type=ContentType.objects.get_for_model(Group), object_id=group.pk, object_uid=uuid.uuid4())
+        article = Article.objects.create(name='article')
+        # Les identifiants inconnus sont ignorés sauf demande explicite
+        article.groups_uids = [reference.object_uid, uuid.uuid4()]
+        self.assertEqual(list(article.groups.all()), [group])
+        with self.assertRaises(Global.DoesNotExist):
+            article._set_uids('groups', [uuid.uuid4()], strict=True)
+        article.groups_uids = [uuid.uuid4()]
+        self.assertFalse(article.groups.exists())
+
+    def test_prefetch_generics(self):
+        usage_type = ContentType.objects.get_for_model(ServiceUsage)
+        user_type = ContentType.objects.get_for_model(get_user_model())
+        for content_type, object_id in ((usage_type, self.usage.pk), (user_type, self.user.pk),
+                                        (usage_type, 0), (usage_type, 'text')):
+            MetaData.objects.create(content_type=content_type, object_id=object_id, key='key', value=1)
+        # Une requête pour les métadonnées puis une requête par type d'entité
+        with self.assertNumQueries(3):
+            metadata = list(MetaData.objects.order_by('pk').prefetch_generics())
+        with self.assertNumQueries(0):
+            self.assertEqual([item.entity for item in metadata], [self.usage, self.user, None, None])
+
+    def test_metadata_many(self):
+        other = ServiceUsage.objects.create(name='other', user=self.user, address='127.0.0.1')
+        self.usage.set_metadata('key', 1)
+        self.usage.set_metadata('old', 2, date=now() - timedelta(days=1))
+        other.set_metadata('key', 3)
+        with self.assertNumQueries(1):
+            self.assertEqual(MetaData.get_many([self.usage, other], key='key'), {self.usage: 1, other: 3})
+        # Une requête pour les entités puis une requête pour les métadonnées
+        with self.assertNumQueries(2):
+            usages = list(ServiceUsage.objects.order_by('pk').with_metadata())
+        with self.assertNumQueries(0):
+            self.assertEqual([usage.get_metadata() for usage in usages], [{'key': 1}, {'key': 3}])
+            self.assertEqual(usages[0].get_metadata('key'), 1)
+        # Les clés non préchargées sont récupérées depuis la base de données
+        usage = ServiceUsage.objects.with_metadata(keys=['other']).get(pk=self.usage.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(usage.get_metadata('key'), 1)
+        usage.set_metadata('other', 4)
+        self.assertEqual(usage.get_metadata('other'), 4)
+        with self.assertNumQueries(2):
+            data = ServiceUsage.objects.order_by('pk').to_dict(metadata=True)
+        self.assertEqual([item['metadata'] for item in data], [{'key': 1, 'other': 4}, {'key': 3}])
+
+    def test_metadata_upsert(self):
+        usage = ServiceUsage.objects.get(pk=self.usage.pk)
+        other = ServiceUsage.objects.create(name='other', user=self.user, address='127.0.0.1')
+        usage.set_metadata('key', 1)
+        with self.assertNumQueries(1):
+            self.assertEqual(MetaData.upsert([usage, other], 'key', {'value': 2}), 2)
+        self.assertEqual(MetaData.get_many([usage, other], key='key'), {usage: {'value': 2}, other: {'value': 2}})
+        self.assertEqual(MetaData.objects.filter(key='key').count(), 2)
+        with self.assertNumQueries(1):
+            self.assertEqual(usage.set_metadata_many({'key': 3, 'other': [4]}), 2)
+        self.assertEqual(usage.get_metadata(), {'key': 3, 'other': [4]})
+        with self.assertNumQueries(1):
+            usage.del_metadata(['key', 'other'], logic=True)
+        self.assertEqual(usage.get_metadata(), {})
+        self.assertEqual(usage.get_metadata(valid=False), {'key': 3, 'other': [4]})
+
+    def test_metadata_cache(self):
+        self.usage.set_metadata('key', 1)
+        usage = ServiceUsage.objects.get(pk=self.usage.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(usage.get_metadata('key'), 1)
+            self.assertIsNone(usage.get_metadata('unknown'))
+            self.assertEqual(usage.get_metadata(), {'key': 1})
+        # Mise à jour du cache à chaque modification
+        usage.set_metadata('other', 2)
+        usage.add_metadata('list', 3)
+        usage.set_metadata('expired', 4, date=now() - timedelta(days=1))
+        usage.del_metadata('key')
+        with self.assertNumQueries(0):
+            self.assertEqual(usage.get_metadata(), {'list': [3], 'other': 2})
+        # Rechargement du cache lorsqu'une métadonnée devient obsolète
+        current_date = now()
+        with mock.patch('common.models.now', return_value=current_date):
+            usage.del_metadata('other', logic=True, date=current_date + timedelta(hours=1))
+            with self.assertNumQueries(0):
+                self.assertEqual(usage.get_metadata(), {'list': [3], 'other': 2})
+        with mock.patch('common.models.now', return_value=current_date + timedelta(hours=2)):
+            with self.assertNumQueries(1):
+                self.assertEqual(usage.get_metadata(), {'list': [3]})
+            with self.assertNumQueries(0):
+                self.assertEqual(usage.get_metadata(), {'list': [3]})
+        # Utilisation des métadonnées préchargées par Django
+        usage = ServiceUsage.objects.prefetch_related('metadata').get(pk=self.usage.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(usage.get_metadata('list'), [3])
+
+    def test_metadata_search(self):
+        other = ServiceUsage.objects.create(name='other', user=self.user, address='127.0.0.1')
+        self.usage.set_metadata('tags', {'region': 'north', 'level': 3})
+        other.set_metadata('tags', {'region': 'south', 'level': 5})
+        queryset = MetaData.objects.search(type=ServiceUsage, key='tags', contains={'region': 'north'})
+        self.assertEqual([metadata.object_id for metadata in queryset], [str(self.usage.pk)])
+        queryset = MetaData.objects.search(key='tags', lookups={'level__gte': 4})
+        self.assertEqual([metadata.object_id for metadata in queryset], [str(other.pk)])
+        queryset = ServiceUsage.objects.with_metadata_matching(key='tags', region='south', level__lt=10)
+        self.assertEqual(list(queryset), [other])
+        self.assertFalse(ServiceUsage.objects.with_metadata_matching(contains={'region': 'east'}).exists())
+
+    def test_m2m_snapshot(self):
+        content_types = list(ContentType.objects.order_by('pk')[:3])
+        webhook = Webhook.objects.create(name='webhook', url='http://localhost/')
+        webhook.types.add(content_types[0])
+        self.assertEqual(webhook._copy_m2m, {'types': []})
+        self.assertEqual(webhook.m2m_modified, {'types': ([], [content_types[0].pk])})
+        # Les modifications suivantes ne relisent plus la relation
+        with self.assertNumQueries(2):
+            webhook.types.add(content_types[1])
+        pks = [content_type.pk for content_type in content_types]
+        self.assertEqual(webhook.get_m2m_snapshot('types'), {'types': pks[:2]})
+        webhook.types.remove(content_types[0])
+        self.assertEqual(webhook.m2m_modified, {'types': (pks[:2], pks[1:2])})
+        webhook.types.clear()
+        self.assertEqual(webhook.get_m2m_snapshot('types'), {'types': []})
+        # Réutilisation des données préchargées
+        webhook.types.set(content_types)
+        webhook = Webhook.objects.prefetch_related('types').get(pk=webhook.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(sorted(webhook.m2m_to_dict()['types']), pks)
+
+
+@override_settings(BULK_LOG=True)
+class HistoryBufferTestCase(TestCase):
+
+    def get_history(self, **kwargs):
+        history = History(
+            status=History.UPDATE, content_type=ContentType.objects.get_for_model(ServiceUsage),
+            object_id='1', object_uid=uuid.uuid4(), object_str='service', data={}, data_size=2, **kwargs)
+        field = HistoryField(history=history, field_name='count', old_value='0', new_value='1', data=0, data_size=1)
+        return history, field
+
+    def test_flush(self):
+        buffer = HistoryBuffer.get()
+        self.assertIs(HistoryBuffer.get(), buffer)
+        histories = []
+        for index in range(3):
+            history, field = self.get_history()
+            save_history(history, [field])
+            histories.append(history)
+        self.assertEqual(History.objects.count(), 0)
+        buffer.flush()
+        self.assertEqual(History.objects.count(), 3)
+        self.assertEqual(HistoryField.objects.filter(history__in=histories).count(), 3)
+        self.assertIsNot(HistoryBuffer.get(), buffer)
+
+    def test_rollback(self):
+        try:
+            with transaction.atomic():
+                buffer = HistoryBuffer.get()
+                history, field = self.get_history()
+                save_history(history, [field])
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertIsNot(HistoryBuffer.get(), buffer)
+        self.assertFalse(HistoryBuffer.get().histories)
+
+    def test_pending(self):
+        buffer = HistoryBuffer.get()
+        connection = transaction.get_connection()
+        self.assertTrue(buffer.is_pending(connection))
+        transaction.on_commit(lambda: None)
+        self.assertTrue(buffer.is_pending(connection))
+        # Le tampon d'un point de sauvegarde annulé n'est plus en attente
+        try:
+            with transaction.atomic():
+                other = HistoryBuffer.get()
+                self.assertIsNot(other, buffer)
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertFalse(other.is_pending(connection))
+        self.assertTrue(buffer.is_pending(connection))
+        buffer.flush()
+        self.assertFalse(buffer.is_pending(connection))
+
+    @override_settings(BULK_LOG=False)
+    def test_no_buffer(self):
+        self.assertIsNone(HistoryBuffer.get())
+        history, field = self.get_history()
+        save_history(history, [field])
+        self.assertIsNotNone(history.pk)
+        self.assertEqual(field.history_id, history.pk)
+
+
+@override_settings(BULK_LOG=False)
+class TaskPayloadTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('user', 'user@test.fr', 'user')
+        cls.usage = ServiceUsage.objects.create(name='service', user=cls.user, address='127.0.0.1')
+
+    def test_log_save(self):
+        usage = ServiceUsage.objects.get(pk=self.usage.pk)
+        usage._current_user, usage.uuid = self.user, uuid.uuid4()
+        usage.count = 2
+        old_data, new_data = usage._copy, usage.to_dict(editables=True)
+        payload = TaskPayload.encode(usage, History.UPDATE, data=old_data, changes=get_changes(old_data, new_data))
+        self.assertEqual(payload['changes'], {'count': (0, 2)})
+        self.assertNotIn('_copy', payload)
+        json_encode(payload)
+        history = log_save(payload)
+        self.assertIsNotNone(history.pk)
+        self.assertEqual((history.user_id, history.object_id, history.data), (self.user.pk, usage.pk, old_data))
+        self.assertEqual(
+            list(history.fields.values_list('field_name', 'old_value', 'new_value')), [('count', '0', '2')])
+
+    def test_decode(self):
+        payload = TaskPayload.encode(self.usage, History.DELETE, data={})
+        self.assertIs(TaskPayload.decode(payload), payload)
+        with self.assertRaises(ValueError):
+            TaskPayload.decode(dict(payload, version=0))
+
+    @override_settings(BULK_LOG=True)
+    def test_pending_history(self):
+        usage = ServiceUsage.objects.get(pk=self.usage.pk)
+        usage.uuid = uuid.uuid4()
+        history = log_save(TaskPayload.encode(usage, History.CREATE, data={}, changes={'count': (None, 0)}))
+        self.assertIsNone(history.pk)
+        usage._history = history
+        payload = TaskPayload.encode(usage, History.M2M, old_m2m={}, new_m2m={})
+        self.assertEqual(payload['history_ref'], history._buffer_ref)
+        self.assertIs(TaskPayload.get_history(payload), history)
+        # La référence ne dépend pas de l'identité de l'objet en mémoire
+        self.assertIsNone(TaskPayload.get_history(dict(payload, history_ref=id(history))))
+        self.assertIsNone(TaskPayload.get_history(dict(payload, pk=0)))
+
+    @override_settings(LOG_CHECKPOINT=3)
+    def test_delta_history(self):
+        usage = ServiceUsage.objects.get(pk=self.usage.pk)
+        usage.uuid = uuid.uuid4()
+        histories, expected = [], []
+        for index, address in enumerate(('10.0.0.1', '10.0.0.2', '10.0.0.3', '10.0.0.4'), start=1):
+            usage.count, usage.address = index, address
+            old_data = usage._copy
+            usage.save()
+            new_data = usage.to_dict(editables=True)
+            payload = TaskPayload.encode(usage, History.UPDATE, data=old_data, changes=get_changes(old_data, new_data))
+            histories.append(log_save(payload))
+            expected.append(old_data)
+        self.assertEqual([history.delta for history in histories], [True, True, False, True])
+        self.assertEqual(set(histories[0].data), {'count', 'address', 'date'})
+        self.assertLess(histories[0].data_size, histories[2].data_size)
+        for history, data in zip(histories, expected):
+            history = History.objects.get(pk=history.pk)
+            self.assertEqual(json_encode(history.get_full_data(), sort_keys=True), json_encode(data, sort_keys=True))
+
+    @override_settings(LOG_CHECKPOINT=2)
+    def test_states_as_of(self):
+        usage = ServiceUsage.objects.get(pk=self.usage.pk)
+        usage.uuid = uuid.uuid4()
+        dates, expected = [], []
+        for index in range(1, 5):
+            old_data = usage._copy
+            usage.count = index
+            usage.save()
+            payload = TaskPayload.encode(
+                usage, History.UPDATE, data=old_data, changes=get_changes(old_data, usage.to_dict(editables=True)))
+            date = now() - timedelta(days=10 - index)
+            History.objects.filter(pk=log_save(payload).pk).update(creation_date=date)
+            dates.append(date)
+            expected.append(old_data)
+        queryset = ServiceUsage.objects.filter(pk=usage.pk)
+        for date, data in zip(dates, expected):
+            with self.assertNumQueries(3):
+                state = get_states_as_of(ServiceUsage, date - timedelta(hours=1), queryset)[usage.pk]
+            self.assertEqual(state['count'], data['count'])
+        self.assertEqual(get_states_as_of(ServiceUsage, now(), queryset)[usage.pk]['count'], 4)
+
+    def test_notify_bulk_changes(self):
+        usages = [self.usage, ServiceUsage.objects.create(name='other', user=self.user, address='127.0.0.1')]
+        payloads = [
+            get_notify_payload(usage, History.UPDATE, old_data={'count': 0}, new_data={'count': index})
+            for index, usage in enumerate(usages)]
+        data = notify_bulk_changes(payloads)
+        self.assertTrue(data['bulk'])
+        self.assertEqual([item['meta']['id'] for item in data['items']], [usage.pk for usage in usages])
+        self.assertIsNone(data['items'][0]['changes'])
+        self.assertEqual(data['items'][1]['changes']['data'], {'previous': {'count': 0}, 'current': {'count': 1}})
+
+    @override_settings(OUTBOX=True)
+    def test_outbox(self):
+        usage = ServiceUsage.objects.get(pk=self.usage.pk)
+        usage.uuid = uuid.uuid4()
+        payload = TaskPayload.encode(usage, History.UPDATE, data=usage._copy, changes={'count': (0, 1)})
+        self.assertIsNone(run_task(log_save, payload))
+        Outbox.objects.create(task='unknown', args=[])
+        self.assertFalse(History.objects.exists())
+        self.assertEqual(process_outbox(), (1, 1))
+        self.assertEqual(list(History.objects.values_list('object_id', 'status')), [(str(usage.pk), History.UPDATE)])
+        self.assertEqual(list(Outbox.objects.values_list('task', 'attempts')), [('unknown', 1)])
+        self.assertEqual(process_outbox(max_attempts=1), (0, 0))
+
+    def test_outbox_worker_backoff(self):
+        results = [(0, 2), (0, 1), (1, 1), (0, 1), (0, 0)]
+        with mock.patch('common.management.commands.run_outbox_worker.process_outbox', side_effect=results), \
+                mock.patch('common.management.commands.run_outbox_worker.time.sleep') as sleep:
+            run_worker(interval=1.0, once=True)
+        # Attente croissante tant que les lots ne contiennent que des erreurs
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [1.0, 2.0, 1.0])
+
+
+class HistoryArchiveTestCase(TestCase):
+
+    def test_archive_and_rehydrate(self):
+        content_type = ContentType.objects.get_for_model(ServiceUsage)
+        object_uid = uuid.uuid4()
+        for index in range(3):
+            history = History.objects.create(
+                status=History.UPDATE, content_type=content_type, object_id='1', object_uid=object_uid,
+                object_str='service', data={'count': index}, data_size=12)
+            HistoryField.objects.create(
+                history=history, field_name='count', old_value=str(index), data=index, data_size=1)
+        old_date = now() - timedelta(days=90)
+        History.objects.update(creation_date=old_date)
+        with tempfile.TemporaryDirectory() as path:
+            results = archive_history(now(), path=path)
+            self.assertEqual(sum(results.values()), 3)
+            self.assertFalse(History.objects.exists())
+            self.assertFalse(HistoryField.objects.exists())
+            self.assertEqual(rehydrate_history(old_date, uuids=[object_uid], path=path), 3)
+            self.assertEqual(rehydrate_history(old_date, path=path), 0)
+        self.assertEqual(list(History.objects.order_by('pk').values_list('data', flat=True)), [
+            {'count': 0}, {'count': 1}, {'count': 2}])
+        self.assertEqual(HistoryField.objects.count(), 3)
+        self.assertEqual({date.month for date in History.objects.values_list('creation_date', flat=True)}, {
+            old_date.month})
+
+    def test_archive_rollback(self):
+        content_type = ContentType.objects.get_for_model(ServiceUsage)
+        History.objects.create(
+            status=History.UPDATE, content_type=content_type, object_id='1', object_uid=uuid.uuid4(),
+            object_str='service', data={}, data_size=2)
+        History.objects.update(creation_date=now() - timedelta(days=90))
+        with tempfile.TemporaryDirectory() as path:
+            # L'archive n'est pas complétée par un lot dont la suppression a échoué
+            with mock.patch('django.db.models.QuerySet._raw_delete', side_effect=DatabaseError):
+                with self.assertRaises(DatabaseError):
+                    archive_history(now(), path=path)
+            self.assertEqual(History.objects.count(), 1)
+            self.assertEqual(os.listdir(path), [])
+            self.assertEqual(sum(archive_history(now(), path=path).values()), 1)
+            self.assertFalse(History.objects.exists())
+            filenames = os.listdir(path)
+            self.assertEqual(len(filenames), 1)
+            with gzip.open(os.path.join(path, filenames[0]), 'rt', encoding='utf-8') as file:
+                self.assertEqual(len(file.readlines()), 1)
+
+    def test_purge_metadata(self):
+        content_type = ContentType.objects.get_for_model(ServiceUsage)
+        for index in range(5):
+            MetaData.objects.create(
+                content_type=content_type, object_id=str(index), key='key', value={'index': index},
+                deletion_date=now() - timedelta(days=1) if index else None)
+        batches = []
+        with tempfile.TemporaryDirectory() as path:
+            results = purge_metadata(
+                archive=True, path=path, batch_size=3, progress=lambda content_type, count: batches.append(count))
+            with gzip.open(os.path.join(path, os.listdir(path)[0]), 'rt', encoding='utf-8') as file:
+                archived = [json_decode(line)['value'] for line in file]
+        self.assertEqual(results, {content_type: 4})
+        self.assertEqual(batches, [3, 4])
+        self.assertEqual(archived, [{'index': index} for index in range(1, 5)])
+        self.assertEqual(list(MetaData.objects.values_list('object_id', flat=True)), ['0'])
+
+    def test_purge_metadata_rollback(self):
+        MetaData.objects.create(
+            content_type=ContentType.objects.get_for_model(ServiceUsage), object_id='1', key='key', value=1,
+            deletion_date=now() - timedelta(days=1))
+        with tempfile.TemporaryDirectory() as path:
+            # Aucune archive n'est écrite pour un lot dont la suppression a échoué
+            with mock.patch('django.db.models.QuerySet._raw_delete', side_effect=DatabaseError):
+                with self.assertRaises(DatabaseError):
+                    purge_metadata(archive=True, path=path)
+            self.assertEqual(os.listdir(path), [])
+        self.assertEqual(MetaData.objects.count(), 1)
+
+
+class HistoryRestoreTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('user', 'user@test.fr', 'user')
+
+    def get_history(self, usage, **data):
+        data = dict(usage.to_dict(editables=True), **data)
+        return History.objects.create(
+            status=History.UPDATE, content_type=ContentType.objects.get_for_model(ServiceUsage),
+            object_id=usage.pk, object_uid=uuid.uuid4(), object_str=str(usage), data=data, data_size=2)
+
+    def test_restore_bulk(self):
+        usages = [ServiceUsage.objects.create(name='service{}'.format(index), user=self.user, count=index)
+                  for index in range(5)]
+        histories = [self.get_history(usage, count=10 + index) for index, usage in enumerate(usages)]
+        # Historique plus récent de la même entité, l'historique le plus ancien l'emporte
+        newer = self.get_history(usages[0], count=99)
+        # Entité supprimée recréée à partir de ses données
+        deleted = usages.pop()
+        ServiceUsage.objects.filter(pk=deleted.pk).delete()
+        results = History.objects.filter(pk__in=[h.pk for h in histories] + [newer.pk]).restore_bulk(
+            current_user=self.user)
+        self.assertEqual(results, {pk: True for pk in [h.pk for h in histories] + [newer.pk]})
+        self.assertEqual(
+            list(ServiceUsage.objects.order_by('pk').values_list('name', 'count')),
+            [('service{}'.format(index), 10 + index) for index in range(5)])
+        self.assertEqual(History.objects.filter(restored=True, restoration_date__isnull=False).count(), 6)
+
+    def test_restore_bulk_queries(self):
+        usages = [ServiceUsage.objects.create(name='service{}'.format(index), user=self.user)
+                  for index in range(10)]
+        pks = [self.get_history(usage, count=5).pk for usage in usages]
+        # Chargement des historiques, des entités, mise à jour groupée et marquage des historiques
+        with self.assertNumQueries(6):
+            History.objects.filter(pk__in=pks).restore_bulk()
+        self.assertEqual(set(ServiceUsage.objects.values_list('count', flat=True)), {5})
+
+
+@override_settings(BULK_LOG=False)
+class EntityQuerySetTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('user', 'user@test.fr', 'user')
+
+    def get_histories(self, status):
+        return History.objects.filter(
+            content_type=ContentType.objects.get_for_model(Article), status=status).order_by('object_id')
+
+    def test_bulk_create(self):
+        articles = Article.objects.bulk_create(
+            [Article(name='article{}'.format(index), count=index) for index in range(3)], _current_user=self.user)
+        self.assertEqual(len(articles), 3)
+        self.assertTrue(all(article.pk and not article._state.adding for article in articles))
+        self.assertEqual(set(Global.objects.filter(
+            content_type=ContentType.objects.get_for_model(Article)).values_list('object_id', 'object_uid')), {
+            (str(article.pk), article.uuid) for article in articles})
+        histories = self.get_histories(History.CREATE)
+        self.assertEqual([(history.object_id, history.user_id, history.data['count']) for history in histories], [
+            (str(article.pk), self.user.pk, index) for index, article in enumerate(articles)])
+
+    def test_update(self):
+        articles = Article.objects.bulk_create([Article(name='article{}'.format(index)) for index in range(3)])
+        dates = dict(Article.objects.values_list('pk', 'modification_date'))
+        # Seules les entités réellement modifiées sont historisées
+        self.assertEqual(Article.objects.filter(pk__in=[articles[0].pk, articles[1].pk]).update(
+            count=5, _current_user=self.user, _reason='update'), 2)
+        self.assertEqual(Article.objects.filter(pk=articles[0].pk).update(count=5), 1)
+        histories = self.get_histories(History.UPDATE)
+        self.assertEqual(list(histories.values_list('object_id', 'user_id', 'reason')), [
+            (str(article.pk), self.user.pk, 'update') for article in articles[:2]])
+        self.assertEqual(list(HistoryField.objects.filter(history__in=histories).values_list(
+            'field_name', 'old_value', 'new_value').distinct()), [('count', '0', '5')])
+        self.assertEqual(dict(Article.objects.values_list('pk', 'modification_date')), dates)
+        # Mise à jour des dates de modification et du dernier utilisateur sur demande
+        self.assertEqual(Article.objects.filter(pk=articles[2].pk).update(
+            count=1, _current_user=self.user, _auto_now=True), 1)
+        article = Article.objects.get(pk=articles[2].pk)
+        self.assertEqual(article.current_user, self.user)
+        self.assertGreater(article.modification_date, dates[article.pk])
+
+    @override_settings(IGNORE_LOG=True)
+    def test_update_untracked(self):
+        Article.objects.bulk_create([Article(name='article{}'.format(index)) for index in range(3)])
+        with self.assertNumQueries(1):
+            self.assertEqual(Article.objects.update(count=1), 3)
+        self.assertFalse(History.objects.exists())
+
+    def test_bulk_update(self):
+        articles = Article.objects.bulk_create([Article(name='article{}'.format(index)) for index in range(3)])
+        for index, article in enumerate(articles):
+            article.name = 'updated{}'.format(index)
+        self.assertIsNone(Article.objects.bulk_update(articles, ['name'], _current_user=self.user))
+        self.assertEqual(list(Article.objects.order_by('pk').values_list('name', 'current_user')), [
+            ('updated{}'.format(index), self.user.pk) for index in range(3)])
+        histories = self.get_histories(History.UPDATE)
+        self.assertEqual(list(histories.values_list('object_id', flat=True)), [
+            str(article.pk) for article in articles])
+        self.assertEqual(list(HistoryField.objects.filter(
+            history__in=histories, field_name='name').order_by('history__object_id').values_list(
+            'old_value', 'new_value')), [('article{}'.format(index), 'updated{}'.format(index)) for index in range(3)])
+
+    def test_bulk_update_partial(self):
+        article = Article.objects.create(name='article')
+        History.objects.all().delete()
+        article.name, article.count = 'updated', 5
+        Article.objects.bulk_update([article], ['name'])
+        # Les champs non écrits ne sont ni historisés ni considérés comme sauvegardés
+        history = self.get_histories(History.UPDATE).get()
+        self.assertNotIn('count', set(history.fields.values_list('field_name', flat=True)))
+        self.assertEqual(Article.objects.values_list('name', 'count').get(), ('updated', 0))
+        self.assertEqual(article._dirty, {'count'})
+        article.save()
+        self.assertEqual(Article.objects.values_list('name', 'count').get(), ('updated', 5))
+
+    def test_delete(self):
+        groups = [Group.objects.create(name='group{}'.format(index)) for index in range(2)]
+        articles = Article.objects.bulk_create([Article(name='article{}'.format(index)) for index in range(5)])
+        for article in articles:
+            article.groups.set(groups)
+        content_type = ContentType.objects.get_for_model(Article)
+        deleted, rows_count = Article.objects.filter(pk__in=[article.pk for article in articles]).delete(
+            _current_user=self.user, _reason='delete', _batch_size=2)
+        self.assertEqual(rows_count, {'common.Article': 5, 'common.Article_groups': 10, 'common.Global': 5})
+        self.assertEqual(deleted, 20)
+        self.assertFalse(Article.objects.exists())
+        self.assertFalse(Global.objects.filter(content_type=content_type).exists())
+        self.assertEqual(Group.objects.count(), 2)
+        histories = self.get_histories(History.DELETE)
+        self.assertEqual(list(histories.values_list('object_id', 'user_id', 'reason')), [
+            (str(article.pk), self.user.pk, 'delete') for article in articles])
+        for history, article in zip(histories, articles):
+            self.assertEqual((history.data['name'], history.data['groups_ids']), (
+                article.name, [group.pk for group in groups]))
+            self.assertEqual([(item['article'], item['group']) for item in history.collector_delete[
+                'common.Article_groups']], [(article.pk, group.pk) for group in groups])
+
+    def test_delete_atomic(self):
+        articles = Article.objects.bulk_create([Article(name='article{}'.format(index)) for index in range(5)])
+        delete_batch, batches = EntityQuerySet._delete_batch, []
+
+        def failing_batch(queryset, pks, **options):
+            batches.append(pks)
+            if len(batches) == 2:
+                raise ValueError()
+            return delete_batch(queryset, pks, **options)
+
+        with mock.patch.object(EntityQuerySet, '_delete_batch', failing_batch):
+            with self.assertRaises(ValueError):
+                Article.objects.all().delete(_batch_size=2)
+        # Les lots sont lus dans l'ordre des clés primaires et aucun lot n'est conservé en cas d'erreur
+        self.assertEqual(batches, [[article.pk for article in articles[:2]], [article.pk for article in articles[2:4]]])
+        self.assertEqual(Article.objects.count(), 5)
+        self.assertFalse(self.get_histories(History.DELETE).exists())
+
+    def test_delete_queries(self):
+        group = Group.objects.create(name='group')
+        ContentType.objects.get_for_model(Article.groups.through)
+        counts = []
+        for count in (2, 6):
+            articles = Article.objects.bulk_create([Article(name='article{}'.format(index)) for index in range(count)])
+            for article in articles:
+                article.groups.add(group)
+            with CaptureQueriesContext(connection) as context:
+                Article.objects.all().delete()
+            self.assertEqual(History.objects.filter(status=History.DELETE).count(), count)
+            History.objects.all().delete()
+            # Hors insertion des historiques, le nombre de requêtes ne dépend pas du nombre d'entités supprimées
+            counts.append(len([query for query in context.captured_queries if not query['sql'].startswith(
+                'INSERT INTO {}'.format(connection.ops.quote_name(History._meta.db_table)))]))
+        self.assertEqual(counts[0], counts[1])
+
+    @override_settings(NOTIFY_CHANGES=True, WEBSOCKET_ENABLED=True)
+    def test_delete_notify(self):
+        with mock.patch.object(Webhook, 'send_websocket') as send_websocket:
+            articles = Article.objects.bulk_create([Article(name='article{}'.format(index)) for index in range(3)])
+            send_websocket.reset_mock()
+            Article.objects.filter(pk__in=[article.pk for article in articles[:2]]).delete()
+        notifications = [call[0][0] for call in send_websocket.call_args_list if call[0][0]['meta']['type'][
+            'model'] == Article._meta.model_name]
+        self.assertEqual([(item['meta']['status'], item['meta']['id']) for item in notifications], [
+            (History.DELETE, article.pk) for article in articles[:2]])
+
+
+@override_settings(BULK_LOG=False)
+class PerishableEntityTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('user', 'user@test.fr', 'user')
+
+    def get_histories(self, *pks):
+        return History.objects.filter(
+            content_type=ContentType.objects.get_for_model(Price), object_id__in=[str(pk) for pk in pks])
+
+    def test_save(self):
+        price = Price.objects.create(name='price', value=1, start_date=now() - timedelta(days=10))
+        price.set_metadata('key', 'value')
+        previous_pk, previous_date = price.pk, price.modification_date
+        price.value = 2
+        price.save(_current_user=self.user)
+        self.assertNotEqual(price.pk, previous_pk)
+        self.assertIsNone(price.end_date)
+        previous = Price.objects.get(pk=previous_pk)
+        self.assertEqual((previous.value, previous.end_date), (1, price.start_date))
+        self.assertGreater(previous.modification_date, previous_date)
+        self.assertNotEqual(previous.uuid, price.uuid)
+        self.assertEqual(price.get_metadata(), {'key': 'value'})
+        self.assertEqual(list(Price.objects.select_valid().values_list('pk', flat=True)), [price.pk])
+        self.assertEqual(set(self.get_histories(previous_pk, price.pk).values_list('object_id', 'status')), {
+            (str(previous_pk), History.CREATE), (str(previous_pk), History.UPDATE), (str(price.pk), History.CREATE)})
+
+    def test_supersede(self):
+        prices = Price.objects.bulk_create([
+            Price(name='price{}'.format(index), value=index, start_date=now() - timedelta(days=10))
+            for index in range(3)])
+        prices[0].set_metadata('key', 'value')
+        date, current_date = now() - timedelta(days=1), now()
+        news = Price.objects.supersede(
+            {prices[0].pk: {'value': 10}, prices[1].pk: {'value': 11}}, date=date, name='new', _current_user=self.user)
+        # Chaque nouvelle version correspond aux modifications de l'entité qu'elle remplace
+        self.assertEqual([(new.name, new.value, new.start_date, new.end_date) for new in news], [
+            ('new', 10, date, None), ('new', 11, date, None)])
+        self.assertTrue(all(new.pk not in {price.pk for price in prices} for new in news))
+        self.assertEqual(news[0].get_metadata(), {'key': 'value'})
+        self.assertEqual(news[1].get_metadata(), {})
+        olds = Price.objects.in_bulk([price.pk for price in prices])
+        for price in prices[:2]:
+            old = olds[price.pk]
+            self.assertEqual((old.value, old.end_date, old.current_user), (price.value, date, self.user))
+            self.assertGreaterEqual(old.modification_date, current_date)
+        self.assertIsNone(olds[prices[2].pk].end_date)
+        self.assertEqual(set(Global.objects.filter(object_uid__in=[new.uuid for new in news]).values_list(
+            'object_id', flat=True)), {str(new.pk) for new in news})
+        histories = self.get_histories(*[price.pk for price in prices[:2]] + [new.pk for new in news]).filter(
+            user=self.user)
+        self.assertEqual(sorted(histories.values_list('object_id', 'status')), sorted(
+            [(str(price.pk), History.UPDATE) for price in prices[:2]] +
+            [(str(new.pk), History.CREATE) for new in news]))
+        fields = HistoryField.objects.filter(history__in=histories.filter(status=History.UPDATE), field_name='end_date')
+        self.assertEqual(fields.count(), 2)
+
+    def test_select_valid_range(self):
+        date = now()
+        periods = [
+            (date - timedelta(days=10), date - timedelta(days=5)),
+            (date - timedelta(days=10), date + timedelta(days=5)),
+            (date - timedelta(days=10), None),
+            (date + timedelta(days=5), None),
+            (date + timedelta(days=5), date + timedelta(days=10)),
+            (date, date),
+        ]
+        Price.objects.bulk_create([
+            Price(name='price{}'.format(index), start_date=start_date, end_date=end_date)
+            for index, (start_date, end_date) in enumerate(periods)])
+        dates = [None, date, date - timedelta(days=5), date + timedelta(days=5), date + timedelta(days=365 * 100)]
+        for reference in dates:
+            for valid in (True, False):
+                results = []
+                for range_index in (False, True):
+                    with mock.patch.object(Price, '_range_index', range_index):
+                        results.append(set(Price.objects.select_valid(date=reference, valid=valid).values_list(
+                            'name', flat=True)))
+                self.assertEqual(results[0], results[1], (reference, valid))
+        with mock.patch.object(Price, '_range_index', True):
+            self.assertEqual(set(Price.objects.select_valid(date=date).values_list('name', flat=True)), {
+                'price1', 'price2', 'price5'})
+            self.assertEqual(set(Price.objects.select_valid(date=date + timedelta(days=365 * 100)).values_list(
+                'name', flat=True)), {'price2', 'price3'})
+
+    def test_valid_at_without_end_date(self):
+        # Le lookup n'est pas utilisable sur un modèle sans date de fin
+        with self.assertRaises(FieldError):
+            Article.objects.filter(creation_date__valid_at=now())
+        self.assertEqual(Price.objects.filter(start_date__valid_at=now()).count(), 0)
+
+    def test_range_index_operation(self):
+        operation = CreateIndexRange('price')
+        state = ProjectState.from_apps(apps)
+        editor = connection.schema_editor(collect_sql=True)
+        operation.database_forwards('common', editor, state, state)
+        operation.database_backwards('common', editor, state, state)
+        index_name, query = operation.get_index(Price, editor)
+        self.assertEqual(editor.collected_sql, [query, 'DROP INDEX IF EXISTS "{}";'.format(index_name)])
+        self.assertEqual(query, (
+            'CREATE INDEX IF NOT EXISTS "{}" ON "common_price" '
+            '(COALESCE("end_date", {}), "start_date");').format(index_name, get_sentinel_end_date(connection)))
+        # L'index créé est utilisé par la recherche des entités valides
+        with connection.cursor() as cursor:
+            cursor.execute(query)
+            with mock.patch.object(Price, '_range_index', True):
+                sql, params = Price.objects.select_valid().query.sql_with_params()
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            self.assertIn(index_name, ' '.join(str(row) for row in cursor.fetchall()))
@@ -96,6 +96,7 @@ class CeleryFake:
 
             wrapped.apply = lambda args=None, kwargs=None, **options: func(*(args or []), **(kwargs or {}))
             wrapped.apply_async = wrapped.apply
+            wrapped.name = dkwargs.get('name') or func.__name__
             return wrapped
         return decorator
 
@@ -781,54 +782,53 @@ def get_related(model, dest=None, excludes=None, foreign_keys=True, one_to_one=F
 def prefetch_generics(weak_queryset):
     """
     Permet un prefetch des GenericForeignKey
-    :param weak_queryset: QuerySet d'origine
-    :return: QuerySet avec prefetch
+    Les entités liées sont regroupées par type puis récupérées en une requête par type quel que soit le type de leur
+    clé primaire, elles sont ensuite affectées via un dictionnaire et bénéficient elles-mêmes du prefetch
+    :param weak_queryset: QuerySet d'origine ou liste d'instances
+    :return: QuerySet (évalué) ou liste d'instances avec prefetch
     """
     from django.contrib.contenttypes.fields import GenericForeignKey
     from django.contrib.contenttypes.models import ContentType
+    from django.core.exceptions import ValidationError
+    from django.db.models import QuerySet
+
+    if isinstance(weak_queryset, QuerySet):
+        weak_queryset = weak_queryset.select_related()
+    instances = list(weak_queryset)
+
+    # Regroupement des identifiants par type d'entité
+    gfks, groups = {}, {}
+    for instance in instances:
+        model = type(instance)
+        if model not in gfks:
+            gfks[model] = [
+                (field, model._meta.get_field(field.ct_field).get_attname()) for field in model._meta.private_fields
+                if isinstance(field, GenericForeignKey)]
+        for gfk, ct_attname in gfks[model]:
+            content_type_id, object_id = getattr(instance, ct_attname), getattr(instance, gfk.fk_field)
+            if content_type_id is None or object_id is None:
+                continue
+            groups.setdefault(content_type_id, []).append((instance, gfk, object_id))
 
-    weak_queryset = weak_queryset.select_related()
-
-    gfks = {}
-    for name, gfk in weak_queryset.model.__dict__.items():
-        if not isinstance(gfk, GenericForeignKey):
+    # Une requête par type d'entité puis affectation par clé primaire
+    for content_type_id, items in groups.items():
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        if model is None:
             continue
-        gfks[name] = gfk
-
-    data = {}
-    for weak_model in weak_queryset:
-        for gfk_name, gfk_field in gfks.items():
-            related_content_type_id = getattr(
-                weak_model, gfk_field.model._meta.get_field(
-                    gfk_field.ct_field).get_attname())
-            if not related_content_type_id:
-                continue
-            related_content_type = ContentType.objects.get_for_id(related_content_type_id)
-            related_object_id = int(getattr(weak_model, gfk_field.fk_field))
-
-            if related_content_type not in data.keys():
-                data[related_content_type] = []
-            data[related_content_type].append(related_object_id)
-
-    for content_type, object_ids in data.items():
-        model_class = content_type.model_class()
-        models = prefetch_generics(model_class.objects.filter(pk__in=object_ids))
-        for model in models:
-            for weak_model in weak_queryset:
-                for gfk_name, gfk_field in gfks.items():
-                    related_content_type_id = getattr(
-                        weak_model, gfk_field.model._meta.get_field(
-                            gfk_field.ct_field).get_attname())
-                    if not related_content_type_id:
-                        continue
-                    related_content_type = ContentType.objects.get_for_id(related_content_type_id)
-                    related_object_id = int(getattr(weak_model, gfk_field.fk_field))
-
-                    if related_object_id != model.pk:
-                        continue
-                    if related_content_type != content_type:
-                        continue
-                    setattr(weak_model, gfk_name, model)
+        links = {}
+        for instance, gfk, object_id in items:
+            try:
+                key = model._meta.pk.to_python(object_id)
+            except (TypeError, ValueError, ValidationError):
+                key = None
+            links.setdefault(key, []).append((instance, gfk))
+        keys = [key for key in links if key is not None]
+        targets = model._base_manager.in_bulk(keys) if keys else {}
+        prefetch_generics(list(targets.values()))
+        for key, values in links.items():
+            target = targets.get(key)
+            for instance, gfk in values:
+                getattr(gfk, 'set_prefetched_value', gfk.set_cached_value)(instance, target)
     return weak_queryset
 
 